@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+from config import Config
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _get(self, key: Hashable, now: float) -> Tuple[bool, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= now:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def _set(self, key: Hashable, value: Any, now: float):
+        self.entries[key] = (now + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self.lock:
+            return self._get(key, self.clock())
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        found, missing = {}, []
+        with self.lock:
+            now = self.clock()
+            for key in dict.fromkeys(keys):
+                hit, value = self._get(key, now)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+        return found, missing
+
+    def set(self, key: Hashable, value: Any):
+        with self.lock:
+            self._set(key, value, self.clock())
+
+    def set_many(self, values: Dict[Hashable, Any]):
+        with self.lock:
+            now = self.clock()
+            for key, value in values.items():
+                self._set(key, value, now)
+
+    def invalidate(self, key: Hashable):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def versioned_key(key: Hashable) -> Tuple[str, str]:
+    # Detail reads cache the model together with the version stamps its ETag is computed from.
+    return 'versioned', str(key)
+
+
+# Shared by every service instance in the process so that a write through one controller invalidates the others.
+user_cache = TTLCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL_SECONDS)
+campaign_cache = TTLCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL_SECONDS)
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Mapping, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.database import MongoRegistry, registry as default_registry
+from app.live import RESYNC, LiveHub, change, deletion, live_hub
+from app.services.sheets import SHEET_FIELD
+
+logger = logging.getLogger(__name__)
+
+BOOKKEEPING_FIELDS = {'version', 'updated_at'}
+
+# ChangeStreamFatalError and ChangeStreamHistoryLost: the oplog no longer reaches the resume token.
+HISTORY_LOST_CODES = {280, 286}
+
+
+def sheet_changes(description: Mapping[str, Any] | None) -> Tuple[Dict[str, Any] | None, List[str]]:
+    if description is None:
+        return None, []
+    prefix = SHEET_FIELD + '.'
+    updated = {path: value for path, value in description.get('updatedFields', {}).items()
+               if path not in BOOKKEEPING_FIELDS}
+    removed = description.get('removedFields', [])
+    if description.get('truncatedArrays') or not all(path.startswith(prefix) for path in [*updated, *removed]):
+        return None, []
+    return ({path[len(prefix):]: value for path, value in updated.items()},
+            [path[len(prefix):] for path in removed])
+
+
+def stream_events(event: Mapping[str, Any]) -> List[Tuple[str | None, Dict[str, Any]]]:
+    # A campaign id of None addresses every campaign with subscribers in this worker.
+    _id = event['documentKey']['_id']
+    operation = event['operationType']
+    document = event.get('fullDocument') or {}
+    if event['ns']['coll'] == 'Campaigns':
+        if operation == 'delete':
+            return [(str(_id), deletion('campaign', _id))]
+        return [(str(_id), change('campaign', _id, document.get('version')))]
+
+    # Without pre-images, neither a deleted character's campaign nor the one a moved character left is known, so
+    # every campaign resyncs; these writes are rare next to sheet updates.
+    if operation == 'delete':
+        return [(None, RESYNC)]
+    events = []
+    description = event.get('updateDescription')
+    if operation == 'replace' or 'campaign' in (description or {}).get('updatedFields', {}):
+        events.append((None, RESYNC))
+    if document.get('campaign') is not None:
+        changes, removed = sheet_changes(description)
+        events.append((str(document['campaign']),
+                       change('character', _id, document.get('version'), changes, removed)))
+    return events
+
+
+CHANGE_STREAM_PIPELINE = [
+    {'$match': {'ns.coll': {'$in': ['Campaigns', 'Characters']},
+                'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}},
+    {'$project': {'operationType': 1, 'ns': 1, 'documentKey': 1, 'updateDescription': 1,
+                  'fullDocument.campaign': 1, 'fullDocument.version': 1}},
+]
+
+
+async def follow_changes(registry: MongoRegistry = None, hub: LiveHub = None, retry_delay: float = 1.0):
+    # Needs a replica set; feeds every worker with all writes, including the ones made by other workers.
+    registry = registry or default_registry
+    hub = hub or live_hub
+    database = registry.get_async_collection('Characters').database
+    resume_token = None
+    while True:
+        try:
+            async with database.watch(CHANGE_STREAM_PIPELINE, full_document='updateLookup',
+                                      resume_after=resume_token) as changes:
+                async for event in changes:
+                    resume_token = changes.resume_token
+                    for campaign_id, published in stream_events(event):
+                        if campaign_id is None:
+                            hub.broadcast(published)
+                        else:
+                            hub.publish(campaign_id, published)
+        except PyMongoError as e:
+            if isinstance(e, OperationFailure) and e.code in HISTORY_LOST_CODES:
+                # Resuming can never succeed: restart from now and have every client refetch what it missed.
+                logger.error("Change stream history lost, restarting in %.0f s: %s", retry_delay, e)
+                resume_token = None
+                hub.broadcast(RESYNC)
+            else:
+                logger.error("Change stream interrupted, resuming in %.0f s: %s", retry_delay, e)
+            await asyncio.sleep(retry_delay)
@@ -0,0 +1,37 @@
+import abc
+from typing import Any, Dict, Mapping, Tuple
+
+from pymongo import monitoring
+
+
+def command_collection(command_name: str, command: Mapping[str, Any]) -> str:
+    # getMore names its collection in a field of its own; other commands put it under the command name.
+    target = command.get('collection' if command_name == 'getMore' else command_name)
+    return target if isinstance(target, str) else ''
+
+
+class TrackedCommandListener(monitoring.CommandListener, abc.ABC):
+    # Only the started event carries the command document, so what a listener needs from it is kept until the
+    # reply arrives. Subclasses return that from started_command (None skips the command) and handle finished.
+    def __init__(self):
+        self.started_commands: Dict[Tuple[Any, int], Any] = {}
+
+    @abc.abstractmethod
+    def started_command(self, event: monitoring.CommandStartedEvent) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def finished(self, event: monitoring.CommandSucceededEvent | monitoring.CommandFailedEvent, started: Any,
+                 succeeded: bool):
+        ...
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        started = self.started_command(event)
+        if started is not None:
+            self.started_commands[(event.connection_id, event.request_id)] = started
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self.finished(event, self.started_commands.pop((event.connection_id, event.request_id), None), True)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self.finished(event, self.started_commands.pop((event.connection_id, event.request_id), None), False)
@@ -0,0 +1,273 @@
+import importlib.util
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import anyio
+
+from config import Config
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+NOT_COMPRESSIBLE_STATUSES = (204, 304)
+
+
+class GzipStream:
+    def __init__(self, level: int = 6):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality: int = 4):
+        import brotli
+
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def sync(self) -> bytes:
+        return self.compressor.flush()
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self, level: int = 3):
+        import zstandard
+
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        self.flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self.compressor.flush(self.flush_block)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+@lru_cache(maxsize=None)
+def installed(module: str) -> bool:
+    # Found without importing it: a codec is only loaded by the first response compressed with it.
+    return importlib.util.find_spec(module) is not None
+
+
+def available_encodings() -> Dict[str, Callable]:
+    # Ordered by server preference when the client accepts several encodings with the same weight.
+    encodings = {}
+    if installed('zstandard'):
+        encodings['zstd'] = ZstdStream
+    if installed('brotli'):
+        encodings['br'] = BrotliStream
+    encodings['gzip'] = GzipStream
+    return encodings
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    stream = available_encodings()[encoding]()
+    return stream.compress(data) + stream.flush()
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        weight = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights
+
+
+def negotiate(header: str, encodings: List[str]) -> str | None:
+    weights = parse_accept_encoding(header)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def record(self, route: str, encoding: str, bytes_in: int, bytes_out: int, seconds: float):
+        with self.lock:
+            entry = self.routes.setdefault((route, encoding), {
+                'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0,
+            })
+            entry['responses'] += 1
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+            entry['cpu_seconds'] += seconds
+
+    def stats(self) -> List[dict]:
+        with self.lock:
+            routes = sorted((key, dict(entry)) for key, entry in self.routes.items())
+
+        report = []
+        for (route, encoding), entry in routes:
+            saved = entry['bytes_in'] - entry['bytes_out']
+            report.append({
+                'route': route,
+                'encoding': encoding,
+                **entry,
+                'bytes_saved': saved,
+                # Compression time per kilobyte saved is the number to compare between routes and codecs.
+                'us_per_kb_saved': entry['cpu_seconds'] * 1e6 / max(saved / 1024, 1),
+            })
+        return report
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = None, offload_size: int = None, stats: CompressionStats = None):
+        self.app = app
+        self.minimum_size = Config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.offload_size = Config.COMPRESSION_OFFLOAD_SIZE if offload_size is None else offload_size
+        self.stats = compression_stats if stats is None else stats
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        encoding = negotiate(headers.get(b'accept-encoding', b'').decode('latin-1'), list(self.encodings))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        responder = CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+    async def run(self, function: Callable[[bytes], bytes], data: bytes) -> Tuple[bytes, float]:
+        def timed():
+            started = time.thread_time()
+            result = function(data)
+            return result, time.thread_time() - started
+
+        # Large bodies are compressed in a worker thread so other requests keep being served meanwhile.
+        if len(data) >= self.offload_size:
+            return await anyio.to_thread.run_sync(timed)
+        return timed()
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope, send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self.next_send = send
+        self.encoding = encoding
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def route(self) -> str:
+        route = self.scope.get('route')
+        return getattr(route, 'path', self.scope.get('path', ''))
+
+    def compressible(self, message) -> bool:
+        headers = {name.lower(): value for name, value in message.get('headers', [])}
+        content_type = headers.get(b'content-type', b'').decode('latin-1')
+        return (message['status'] not in NOT_COMPRESSIBLE_STATUSES
+                and b'content-encoding' not in headers
+                and content_type.startswith(COMPRESSIBLE_TYPES))
+
+    def headers(self, encoded: bool, content_length: int = None, weak: bool = None) -> list:
+        original = self.start_message.get('headers', [])
+        weak = encoded if weak is None else weak
+        headers = [(name, value) for name, value in original if name.lower() not in (b'vary', b'etag')
+                   and not (encoded and name.lower() == b'content-length')]
+        vary = [value for name, value in original if name.lower() == b'vary']
+        headers.append((b'vary', b', '.join(vary + [b'Accept-Encoding'])))
+        if encoded:
+            headers.append((b'content-encoding', self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b'content-length', str(content_length).encode()))
+        # Strong validators identify the uncompressed bytes, so only an encoded variant gets a weak tag.
+        for name, value in original:
+            if name.lower() == b'etag':
+                headers.append((name, b'W/' + value if weak and not value.startswith(b'W/') else value))
+        return headers
+
+    def start(self, encoded: bool, content_length: int = None, weak: bool = None) -> dict:
+        return {**self.start_message, 'headers': self.headers(encoded, content_length, weak)}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            self.passthrough = not self.compressible(message)
+            if self.passthrough:
+                # A 304 may stand in for an encoded copy, so it keeps the tag that copy was sent with.
+                await self.next_send(self.start(encoded=False, weak=True) if message['status'] == 304 else message)
+            return
+
+        if message['type'] != 'http.response.body' or self.passthrough:
+            return await self.next_send(message)
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.stream is None and not more_body:
+            if len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.next_send(self.start(encoded=False))
+                return await self.next_send(message)
+
+            compressed, seconds = await self.middleware.run(lambda data: compress(self.encoding, data), body)
+            self.middleware.stats.record(self.route(), self.encoding, len(body), len(compressed), seconds)
+            await self.next_send(self.start(encoded=True, content_length=len(compressed)))
+            return await self.next_send({'type': 'http.response.body', 'body': compressed})
+
+        # Streamed bodies are compressed incrementally and sent without a Content-Length.
+        if self.stream is None:
+            self.stream = self.middleware.encodings[self.encoding]()
+            await self.next_send(self.start(encoded=True))
+
+        # Each chunk is flushed as a complete block; otherwise the codec would hold every line until the stream
+        # ends and the client would get nothing sooner than without streaming.
+        if more_body and not body:
+            return
+        finish = self.stream.sync if more_body else self.stream.flush
+        compressed, seconds = await self.middleware.run(lambda data: self.stream.compress(data) + finish(), body)
+
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+        self.seconds += seconds
+        if not more_body:
+            self.middleware.stats.record(self.route(), self.encoding, self.bytes_in, self.bytes_out, self.seconds)
+
+        if compressed or not more_body:
+            await self.next_send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, List, Mapping, Tuple
+
+from fastapi import Request, Response
+
+# Clients may keep a copy but must revalidate it, which costs a metadata query and an empty 304.
+CACHE_CONTROL = 'private, no-cache'
+
+# The $lookup arrays that embed other versioned documents, walked in the same order for data and metadata results.
+EMBEDDED_DOCUMENTS = ('player_user', 'campaign_document', 'master_user', 'player_users')
+
+Stamp = Tuple[str, int, datetime]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_version() -> dict[str, Any]:
+    return {'version': 1, 'updated_at': utcnow()}
+
+
+def versioned_update(update_data: Mapping[str, Any]) -> dict[str, Any]:
+    return {'$set': {**update_data, 'updated_at': utcnow()}, '$inc': {'version': 1}}
+
+
+def version_stamps(document: Mapping[str, Any]) -> List[Stamp]:
+    # Documents written before versioning default to version 0 and the creation time embedded in their _id.
+    updated_at = document.get('updated_at') or document['_id'].generation_time
+    stamps = [(str(document['_id']), document.get('version', 0), as_utc(updated_at))]
+    for key in EMBEDDED_DOCUMENTS:
+        stamps.extend(stamp for item in document.get(key) or () for stamp in version_stamps(item))
+    return stamps
+
+
+def documents_stamps(documents: List[Mapping[str, Any]]) -> List[Stamp]:
+    return [stamp for document in documents for stamp in version_stamps(document)]
+
+
+def as_utc(value: datetime) -> datetime:
+    # pymongo returns naive datetimes that are already in UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def entity_tag(stamps: List[Stamp], variant: str = '') -> str:
+    digest = hashlib.sha1(repr((variant, [(_id, version) for _id, version, _ in stamps])).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+class ConditionalGet:
+    def __init__(self, request: Request):
+        self.if_none_match = request.headers.get('if-none-match')
+        self.if_modified_since = request.headers.get('if-modified-since')
+        # Query parameters such as ?fields= or ?after= select a different representation of the same documents.
+        self.variant = request.url.query
+
+    @property
+    def requested(self) -> bool:
+        return self.if_none_match is not None or self.if_modified_since is not None
+
+    def matches(self, etag: str) -> bool:
+        tags = [tag.strip().removeprefix('W/') for tag in self.if_none_match.split(',')]
+        return '*' in tags or etag in tags
+
+    def unmodified_since(self, last_modified: datetime) -> bool:
+        try:
+            since = parsedate_to_datetime(self.if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and as_utc(last_modified).replace(microsecond=0) <= since
+
+    def tag(self, stamps: List[Stamp], response: Response) -> Tuple[str, datetime] | None:
+        # Sets the validators of the representation built from these stamps.
+        if not stamps:
+            return None
+
+        etag = entity_tag(stamps, self.variant)
+        last_modified = max(updated_at for _, _, updated_at in stamps)
+
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return etag, last_modified
+
+    def evaluate(self, documents: List[Mapping[str, Any]], response: Response) -> Response | None:
+        validators = self.tag(documents_stamps(documents), response)
+        if validators is None:
+            return None
+        etag, last_modified = validators
+
+        # If-Modified-Since is only consulted when the client did not send an entity tag.
+        if self.if_none_match is not None:
+            not_modified = self.matches(etag)
+        else:
+            not_modified = self.if_modified_since is not None and self.unmodified_since(last_modified)
+
+        if not_modified:
+            return Response(status_code=304, headers=dict(response.headers))
+        return None
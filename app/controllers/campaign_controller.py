@@ -1,16 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from typing import List
 
-from app.models.campaign_model import Campaign, CampaignCreate, CampaignUpdate
-from app.services.campaign_service import CampaignService
-from app.services.user_service import UserService
+from app.conditional import ConditionalGet
+from app.fieldsets import Fieldset, fieldset
+from app.live import live_hub, stream
+from app.models.bulk_model import BulkItemResult
+from app.models.campaign_model import Campaign, CampaignBulkRequest, CampaignCreate, CampaignUpdate
+from app.pagination import PageParams
+from app.responses import respond
+from app.streaming import ndjson_response, wants_ndjson
+from app.server_timing import TimedRoute
+from app.services.async_campaign_service import AsyncCampaignService
+
+# Application-defined close code, the WebSocket counterpart of a 404.
+WS_NOT_FOUND = 4404
 
 
 class CampaignController:
     def __init__(self):
-        self.router = APIRouter()
-        self.campaign_service = CampaignService()
-        self.user_service = UserService()
+        self.router = APIRouter(route_class=TimedRoute)
+        self.campaign_service = AsyncCampaignService()
+        self.user_service = self.campaign_service.user_service
         self.register_routes()
 
     def register_routes(self):
@@ -19,47 +29,112 @@ class CampaignController:
         self.router.get("/player/{campaign_player}", response_model=List[Campaign])(self.get_campaigns_by_player)
         self.router.get("/{campaign_id}", response_model=Campaign)(self.get_campaign_by_id)
         self.router.post("/", response_model=dict[str, str])(self.create_campaign)
+        self.router.post("/bulk", response_model=List[BulkItemResult])(self.bulk_write)
         self.router.put("/{campaign_id}", response_model=dict[str, str])(self.update_campaign)
         self.router.delete("/{campaign_id}", response_model=dict)(self.delete_campaign)
+        self.router.websocket("/{campaign_id}/live")(self.live)
+
+    async def get_campaigns(self, request: Request, response: Response, page: PageParams = Depends(),
+                            fields: Fieldset | None = Depends(fieldset(Campaign))):
+        if wants_ndjson(request):
+            return ndjson_response(self.campaign_service.stream_campaigns(after=page.after, fields=fields))
 
-    def get_campaigns(self):
-        campaigns = self.campaign_service.get_all_campaigns()
+        campaigns = await self.campaign_service.get_all_campaigns(limit=page.fetch_limit, after=page.after,
+                                                                  fields=fields)
         if not campaigns:
             raise HTTPException(status_code=404, detail="Nenhuma campanha encontrada.")
-        return campaigns
+        campaigns = page.finish(campaigns, request, response)
+        return respond(campaigns, response, fields)
 
-    def get_campaigns_by_master(self, campaign_master: str):
-        campaigns = self.campaign_service.get_campaigns_by_master(campaign_master)
+    async def get_campaigns_by_master(self, campaign_master: str, request: Request, response: Response,
+                                      page: PageParams = Depends(), conditional: ConditionalGet = Depends(),
+                                      fields: Fieldset | None = Depends(fieldset(Campaign))):
+        if conditional.requested:
+            versions = await self.campaign_service.get_campaign_versions_by_master(
+                campaign_master, limit=page.fetch_limit, after=page.after, fields=fields)
+            not_modified = conditional.evaluate(versions, response)
+            if not_modified is not None:
+                return not_modified
+
+        campaigns, stamps = await self.campaign_service.get_versioned_campaigns_by_master(
+            campaign_master, limit=page.fetch_limit, after=page.after, fields=fields)
         if not campaigns:
             raise HTTPException(status_code=404, detail="Este usuário não possui campanhas.")
-        return campaigns
+        conditional.tag(stamps, response)
+        campaigns = page.finish(campaigns, request, response)
+        return respond(campaigns, response, fields)
+
+    async def get_campaigns_by_player(self, campaign_player: str, request: Request, response: Response,
+                                      page: PageParams = Depends(), conditional: ConditionalGet = Depends(),
+                                      fields: Fieldset | None = Depends(fieldset(Campaign))):
+        if conditional.requested:
+            versions = await self.campaign_service.get_campaign_versions_by_player(
+                campaign_player, limit=page.fetch_limit, after=page.after, fields=fields)
+            not_modified = conditional.evaluate(versions, response)
+            if not_modified is not None:
+                return not_modified
 
-    def get_campaigns_by_player(self, campaign_player: str):
-        campaigns = self.campaign_service.get_campaigns_by_player(campaign_player)
+        campaigns, stamps = await self.campaign_service.get_versioned_campaigns_by_player(
+            campaign_player, limit=page.fetch_limit, after=page.after, fields=fields)
         if not campaigns:
             raise HTTPException(status_code=404, detail="Este usuário não participa de nenhuma campanha.")
-        return campaigns
+        conditional.tag(stamps, response)
+        campaigns = page.finish(campaigns, request, response)
+        return respond(campaigns, response, fields)
 
-    def get_campaign_by_id(self, campaign_id: str):
-        campaign = self.campaign_service.get_campaign_by_id(campaign_id)
+    async def get_campaign_by_id(self, campaign_id: str, response: Response,
+                                 conditional: ConditionalGet = Depends(),
+                                 fields: Fieldset | None = Depends(fieldset(Campaign))):
+        # Only a conditional request pays for the metadata query; the validators of a 200 come from its own read.
+        if conditional.requested:
+            versions = await self.campaign_service.get_campaign_versions(campaign_id, fields=fields)
+            not_modified = conditional.evaluate(versions, response)
+            if not_modified is not None:
+                return not_modified
+
+        # A conditional request that got here holds an outdated copy, so it skips this process's cache.
+        campaign, stamps = await self.campaign_service.get_versioned_campaign(campaign_id, fields=fields,
+                                                                              cached=not conditional.requested)
         if campaign is None:
             raise HTTPException(status_code=404, detail="Campanha não encontrada.")
-        return campaign
+        conditional.tag(stamps, response)
+        return respond(campaign, response, fields)
 
-    def create_campaign(self, campaign: CampaignCreate):
-        if self.user_service.get_user_by_id(campaign.master) is None:
+    async def validate_users(self, campaign: CampaignCreate | CampaignUpdate):
+        # Master and players are checked together with one _id-only query instead of loading the users.
+        players = campaign.players or []
+        existing = await self.user_service.existing_ids(filter(None, [campaign.master, *players]))
+        if campaign.master is not None and campaign.master not in existing:
             raise HTTPException(status_code=400, detail="O mestre dessa campanha não foi encontrado.")
-        if len(self.user_service.get_users_by_ids(campaign.players)) < len(campaign.players):
+        if not set(players) <= existing:
             raise HTTPException(status_code=400, detail="Um ou mais jogadores dessa campanha não foram encontrados.")
-        return self.campaign_service.create_campaign(campaign)
 
-    def update_campaign(self, campaign_id: str, campaign: CampaignUpdate):
-        updated_campaign = self.campaign_service.update_campaign(campaign_id, campaign)
+    async def create_campaign(self, campaign: CampaignCreate):
+        await self.validate_users(campaign)
+        return await self.campaign_service.create_campaign(campaign)
+
+    async def update_campaign(self, campaign_id: str, campaign: CampaignUpdate):
+        await self.validate_users(campaign)
+        updated_campaign = await self.campaign_service.update_campaign(campaign_id, campaign)
         if updated_campaign is None:
             raise HTTPException(status_code=404, detail="Campanha não encontrada.")
         return updated_campaign
 
-    def delete_campaign(self, campaign_id: str):
-        if not self.campaign_service.delete_campaign(campaign_id):
+    async def delete_campaign(self, campaign_id: str):
+        if not await self.campaign_service.delete_campaign(campaign_id):
             raise HTTPException(status_code=404, detail="Campanha não encontrada.")
         return {"message": "Campanha excluída com sucesso."}
+
+    async def bulk_write(self, bulk: CampaignBulkRequest):
+        return await self.campaign_service.bulk_write(bulk.operations, ordered=bulk.ordered)
+
+    async def live(self, websocket: WebSocket, campaign_id: str):
+        if not await self.campaign_service.existing_ids([campaign_id]):
+            await websocket.close(code=WS_NOT_FOUND, reason="Campanha não encontrada.")
+            return
+        await websocket.accept()
+        with live_hub.subscribe(campaign_id) as subscription:
+            try:
+                await stream(websocket, subscription)
+            except WebSocketDisconnect:
+                pass
@@ -1,23 +1,26 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pymongo.errors import OperationFailure
+from typing import Any, List
 
-from app.models.character_model import Character, CharacterCreate, CharacterUpdate
-from app.services.character_service import CharacterService
-from app.services.campaign_service import CampaignService
-from app.services.user_service import UserService
-
-router = APIRouter()
-character_service = CharacterService()
-campaign_service = CampaignService()
-user_service = UserService()
+from app.conditional import ConditionalGet
+from app.fieldsets import Fieldset, fieldset
+from app.models.bulk_model import BulkItemResult
+from app.models.character_model import Character, CharacterBulkRequest, CharacterCreate, CharacterUpdate
+from app.models.sheet_patch_model import CharacterSheetPatch, SheetDeltaRequest
+from app.pagination import PageParams
+from app.responses import respond
+from app.streaming import ndjson_response, wants_ndjson
+from app.server_timing import TimedRoute
+from app.services.async_character_service import AsyncCharacterService
+from app.services.sheets import SHEET_WRITE_ERROR
 
 
 class CharacterController:
     def __init__(self):
-        self.router = APIRouter()
-        self.character_service = CharacterService()
-        self.campaign_service = CampaignService()
-        self.user_service = UserService()
+        self.router = APIRouter(route_class=TimedRoute)
+        self.character_service = AsyncCharacterService()
+        self.campaign_service = self.character_service.campaign_service
+        self.user_service = self.character_service.user_service
         self.register_routes()
 
     def register_routes(self):
@@ -25,41 +28,94 @@ class CharacterController:
         self.router.get("/{character_id}", response_model=Character)(self.get_character_by_id)
         self.router.get("/player/{character_player}", response_model=List[Character])(self.get_characters_by_player)
         self.router.post("/", response_model=dict[str, str])(self.create_character)
+        self.router.post("/bulk", response_model=List[BulkItemResult])(self.bulk_write)
         self.router.put("/{character_id}", response_model=dict[str, str])(self.update_character)
+        self.router.patch("/{character_id}/sheet", response_model=dict[str, Any])(self.patch_character_sheet)
+        self.router.patch("/campaign/{campaign_id}/sheets",
+                          response_model=List[BulkItemResult])(self.apply_sheet_deltas)
         self.router.delete("/{character_id}", response_model=dict)(self.delete_character)
 
-    def get_characters(self):
-        characters = self.character_service.get_all_characters()
+    async def get_characters(self, request: Request, response: Response, page: PageParams = Depends(),
+                             fields: Fieldset | None = Depends(fieldset(Character))):
+        if wants_ndjson(request):
+            return ndjson_response(self.character_service.stream_characters(after=page.after, fields=fields))
+
+        characters = await self.character_service.get_all_characters(limit=page.fetch_limit, after=page.after,
+                                                                     fields=fields)
         if not characters:
             raise HTTPException(status_code=404, detail="Nenhum personagem encontrado.")
-        return characters
+        characters = page.finish(characters, request, response)
+        return respond(characters, response, fields)
+
+    async def get_character_by_id(self, character_id: str, response: Response,
+                                  conditional: ConditionalGet = Depends(),
+                                  fields: Fieldset | None = Depends(fieldset(Character))):
+        # Only a conditional request pays for the metadata query; the validators of a 200 come from its own read.
+        if conditional.requested:
+            versions = await self.character_service.get_character_versions(character_id, fields=fields)
+            not_modified = conditional.evaluate(versions, response)
+            if not_modified is not None:
+                return not_modified
 
-    def get_character_by_id(self, character_id: str):
-        character = self.character_service.get_character_by_id(character_id)
+        character, stamps = await self.character_service.get_versioned_character(character_id, fields=fields)
         if character is None:
             raise HTTPException(status_code=404, detail="Personagem não encontrado.")
-        return character
+        conditional.tag(stamps, response)
+        return respond(character, response, fields)
 
-    def get_characters_by_player(self, character_player: str):
-        characters = self.character_service.get_characters_by_player(character_player)
+    async def get_characters_by_player(self, character_player: str, request: Request, response: Response,
+                                       page: PageParams = Depends(), conditional: ConditionalGet = Depends(),
+                                       fields: Fieldset | None = Depends(fieldset(Character))):
+        if conditional.requested:
+            versions = await self.character_service.get_character_versions_by_player(
+                character_player, limit=page.fetch_limit, after=page.after, fields=fields)
+            not_modified = conditional.evaluate(versions, response)
+            if not_modified is not None:
+                return not_modified
+
+        characters, stamps = await self.character_service.get_versioned_characters_by_player(
+            character_player, limit=page.fetch_limit, after=page.after, fields=fields)
         if not characters:
             raise HTTPException(status_code=404, detail="Este usuário não possui personagens.")
-        return characters
+        conditional.tag(stamps, response)
+        characters = page.finish(characters, request, response)
+        return respond(characters, response, fields)
 
-    def create_character(self, character: CharacterCreate):
-        if self.user_service.get_user_by_id(character.player) is None:
+    async def validate_references(self, character: CharacterCreate | CharacterUpdate):
+        # Existence checks use _id-only queries; hydrating the campaign would also load its master and players.
+        if character.player is not None and not await self.user_service.existing_ids([character.player]):
             raise HTTPException(status_code=400, detail="O jogador desse personagem não foi encontrado.")
-        if self.campaign_service.get_campaign_by_id(character.campaign) is None:
+        if character.campaign is not None and not await self.campaign_service.existing_ids([character.campaign]):
             raise HTTPException(status_code=400, detail="A campanha desse personagem não foi encontrada.")
-        return self.character_service.create_character(character)
 
-    def update_character(self, character_id: str, character: CharacterUpdate):
-        updated_character = self.character_service.update_character(character_id, character)
+    async def create_character(self, character: CharacterCreate):
+        await self.validate_references(character)
+        return await self.character_service.create_character(character)
+
+    async def update_character(self, character_id: str, character: CharacterUpdate):
+        await self.validate_references(character)
+        updated_character = await self.character_service.update_character(character_id, character)
         if updated_character is None:
             raise HTTPException(status_code=404, detail="Personagem não encontrado.")
         return updated_character
 
-    def delete_character(self, character_id: str):
-        if not self.character_service.delete_character(character_id):
+    async def patch_character_sheet(self, character_id: str, patch: CharacterSheetPatch):
+        try:
+            updated_character = await self.character_service.patch_character_sheet(character_id, patch)
+        except OperationFailure:
+            # Incrementing a non-numeric field or writing below a non-object value.
+            raise HTTPException(status_code=400, detail=SHEET_WRITE_ERROR)
+        if updated_character is None:
+            raise HTTPException(status_code=404, detail="Personagem não encontrado.")
+        return updated_character
+
+    async def apply_sheet_deltas(self, campaign_id: str, request: SheetDeltaRequest):
+        return await self.character_service.apply_sheet_deltas(campaign_id, request.deltas)
+
+    async def delete_character(self, character_id: str):
+        if not await self.character_service.delete_character(character_id):
             raise HTTPException(status_code=404, detail="Personagem não encontrado.")
         return {"message": "Personagem excluído com sucesso."}
+
+    async def bulk_write(self, bulk: CharacterBulkRequest):
+        return await self.character_service.bulk_write(bulk.operations, ordered=bulk.ordered)
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
+from pymongo.errors import DuplicateKeyError
 
-from app.models.user_model import User, UserCreate, UserUpdate
-from app.services.user_service import UserService
+from app.fieldsets import Fieldset, fieldset
+from app.models.bulk_model import BulkItemResult
+from app.models.user_model import User, UserBulkRequest, UserCreate, UserUpdate
+from app.pagination import PageParams
+from app.responses import respond
+from app.server_timing import TimedRoute
+from app.services.async_user_service import AsyncUserService
 
 
 class UserController:
     def __init__(self):
-        self.router = APIRouter()
-        self.user_service = UserService()
+        self.router = APIRouter(route_class=TimedRoute)
+        self.user_service = AsyncUserService()
         self.register_routes()
 
     def register_routes(self):
@@ -16,37 +22,51 @@ class UserController:
         self.router.get("/{user_id}", response_model=User)(self.get_user_by_id)
         self.router.get("/email/{user_email}", response_model=User)(self.get_user_by_email)
         self.router.post("/", response_model=dict[str, str])(self.create_user)
+        self.router.post("/bulk", response_model=List[BulkItemResult])(self.bulk_write)
         self.router.put("/{user_id}", response_model=User)(self.update_user)
         self.router.delete("/{user_id}", response_model=dict)(self.delete_user)
 
-    def get_users(self):
-        users = self.user_service.get_all_users()
+    async def get_users(self, request: Request, response: Response, page: PageParams = Depends(),
+                        fields: Fieldset | None = Depends(fieldset(User))):
+        users = await self.user_service.get_all_users(limit=page.fetch_limit, after=page.after, fields=fields)
         if not users:
             raise HTTPException(status_code=404, detail="Nenhum usuário encontrado.")
-        return users
+        users = page.finish(users, request, response)
+        return respond(users, response, fields)
 
-    def get_user_by_id(self, user_id: str):
-        user = self.user_service.get_user_by_id(user_id)
+    async def get_user_by_id(self, user_id: str, response: Response,
+                             fields: Fieldset | None = Depends(fieldset(User))):
+        user = await self.user_service.get_user_by_id(user_id, fields=fields)
         if user is None:
             raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-        return user
+        return respond(user, response, fields)
 
-    def get_user_by_email(self, user_email: str):
-        user = self.user_service.get_user_by_email(user_email)
+    async def get_user_by_email(self, user_email: str, response: Response,
+                                fields: Fieldset | None = Depends(fieldset(User))):
+        user = await self.user_service.get_user_by_email(user_email, fields=fields)
         if user is None:
             raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-        return user
+        return respond(user, response, fields)
 
-    def create_user(self, user: UserCreate):
-        return self.user_service.create_user(user)
+    async def create_user(self, user: UserCreate):
+        try:
+            return await self.user_service.create_user(user)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Já existe um usuário com este e-mail.")
 
-    def update_user(self, user_id: str, user: UserUpdate):
-        updated_user = self.user_service.update_user(user_id, user)
+    async def update_user(self, user_id: str, user: UserUpdate):
+        try:
+            updated_user = await self.user_service.update_user(user_id, user)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Já existe um usuário com este e-mail.")
         if updated_user is None:
             raise HTTPException(status_code=404, detail="Usuário não encontrado.")
         return updated_user
 
-    def delete_user(self, user_id: str):
-        if not self.user_service.delete_user(user_id):
+    async def delete_user(self, user_id: str):
+        if not await self.user_service.delete_user(user_id):
             raise HTTPException(status_code=404, detail="Usuário não encontrado.")
         return {"message": "Usuário excluído com sucesso."}
+
+    async def bulk_write(self, bulk: UserBulkRequest):
+        return await self.user_service.bulk_write(bulk.operations, ordered=bulk.ordered)
@@ -0,0 +1,165 @@
+import os
+import threading
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.monitoring import ConnectionPoolListener
+
+from config import Config
+
+
+class PoolCounter(ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools_created = 0
+        self.pools_closed = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+
+    def pool_created(self, event):
+        with self.lock:
+            self.pools_created += 1
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.pools_closed += 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.connections_closed += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+class MongoRegistry:
+    def __init__(self, uri: str = None, db_name: str = 'RoleForge', **client_options):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = client_options
+        self.client = None
+        self.async_client = None
+        self.collections: Dict[str, Collection] = {}
+        self.async_collections: Dict[str, AsyncIOMotorCollection] = {}
+        self.event_listeners: List[Any] = []
+        self.pool_counter = PoolCounter()
+        self.clients_created = 0
+        self.lock = threading.RLock()
+        self.pid = os.getpid()
+
+    def check_fork(self):
+        # Clients inherited through fork share the parent's sockets and monitor threads, so a worker starts over.
+        if self.pid != os.getpid():
+            self.lock = threading.RLock()
+            self.client = None
+            self.async_client = None
+            self.collections = {}
+            self.async_collections = {}
+            self.pid = os.getpid()
+
+    def add_listener(self, listener):
+        # Listeners are bound when the client is built, so they must be registered before first use.
+        with self.lock:
+            if listener in self.event_listeners:
+                return
+            if self.client is not None or self.async_client is not None:
+                raise RuntimeError("Listeners must be registered before the Mongo client is created.")
+            self.event_listeners.append(listener)
+
+    def get_client(self) -> MongoClient:
+        self.check_fork()
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = MongoClient(self.uri or Config.MONGO_URI,
+                                              event_listeners=[self.pool_counter, *self.event_listeners],
+                                              **self.client_options)
+                    self.clients_created += 1
+        return self.client
+
+    def get_async_client(self) -> AsyncIOMotorClient:
+        self.check_fork()
+        if self.async_client is None:
+            with self.lock:
+                if self.async_client is None:
+                    self.async_client = AsyncIOMotorClient(self.uri or Config.MONGO_URI,
+                                                           event_listeners=[self.pool_counter, *self.event_listeners],
+                                                           **self.client_options)
+                    self.clients_created += 1
+        return self.async_client
+
+    def get_database(self) -> Database:
+        return self.get_client()[self.db_name]
+
+    def get_collection(self, name: str) -> Collection:
+        self.check_fork()
+        collection = self.collections.get(name)
+        if collection is None:
+            with self.lock:
+                collection = self.collections.get(name)
+                if collection is None:
+                    collection = self.get_database()[name]
+                    self.collections[name] = collection
+        return collection
+
+    def get_async_database(self) -> AsyncIOMotorDatabase:
+        return self.get_async_client()[self.db_name]
+
+    def get_async_collection(self, name: str) -> AsyncIOMotorCollection:
+        self.check_fork()
+        collection = self.async_collections.get(name)
+        if collection is None:
+            with self.lock:
+                collection = self.async_collections.get(name)
+                if collection is None:
+                    collection = self.get_async_database()[name]
+                    self.async_collections[name] = collection
+        return collection
+
+    def stats(self) -> dict[str, Any]:
+        counter = self.pool_counter
+        return {
+            "clients": sum(client is not None for client in (self.client, self.async_client)),
+            "clients_created": self.clients_created,
+            "pools": counter.pools_created - counter.pools_closed,
+            "connections": counter.connections_created - counter.connections_closed,
+            "collections": sorted(set(self.collections) | set(self.async_collections)),
+        }
+
+    def close(self):
+        with self.lock:
+            for client in (self.client, self.async_client):
+                if client is not None:
+                    client.close()
+            self.client = None
+            self.async_client = None
+            self.collections = {}
+            self.async_collections = {}
+
+
+registry = MongoRegistry()
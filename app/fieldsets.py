@@ -0,0 +1,58 @@
+from functools import lru_cache
+from typing import Callable, FrozenSet, Type
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, create_model
+
+from app.server_timing import timed
+
+
+@lru_cache(maxsize=None)
+def partial_model(model: Type[BaseModel], fields: FrozenSet[str]) -> Type[BaseModel]:
+    return create_model(f'{model.__name__}Partial', **{
+        name: (info.annotation, ...) for name, info in model.model_fields.items() if name in fields
+    })
+
+
+class Fieldset:
+    def __init__(self, model: Type[BaseModel], fields: set[str]):
+        self.model = model
+        self.fields = frozenset(fields | {'id'})
+        self.partial_model = partial_model(model, self.fields)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Fieldset) and (self.model, self.fields) == (other.model, other.fields)
+
+    def __hash__(self) -> int:
+        return hash((self.model, self.fields))
+
+    def __contains__(self, field: str) -> bool:
+        return field in self.fields
+
+    def projection(self) -> dict[str, int]:
+        # _id is always returned by Mongo, so only the remaining fields need to be listed.
+        return {field: 1 for field in sorted(self.fields) if field != 'id'}
+
+
+def requested(fields: Fieldset | None, field: str) -> bool:
+    return fields is None or field in fields
+
+
+def build(model: Type[BaseModel], fields: Fieldset | None, **values) -> BaseModel:
+    if fields is None:
+        return timed('hydrate', model, **values)
+    return timed('hydrate', fields.partial_model, **{name: value for name, value in values.items() if name in fields})
+
+
+def fieldset(model: Type[BaseModel]) -> Callable[..., Fieldset | None]:
+    def dependency(fields: str | None = Query(None, description="Campos separados por vírgula.")):
+        if fields is None:
+            return None
+
+        names = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = names - set(model.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(sorted(unknown))}.")
+        return Fieldset(model, names)
+
+    return dependency
@@ -0,0 +1,93 @@
+import argparse
+import logging
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.collation import Collation
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+from app.database import MongoRegistry, registry as default_registry
+
+logger = logging.getLogger(__name__)
+
+# Queries must pass the same collation for Mongo to use the case-insensitive email index.
+EMAIL_COLLATION = Collation(locale='en', strength=2)
+
+# Every filter the services run, with _id as the trailing key so keyset pages are served by the same index.
+INDEXES: Dict[str, List[IndexModel]] = {
+    'Users': [
+        IndexModel([('email', ASCENDING)], name='email_unique_ci', unique=True, collation=EMAIL_COLLATION),
+    ],
+    'Campaigns': [
+        IndexModel([('master', ASCENDING), ('_id', ASCENDING)], name='master_id'),
+        IndexModel([('players', ASCENDING), ('_id', ASCENDING)], name='players_id'),
+    ],
+    'Characters': [
+        IndexModel([('player', ASCENDING), ('_id', ASCENDING)], name='player_id'),
+        IndexModel([('campaign', ASCENDING), ('_id', ASCENDING)], name='campaign_id'),
+    ],
+}
+
+
+def ensure_indexes(registry: MongoRegistry = None) -> Dict[str, List[str]]:
+    registry = registry or default_registry
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        created[collection_name] = registry.get_collection(collection_name).create_indexes(indexes)
+    return created
+
+
+async def ensure_indexes_async(registry: MongoRegistry = None) -> Dict[str, List[str]]:
+    registry = registry or default_registry
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created[collection_name] = await registry.get_async_collection(collection_name).create_indexes(indexes)
+        except OperationFailure as e:
+            # A conflicting or unbuildable index must not keep the API from starting.
+            logger.error("Could not create indexes on %s: %s", collection_name, e)
+        except ConnectionFailure as e:
+            logger.error("Skipping index creation, database unreachable: %s", e)
+            break
+    return created
+
+
+def index_report(registry: MongoRegistry = None) -> Dict[str, Dict[str, Any]]:
+    registry = registry or default_registry
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = registry.get_collection(collection_name)
+        declared = {index.document['name'] for index in indexes}
+        existing = {index['name'] for index in collection.list_indexes()} - {'_id_'}
+        stats = {stat['name']: stat['accesses']['ops'] for stat in collection.aggregate([{'$indexStats': {}}])}
+
+        report[collection_name] = {
+            'missing': sorted(declared - existing),
+            'undeclared': sorted(existing - declared),
+            'unused': sorted(name for name in existing if stats.get(name, 0) == 0),
+            'accesses': {name: stats.get(name, 0) for name in sorted(existing)},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or inspect the indexes required by the services.")
+    parser.add_argument('command', choices=['ensure', 'report'])
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'ensure':
+            for collection_name, names in ensure_indexes().items():
+                print(f"{collection_name}: {', '.join(names)}")
+            return
+
+        for collection_name, report in index_report().items():
+            print(collection_name)
+            for key in ('missing', 'undeclared', 'unused'):
+                print(f"  {key}: {', '.join(report[key]) or '-'}")
+    finally:
+        default_registry.close()
+
+
+if __name__ == '__main__':
+    main()
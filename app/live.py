@@ -0,0 +1,137 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import orjson
+from starlette.websockets import WebSocket
+
+from config import Config
+
+RESYNC = {'type': 'resync'}
+
+
+def change(kind: str, _id: Any, version: int | None = None, changes: Dict[str, Any] | None = None,
+           removed: List[str] = ()) -> Dict[str, Any]:
+    # changes=None means "refetch": the update was not a field-level one, or could not be merged.
+    return {'type': kind, 'id': str(_id), 'action': 'updated', 'version': version, 'changes': changes,
+            'removed': list(removed)}
+
+
+def deletion(kind: str, _id: Any) -> Dict[str, Any]:
+    return {'type': kind, 'id': str(_id), 'action': 'deleted'}
+
+
+def under(path: str, parent: str) -> bool:
+    return path == parent or path.startswith(parent + '.')
+
+
+def coalesce(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    # Clients apply 'removed' and then 'changes' in order, so merged events must give the same result as both.
+    if older['action'] != 'updated' or newer['action'] != 'updated':
+        return newer
+    if older['changes'] is None or newer['changes'] is None:
+        return {**newer, 'changes': None, 'removed': []}
+
+    changes, removed = dict(older['changes']), list(older['removed'])
+    for path in newer['removed']:
+        if any(under(path, changed) and path != changed for changed in changes):
+            return {**newer, 'changes': None, 'removed': []}
+        changes = {changed: value for changed, value in changes.items() if not under(changed, path)}
+        removed = [gone for gone in removed if not under(gone, path)] + [path]
+    for path, value in newer['changes'].items():
+        changes = {changed: value for changed, value in changes.items() if not under(changed, path)}
+        removed = [gone for gone in removed if not under(gone, path)]
+        changes[path] = value
+    return {**newer, 'changes': changes, 'removed': removed}
+
+
+class Subscription:
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]):
+        if event is RESYNC:
+            self.resync()
+            return
+        key = (event['type'], event['id'])
+        older = self.pending.get(key)
+        if older is not None:
+            self.pending[key] = coalesce(older, event)
+        elif len(self.pending) >= self.max_pending:
+            # Too far behind: a single resync replaces the backlog, so a slow client never grows without bound.
+            self.resync()
+        else:
+            self.pending[key] = event
+        self.ready.set()
+
+    def resync(self):
+        # Whatever was pending is refetched by the client anyway.
+        self.pending = {('resync', ''): RESYNC}
+        self.ready.set()
+
+    async def next_batch(self) -> List[Dict[str, Any]]:
+        await self.ready.wait()
+        self.ready.clear()
+        batch, self.pending = list(self.pending.values()), {}
+        return batch
+
+
+class LiveHub:
+    def __init__(self, max_pending: int = None, local: bool = None):
+        self.max_pending = Config.LIVE_MAX_PENDING if max_pending is None else max_pending
+        # With change streams on, every worker publishes what the stream delivers instead of its own writes.
+        self.local = not Config.LIVE_CHANGE_STREAM if local is None else local
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+
+    def listening(self, campaign_id: Any) -> bool:
+        return self.local and bool(self.subscribers.get(str(campaign_id)))
+
+    @contextmanager
+    def subscribe(self, campaign_id: str) -> Iterator[Subscription]:
+        subscription = Subscription(self.max_pending)
+        self.subscribers.setdefault(campaign_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self.subscribers.get(campaign_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscribers.pop(campaign_id, None)
+
+    def publish(self, campaign_id: Any, event: Dict[str, Any]):
+        for subscription in self.subscribers.get(str(campaign_id), ()):
+            subscription.push(event)
+
+    def broadcast(self, event: Dict[str, Any]):
+        for subscriptions in self.subscribers.values():
+            for subscription in subscriptions:
+                subscription.push(event)
+
+    def notify(self, campaign_id: Any, event: Dict[str, Any]):
+        if self.listening(campaign_id):
+            self.publish(campaign_id, event)
+
+
+live_hub = LiveHub()
+
+
+async def wait_disconnect(websocket: WebSocket):
+    while (await websocket.receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+async def stream(websocket: WebSocket, subscription: Subscription):
+    # An idle subscriber is two parked tasks and an empty dict; nothing is queued per event beyond its coalesced entry.
+    disconnected = asyncio.ensure_future(wait_disconnect(websocket))
+    try:
+        while True:
+            batch = asyncio.ensure_future(subscription.next_batch())
+            await asyncio.wait({batch, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                batch.cancel()
+                return
+            await websocket.send_text(orjson.dumps(batch.result()).decode())
+    finally:
+        disconnected.cancel()
@@ -0,0 +1,103 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List
+
+BatchLoad = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+class Loader:
+    def __init__(self, batch_load: BatchLoad):
+        self.batch_load = batch_load
+        self.identity_map: Dict[str, asyncio.Future] = {}
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.batches = 0
+
+    def load(self, key: str) -> asyncio.Future:
+        future = self.identity_map.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.identity_map[key] = future
+            if not self.pending:
+                # Everything else requested before the loop comes back around joins the same batch.
+                loop.call_soon(lambda: asyncio.ensure_future(self.dispatch()))
+            self.pending[key] = future
+        return future
+
+    async def load_many(self, keys: Iterable[str]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in dict.fromkeys(keys))))
+
+    async def dispatch(self):
+        batch, self.pending = self.pending, {}
+        self.batches += 1
+        try:
+            values = await self.batch_load(list(batch))
+        except Exception as e:
+            for key, future in batch.items():
+                # Failed keys are forgotten so a later load in the same request can retry them.
+                if self.identity_map.get(key) is future:
+                    del self.identity_map[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def forget(self, key: str):
+        self.identity_map.pop(key, None)
+
+
+class RequestLoaders:
+    def __init__(self):
+        self.loaders: Dict[str, Loader] = {}
+
+    def get(self, name: str, batch_load: BatchLoad) -> Loader:
+        loader = self.loaders.get(name)
+        if loader is None:
+            loader = self.loaders[name] = Loader(batch_load)
+        return loader
+
+    def forget(self, name: str, key: str = None):
+        if key is None:
+            self.loaders.pop(name, None)
+        elif name in self.loaders:
+            self.loaders[name].forget(key)
+
+
+request_loaders: ContextVar[RequestLoaders | None] = ContextVar('request_loaders', default=None)
+
+
+@contextmanager
+def loader_scope() -> Iterator[RequestLoaders]:
+    loaders = RequestLoaders()
+    token = request_loaders.set(loaders)
+    try:
+        yield loaders
+    finally:
+        request_loaders.reset(token)
+
+
+def request_loader(name: str, batch_load: BatchLoad) -> Loader | None:
+    loaders = request_loaders.get()
+    return None if loaders is None else loaders.get(name, batch_load)
+
+
+def forget_loaded(name: str, key: str = None):
+    loaders = request_loaders.get()
+    if loaders is not None:
+        loaders.forget(name, key)
+
+
+class RequestLoadersMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+
+        with loader_scope():
+            await self.app(scope, receive, send)
@@ -0,0 +1,218 @@
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from app.cache import TTLCache, campaign_cache, user_cache
+from app.command_events import TrackedCommandListener, command_collection
+from app.compression import CompressionStats, compression_stats
+from app.database import MongoRegistry, registry
+from app.singleflight import SingleFlight, flights
+
+if TYPE_CHECKING:
+    from prometheus_client import CollectorRegistry
+
+UNMATCHED_ROUTE = 'unmatched'
+MONGO_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+
+def route_template(scope) -> str:
+    # Labels use the route template (/campaigns/{campaign_id}) so ids never turn into new time series.
+    app = scope.get('app')
+    partial = None
+    for route in getattr(getattr(app, 'router', None), 'routes', []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class RequestMetrics:
+    def __init__(self, registry: 'CollectorRegistry'):
+        from prometheus_client import Counter, Gauge, Histogram
+
+        self.requests = Counter('http_requests', "HTTP responses by route template and status code.",
+                                ['method', 'route', 'status'], registry=registry)
+        self.latency = Histogram('http_request_duration_seconds', "HTTP request latency by route template.",
+                                 ['method', 'route'], registry=registry)
+        self.in_progress = Gauge('http_requests_in_progress', "HTTP requests currently being served.",
+                                 ['method', 'route'], registry=registry)
+
+
+class CommandInstruments:
+    def __init__(self, registry: 'CollectorRegistry'):
+        from prometheus_client import Counter, Histogram
+
+        self.latency = Histogram('mongo_command_duration_seconds', "MongoDB command latency by collection.",
+                                 ['collection', 'command'], buckets=MONGO_BUCKETS, registry=registry)
+        self.failures = Counter('mongo_command_failures', "Failed MongoDB commands by collection.",
+                                ['collection', 'command'], registry=registry)
+
+
+class CommandMetrics(TrackedCommandListener):
+    # Without a registry the listener records into the default metrics, built by the first command it sees.
+    def __init__(self, registry: 'CollectorRegistry' = None):
+        super().__init__()
+        self.instruments = None if registry is None else CommandInstruments(registry)
+
+    def started_command(self, event: monitoring.CommandStartedEvent) -> str:
+        return command_collection(event.command_name, event.command)
+
+    def finished(self, event, collection: str | None, succeeded: bool):
+        instruments = self.instruments or default_metrics.get().commands
+        collection = collection or ''
+        instruments.latency.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        if not succeeded:
+            instruments.failures.labels(collection, event.command_name).inc()
+
+
+class CompressionCollector:
+    # Reads the running totals at scrape time so the compression path only pays for one dict update.
+    def __init__(self, stats: CompressionStats):
+        self.stats = stats
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily
+
+        families = {
+            key: CounterMetricFamily(name, documentation, labels=['route', 'encoding'])
+            for key, name, documentation in (
+                ('responses', 'http_compression_responses', "Compressed HTTP responses by route template."),
+                ('bytes_in', 'http_compression_input_bytes', "Bytes handed to the compressor by route template."),
+                ('bytes_out', 'http_compression_output_bytes', "Bytes sent after compression by route template."),
+                ('bytes_saved', 'http_compression_saved_bytes', "Bytes saved by compression by route template."),
+                ('cpu_seconds', 'http_compression_cpu_seconds', "Time spent compressing by route template."),
+            )
+        }
+        for entry in self.stats.stats():
+            for key, family in families.items():
+                family.add_metric([entry['route'], entry['encoding']], entry[key])
+        return list(families.values())
+
+
+class CacheCollector:
+    def __init__(self, caches: dict[str, TTLCache]):
+        self.caches = caches
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        size = GaugeMetricFamily('cache_entries', "Entries held by each in-process cache.", labels=['cache'])
+        counters = {
+            key: CounterMetricFamily(f'cache_{key}', f"Cache {key} by cache name.", labels=['cache'])
+            for key in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+        }
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            size.add_metric([name], stats['size'])
+            for key, family in counters.items():
+                family.add_metric([name], stats[key])
+        return [size, *counters.values()]
+
+
+class SingleFlightCollector:
+    def __init__(self, flights: SingleFlight):
+        self.flights = flights
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        stats = self.flights.stats()
+        executions = CounterMetricFamily('single_flight_executions', "Reads that ran a query, by service method.",
+                                         labels=['method'])
+        coalesced = CounterMetricFamily('single_flight_coalesced', "Reads that joined one already running.",
+                                        labels=['method'])
+        for name, counts in stats['methods'].items():
+            executions.add_metric([name], counts['executions'])
+            coalesced.add_metric([name], counts['coalesced'])
+        in_flight = GaugeMetricFamily('single_flight_in_flight', "Shared reads currently running.",
+                                      value=stats['in_flight'])
+        return [executions, coalesced, in_flight]
+
+
+class MongoRegistryCollector:
+    def __init__(self, mongo: MongoRegistry):
+        self.mongo = mongo
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        stats = self.mongo.stats()
+        return [
+            GaugeMetricFamily('mongo_clients', "MongoDB clients open in this process.", value=stats['clients']),
+            CounterMetricFamily('mongo_clients_created', "MongoDB clients created in this process.",
+                                value=stats['clients_created']),
+            GaugeMetricFamily('mongo_pools', "Open MongoDB connection pools.", value=stats['pools']),
+            GaugeMetricFamily('mongo_connections', "Open MongoDB connections across all pools.",
+                              value=stats['connections']),
+        ]
+
+
+class DefaultMetrics:
+    # prometheus_client is loaded by the first request, command or scrape rather than by `import main`.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.registry = None
+        self.requests = None
+        self.commands = None
+
+    def get(self) -> 'DefaultMetrics':
+        if self.registry is None:
+            with self.lock:
+                if self.registry is None:
+                    from prometheus_client import CollectorRegistry
+
+                    metrics_registry = CollectorRegistry()
+                    self.requests = RequestMetrics(metrics_registry)
+                    self.commands = CommandInstruments(metrics_registry)
+                    metrics_registry.register(CompressionCollector(compression_stats))
+                    metrics_registry.register(CacheCollector({'user': user_cache, 'campaign': campaign_cache}))
+                    metrics_registry.register(SingleFlightCollector(flights))
+                    metrics_registry.register(MongoRegistryCollector(registry))
+                    self.registry = metrics_registry
+        return self
+
+
+default_metrics = DefaultMetrics()
+command_metrics = CommandMetrics()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics: RequestMetrics = None):
+        self.app = app
+        self.metrics = default_metrics.get().requests if metrics is None else metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        method, route = scope['method'], route_template(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        in_progress = self.metrics.in_progress.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.latency.labels(method, route).observe(time.perf_counter() - started)
+            self.metrics.requests.labels(method, route, str(status)).inc()
+            in_progress.dec()
+
+
+async def metrics_endpoint(_: Request) -> Response:
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    return Response(generate_latest(default_metrics.get().registry), media_type=CONTENT_TYPE_LATEST)
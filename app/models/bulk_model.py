@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Generic, List, Literal, TypeVar, Union
+
+MAX_BULK_OPERATIONS = 1000
+
+CreateT = TypeVar('CreateT', bound=BaseModel)
+UpdateT = TypeVar('UpdateT', bound=BaseModel)
+
+
+class BulkCreate(BaseModel, Generic[CreateT]):
+    op: Literal['create']
+    data: CreateT
+
+
+class BulkUpdate(BaseModel, Generic[UpdateT]):
+    op: Literal['update']
+    id: str
+    data: UpdateT
+
+
+class BulkDelete(BaseModel):
+    op: Literal['delete']
+    id: str
+
+
+class BulkRequest(BaseModel, Generic[CreateT, UpdateT]):
+    ordered: bool = True
+    operations: List[Annotated[Union[BulkCreate[CreateT], BulkUpdate[UpdateT], BulkDelete],
+                               Field(discriminator='op')]] = Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    id: str | None = None
+    detail: str | None = None
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List
 
+from app.models.bulk_model import BulkCreate, BulkDelete, BulkRequest, BulkUpdate
 from app.models.character_sheet_model import CharacterSheet
 from app.models.user_model import User
 
@@ -28,3 +29,7 @@ class CampaignUpdate(BaseModel):
     master: str = None
     players: List[str] = None
     character_sheet: CharacterSheet = None
+
+
+CampaignBulkOperation = BulkCreate[CampaignCreate] | BulkUpdate[CampaignUpdate] | BulkDelete
+CampaignBulkRequest = BulkRequest[CampaignCreate, CampaignUpdate]
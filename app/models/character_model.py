@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Dict, Any
+from app.models.bulk_model import BulkCreate, BulkDelete, BulkRequest, BulkUpdate
 from app.models.user_model import User
 from app.models.campaign_model import Campaign
 
@@ -21,3 +22,7 @@ class CharacterUpdate(BaseModel):
     player: str = None
     campaign: str = None
     player_character_sheet: Dict[str, Any] = None
+
+
+CharacterBulkOperation = BulkCreate[CharacterCreate] | BulkUpdate[CharacterUpdate] | BulkDelete
+CharacterBulkRequest = BulkRequest[CharacterCreate, CharacterUpdate]
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field, StrictFloat, StrictInt, model_validator
+from typing import Annotated, Any, List, Literal, Union
+
+from app.models.bulk_model import MAX_BULK_OPERATIONS
+
+MAX_SHEET_OPERATIONS = 100
+# A dotted path inside player_character_sheet: up to 8 segments, none empty or starting with '$'.
+SHEET_PATH_PATTERN = r'^[^.$\x00][^.\x00]*(\.[^.$\x00][^.\x00]*){0,7}$'
+
+SheetPath = Annotated[str, Field(pattern=SHEET_PATH_PATTERN, max_length=256)]
+
+
+class SheetSet(BaseModel):
+    op: Literal['set']
+    path: SheetPath
+    value: Any
+
+
+class SheetUnset(BaseModel):
+    op: Literal['unset']
+    path: SheetPath
+
+
+class SheetIncrement(BaseModel):
+    op: Literal['inc']
+    path: SheetPath
+    value: StrictInt | StrictFloat
+
+
+SheetOperation = Annotated[Union[SheetSet, SheetUnset, SheetIncrement], Field(discriminator='op')]
+
+
+class CharacterSheetPatch(BaseModel):
+    operations: List[SheetOperation] = Field(min_length=1, max_length=MAX_SHEET_OPERATIONS)
+
+    @model_validator(mode='after')
+    def paths_do_not_overlap(self):
+        # Mongo rejects an update touching both a field and one of its parents, so it is reported here instead.
+        paths = sorted(tuple(operation.path.split('.')) for operation in self.operations)
+        for path, following in zip(paths, paths[1:]):
+            if following[:len(path)] == path:
+                raise ValueError(f"Operações conflitantes nos caminhos '{'.'.join(path)}' e '{'.'.join(following)}'.")
+        return self
+
+
+class SheetDelta(CharacterSheetPatch):
+    op: Literal['patch'] = 'patch'
+    id: str
+
+
+class SheetDeltaRequest(BaseModel):
+    deltas: List[SheetDelta] = Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
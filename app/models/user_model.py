@@ -1,5 +1,7 @@
 from pydantic import BaseModel, EmailStr
 
+from app.models.bulk_model import BulkCreate, BulkDelete, BulkRequest, BulkUpdate
+
 
 class User(BaseModel):
     id: str
@@ -15,3 +17,7 @@ class UserCreate(BaseModel):
 class UserUpdate(BaseModel):
     name: str = None
     email: EmailStr = None
+
+
+UserBulkOperation = BulkCreate[UserCreate] | BulkUpdate[UserUpdate] | BulkDelete
+UserBulkRequest = BulkRequest[UserCreate, UserUpdate]
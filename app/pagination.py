@@ -0,0 +1,71 @@
+import base64
+import binascii
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, Request, Response
+from pymongo import ASCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(object_id: str) -> str:
+    return base64.urlsafe_b64encode(ObjectId(object_id).binary).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return str(ObjectId(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def page_query(query: dict, after: str | None) -> dict:
+    if after is None:
+        return query
+    return {**query, '_id': {'$gt': ObjectId(after)}}
+
+
+def page_cursor(cursor, limit: int | None, after: str | None):
+    # Keyset pages are ordered by _id so that {'_id': {'$gt': after}} resumes exactly where the last page ended.
+    if limit is None and after is None:
+        return cursor
+    cursor = cursor.sort('_id', ASCENDING)
+    return cursor if limit is None else cursor.limit(limit)
+
+
+def page_stages(query: dict, limit: int | None, after: str | None) -> list[dict]:
+    stages = [{'$match': page_query(query, after)}]
+    if limit is not None or after is not None:
+        stages.append({'$sort': {'_id': ASCENDING}})
+    if limit is not None:
+        stages.append({'$limit': limit})
+    return stages
+
+
+class PageParams:
+    def __init__(self,
+                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                 after: str | None = Query(None),
+                 all_items: bool = Query(False, alias='all')):
+        self.limit = None if all_items else limit
+        try:
+            self.after = None if after is None else decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+    @property
+    def fetch_limit(self) -> int | None:
+        # One extra document tells us whether a next page exists without a separate count.
+        return None if self.limit is None else self.limit + 1
+
+    def finish(self, items: list, request: Request, response: Response) -> list:
+        if self.limit is None or len(items) <= self.limit:
+            return items
+
+        items = items[:self.limit]
+        cursor = encode_cursor(items[-1].id)
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = f'<{request.url.include_query_params(after=cursor)}>; rel="next"'
+        return items
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+from app.database import MongoRegistry, registry as default_registry
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 30.0
+
+
+class Readiness:
+    def __init__(self):
+        self.database = False
+        self.schemas = False
+        self.error: str | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.database and self.schemas
+
+    def reset(self):
+        self.database = False
+        self.schemas = False
+        self.error = None
+
+
+readiness = Readiness()
+
+
+def warm_schemas(app: FastAPI):
+    # Built once here instead of on the first /docs or /openapi.json request; FastAPI keeps it in app.openapi_schema.
+    app.openapi()
+    readiness.schemas = True
+
+
+async def prewarm(registry: MongoRegistry = None, connections: int = None):
+    registry = registry or default_registry
+    connections = Config.PREWARM_CONNECTIONS if connections is None else connections
+    database = registry.get_async_client().admin
+    # Concurrent pings each check out their own connection, so DNS, TLS and the handshakes all happen here.
+    await asyncio.gather(*(database.command('ping') for _ in range(max(1, connections))))
+
+
+async def warm_up(registry: MongoRegistry = None, connections: int = None, retry_delay: float = 1.0):
+    delay = retry_delay
+    while True:
+        try:
+            await prewarm(registry, connections)
+        except PyMongoError as e:
+            readiness.error = str(e)
+            logger.error("Database not reachable yet, retrying in %.0f s: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            continue
+        readiness.database = True
+        readiness.error = None
+        return
+
+
+async def ready() -> JSONResponse:
+    if readiness.ready:
+        return JSONResponse({'status': 'ready'})
+    detail = "Banco de dados indisponível." if not readiness.database else "Aplicação inicializando."
+    return JSONResponse({'status': 'starting', 'detail': detail}, status_code=503)
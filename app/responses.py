@@ -0,0 +1,28 @@
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.fieldsets import Fieldset
+from config import Config
+
+
+def dump_model(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ModelResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=dump_model)
+
+
+def respond(content: Any, response: Response, fields: Fieldset | None = None) -> Any:
+    # Services already return validated models, so the route's response_model pass only re-validates them.
+    # Partial models never match response_model and always take this path.
+    if fields is None and not Config.FAST_RESPONSES:
+        return content
+    return ModelResponse(content, headers=dict(response.headers))
@@ -0,0 +1,59 @@
+import argparse
+import importlib.util
+import logging
+
+import uvicorn
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Optional accelerators: each falls back to the pure-Python implementation when its package is missing.
+ACCELERATORS = {'loop': ('uvloop', 'uvloop', 'asyncio'), 'http': ('httptools', 'httptools', 'h11')}
+
+
+def implementation(kind: str, requested: str) -> str:
+    name, package, fallback = ACCELERATORS[kind]
+    if requested == name and importlib.util.find_spec(package) is None:
+        logger.warning("%s is not installed, using %s instead.", package, fallback)
+        return fallback
+    return requested
+
+
+def server_options(workers: int = None, host: str = None, port: int = None, loop: str = None, http: str = None,
+                   keep_alive: int = None, backlog: int = None) -> dict:
+    return {
+        'host': Config.HOST if host is None else host,
+        'port': Config.PORT if port is None else port,
+        'workers': Config.WORKERS if workers is None else workers,
+        'loop': implementation('loop', Config.EVENT_LOOP if loop is None else loop),
+        'http': implementation('http', Config.HTTP_PARSER if http is None else http),
+        'timeout_keep_alive': Config.KEEP_ALIVE_SECONDS if keep_alive is None else keep_alive,
+        'backlog': Config.BACKLOG if backlog is None else backlog,
+    }
+
+
+def serve(app: str = 'main:app', **options):
+    # The app is passed as an import string, so every worker process imports it itself and builds its own Mongo
+    # clients on first use; nothing connected in this process is inherited by the workers.
+    uvicorn.run(app, **server_options(**options))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with uvicorn workers.")
+    parser.add_argument('--app', default='main:app')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--loop', choices=['auto', 'asyncio', 'uvloop'])
+    parser.add_argument('--http', choices=['auto', 'h11', 'httptools'])
+    parser.add_argument('--keep-alive', type=int, help='seconds an idle keep-alive connection stays open')
+    parser.add_argument('--backlog', type=int)
+    args = parser.parse_args()
+
+    serve(args.app, workers=args.workers, host=args.host, port=args.port, loop=args.loop, http=args.http,
+          keep_alive=args.keep_alive, backlog=args.backlog)
+
+
+if __name__ == '__main__':
+    main()
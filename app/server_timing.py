@@ -0,0 +1,126 @@
+import inspect
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+from app.command_events import TrackedCommandListener, command_collection
+from config import Config
+
+TIMING_REQUEST_HEADER = b'x-server-timing'
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations: Dict[str, float] = defaultdict(float)
+        # Mongo replies for one request can be reported from several driver threads at once.
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.durations[name] += seconds
+
+    def header(self) -> str:
+        with self.lock:
+            durations = dict(self.durations)
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in durations.items())
+
+
+request_timings: ContextVar[RequestTimings | None] = ContextVar('request_timings', default=None)
+
+
+def timed(metric: str, function: Callable[..., Any], /, *args, **kwargs) -> Any:
+    timings = request_timings.get()
+    if timings is None:
+        return function(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings.add(metric, time.perf_counter() - started)
+
+
+class ServerTimingListener(TrackedCommandListener):
+    def started_command(self, event: monitoring.CommandStartedEvent) -> Tuple[RequestTimings, str] | None:
+        timings = request_timings.get()
+        if timings is None:
+            return None
+        return timings, command_collection(event.command_name, event.command) or event.database_name
+
+    def finished(self, event, started: Tuple[RequestTimings, str] | None, succeeded: bool):
+        if started is not None:
+            timings, collection = started
+            timings.add(f'mongo-{collection}', event.duration_micros / 1e6)
+
+
+server_timing_listener = ServerTimingListener()
+
+
+class TimedRoute(APIRoute):
+    # handler is the endpoint itself; serialize is the rest of the route (validation, dependencies, rendering).
+    def get_route_handler(self) -> Callable:
+        endpoint = self.dependant.call
+
+        async def timed_endpoint(*args, **kwargs):
+            timings = request_timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.add('handler', time.perf_counter() - started)
+
+        if inspect.iscoroutinefunction(endpoint):
+            self.dependant.call = timed_endpoint
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = request_timings.get()
+            if timings is None:
+                return await handler(request)
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                route_seconds = time.perf_counter() - started
+                timings.add('serialize', route_seconds - timings.durations.get('handler', 0.0))
+
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app, sample_rate: float = None):
+        self.app = app
+        self.sample_rate = Config.SERVER_TIMING_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def enabled(self, scope) -> bool:
+        for name, value in scope['headers']:
+            if name == TIMING_REQUEST_HEADER:
+                return value.strip().lower() in (b'1', b'true', b'on')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled(scope):
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timings(message):
+            if message['type'] == 'http.response.start':
+                timings.add('total', time.perf_counter() - started)
+                message['headers'] = [*message.get('headers', []),
+                                      (b'server-timing', timings.header().encode('latin-1'))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
@@ -0,0 +1,114 @@
+from typing import Any, List, Mapping
+
+from app.fieldsets import Fieldset, build, requested
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character
+from app.models.user_model import User
+from app.pagination import page_stages
+
+
+def projection_stages(fields: Fieldset = None) -> List[dict]:
+    # The version stamps stay in sparse documents too, since the ETag is computed from the documents served.
+    return [] if fields is None else [{'$project': {**fields.projection(), 'version': 1, 'updated_at': 1}}]
+
+
+def campaign_lookup_stages(fields: Fieldset = None) -> List[dict]:
+    stages = []
+    if requested(fields, 'master'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'master', 'foreignField': '_id',
+                                   'as': 'master_user'}})
+    if requested(fields, 'players'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'players', 'foreignField': '_id',
+                                   'as': 'player_users'}})
+    return stages
+
+
+def campaigns_pipeline(query: Mapping[str, Any], limit: int = None, after: str = None,
+                       fields: Fieldset = None) -> List[dict]:
+    return [*page_stages(query, limit, after), *projection_stages(fields), *campaign_lookup_stages(fields)]
+
+
+def characters_pipeline(query: Mapping[str, Any], limit: int = None, after: str = None,
+                        fields: Fieldset = None) -> List[dict]:
+    stages = [*page_stages(query, limit, after), *projection_stages(fields)]
+    if requested(fields, 'player'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'player', 'foreignField': '_id',
+                                   'as': 'player_user'}})
+    if requested(fields, 'campaign'):
+        stages.append({'$lookup': {'from': 'Campaigns', 'localField': 'campaign', 'foreignField': '_id',
+                                   'as': 'campaign_document', 'pipeline': campaign_lookup_stages()}})
+    return stages
+
+
+def version_stage(*keep: str) -> dict:
+    # Documents written before versioning default to version 0 and the creation time embedded in their _id.
+    return {'$project': {
+        'version': {'$ifNull': ['$version', 0]},
+        'updated_at': {'$ifNull': ['$updated_at', {'$toDate': '$_id'}]},
+        **{field: 1 for field in keep},
+    }}
+
+
+# The version pipelines join what the data pipelines join for the same fields, so both yield the same stamps.
+def campaign_version_lookup_stages(fields: Fieldset = None) -> List[dict]:
+    stages = []
+    if requested(fields, 'master'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'master', 'foreignField': '_id',
+                                   'as': 'master_user', 'pipeline': [version_stage()]}})
+    if requested(fields, 'players'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'players', 'foreignField': '_id',
+                                   'as': 'player_users', 'pipeline': [version_stage()]}})
+    return stages
+
+
+def campaign_versions_pipeline(query: Mapping[str, Any], limit: int = None, after: str = None,
+                               fields: Fieldset = None) -> List[dict]:
+    return [*page_stages(query, limit, after), version_stage('master', 'players'),
+            *campaign_version_lookup_stages(fields)]
+
+
+def character_versions_pipeline(query: Mapping[str, Any], limit: int = None, after: str = None,
+                                fields: Fieldset = None) -> List[dict]:
+    stages = [*page_stages(query, limit, after), version_stage('player', 'campaign')]
+    if requested(fields, 'player'):
+        stages.append({'$lookup': {'from': 'Users', 'localField': 'player', 'foreignField': '_id',
+                                   'as': 'player_user', 'pipeline': [version_stage()]}})
+    if requested(fields, 'campaign'):
+        stages.append({'$lookup': {'from': 'Campaigns', 'localField': 'campaign', 'foreignField': '_id',
+                                   'as': 'campaign_document',
+                                   'pipeline': [version_stage('master', 'players'),
+                                                *campaign_version_lookup_stages()]}})
+    return stages
+
+
+def user_from_document(user: Mapping[str, Any] | None, fields: Fieldset = None) -> User | None:
+    if user is None:
+        return None
+    return build(User, fields, id=str(user['_id']), name=user.get('name'), email=user.get('email'))
+
+
+def campaign_from_document(campaign: Mapping[str, Any], fields: Fieldset = None) -> Campaign:
+    # $lookup returns matches in Users order, so players are put back in the order stored on the campaign.
+    users = campaign.get('master_user', []) + campaign.get('player_users', [])
+    user_map = {user['_id']: user for user in users}
+    return build(
+        Campaign, fields,
+        id=str(campaign['_id']),
+        name=campaign.get('name'),
+        description=campaign.get('description'),
+        master=user_from_document(user_map.get(campaign.get('master'))),
+        players=[user_from_document(user_map.get(player_id)) for player_id in campaign.get('players', [])],
+        character_sheet=campaign.get('character_sheet')
+    )
+
+
+def character_from_document(character: Mapping[str, Any], fields: Fieldset = None) -> Character:
+    player = character['player_user'][0] if character.get('player_user') else None
+    campaign = character['campaign_document'][0] if character.get('campaign_document') else None
+    return build(
+        Character, fields,
+        id=str(character['_id']),
+        player=user_from_document(player),
+        campaign=None if campaign is None else campaign_from_document(campaign),
+        player_character_sheet=character.get('player_character_sheet')
+    )
@@ -0,0 +1,309 @@
+from bson import ObjectId
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Any, Set, Tuple
+from pydantic import ValidationError
+from config import Config
+
+from app.cache import TTLCache, campaign_cache as default_campaign_cache, versioned_key
+from app.conditional import Stamp, documents_stamps, new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
+from app.fieldsets import Fieldset, build, requested
+from app.live import change, deletion, live_hub
+from app.loaders import forget_loaded, loader_scope, request_loader
+from app.models.bulk_model import BulkDelete, BulkItemResult
+from app.models.campaign_model import Campaign, CampaignBulkOperation, CampaignCreate, CampaignUpdate
+from app.pagination import page_cursor, page_query
+from app.streaming import STREAM_BATCH_SIZE, batched
+from app.singleflight import single_flight
+from app.tracing import traced
+from app.services.aggregations import campaign_from_document, campaign_versions_pipeline, campaigns_pipeline
+from app.services.async_user_service import AsyncUserService
+from app.services.bulk import BulkWriter, object_ids, target_ids
+
+
+def campaign_document(campaign: CampaignCreate | CampaignUpdate) -> dict:
+    document = {k: v for k, v in campaign.model_dump().items() if v is not None}
+    if 'master' in document:
+        document['master'] = ObjectId(document['master'])
+    if 'players' in document:
+        document['players'] = [ObjectId(player) for player in document['players']]
+    return document
+
+
+@traced
+class AsyncCampaignService:
+    bulk_writer = BulkWriter(
+        {'create': "Campanha cadastrada com sucesso!", 'update': "Campanha atualizada com sucesso!",
+         'delete': "Campanha excluída com sucesso."},
+        not_found="Campanha não encontrada."
+    )
+
+    def __init__(self, registry: MongoRegistry = None, user_service: AsyncUserService = None,
+                 use_lookup: bool = None, cache: TTLCache = None):
+        self.registry = registry or default_registry
+        self.campaigns_collection = None
+        self.user_service = user_service or AsyncUserService(self.registry)
+        self.use_lookup = Config.USE_LOOKUP_AGGREGATION if use_lookup is None else use_lookup
+        self.cache = default_campaign_cache if cache is None else cache
+
+    def get_db(self):
+        if self.campaigns_collection is None:
+            self.campaigns_collection = self.registry.get_async_collection('Campaigns')
+        return self.campaigns_collection
+
+    @single_flight
+    async def get_all_campaigns(self, limit: int = None, after: str = None,
+                                fields: Fieldset = None) -> List[Campaign] | None:
+        return await self.find_campaigns({}, limit, after, fields)
+
+    async def stream_campaigns(self, after: str = None, batch_size: int = STREAM_BATCH_SIZE,
+                               fields: Fieldset = None) -> AsyncIterator[Campaign]:
+        campaigns_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        cursor = page_cursor(campaigns_collection.find(page_query({}, after), projection, batch_size=batch_size),
+                             None, after)
+
+        async for campaigns in batched(cursor, batch_size):
+            # A scope per batch: the request's identity map would otherwise keep every user streamed.
+            with loader_scope():
+                campaigns = await self.get_campaigns_with_users(campaigns, fields)
+            for campaign in campaigns:
+                yield campaign
+
+    @single_flight
+    async def get_campaigns_by_master(self, campaign_master: str, limit: int = None, after: str = None,
+                                      fields: Fieldset = None) -> List[Campaign] | None:
+        return await self.find_campaigns({'master': ObjectId(campaign_master)}, limit, after, fields)
+
+    @single_flight
+    async def get_campaigns_by_player(self, campaign_player: str, limit: int = None, after: str = None,
+                                      fields: Fieldset = None) -> List[Campaign] | None:
+        return await self.find_campaigns({'players': ObjectId(campaign_player)}, limit, after, fields)
+
+    @single_flight
+    async def get_campaign_by_id(self, campaign_id: str, fields: Fieldset = None) -> Campaign | None:
+        if fields is None:
+            hit, cached_campaign = self.cache.get(str(campaign_id))
+            if hit:
+                return cached_campaign
+
+        campaigns = await self.aggregate_campaigns({'_id': ObjectId(campaign_id)}, fields=fields)
+
+        if not campaigns:
+            return None
+        if fields is None:
+            self.cache.set(campaigns[0].id, campaigns[0])
+        return campaigns[0]
+
+    @single_flight
+    async def get_versioned_campaign(self, campaign_id: str, fields: Fieldset = None,
+                                     cached: bool = True) -> Tuple[Campaign | None, List[Stamp]]:
+        if fields is None and cached:
+            hit, versioned_campaign = self.cache.get(versioned_key(campaign_id))
+            if hit:
+                return versioned_campaign
+
+        campaigns, stamps = await self.aggregate_versioned_campaigns({'_id': ObjectId(campaign_id)}, fields=fields)
+
+        if not campaigns:
+            return None, []
+        if fields is None:
+            self.cache.set(versioned_key(campaign_id), (campaigns[0], stamps))
+        return campaigns[0], stamps
+
+    @single_flight
+    async def get_versioned_campaigns_by_master(self, campaign_master: str, limit: int = None, after: str = None,
+                                                fields: Fieldset = None) -> Tuple[List[Campaign], List[Stamp]]:
+        return await self.aggregate_versioned_campaigns({'master': ObjectId(campaign_master)}, limit, after, fields)
+
+    @single_flight
+    async def get_versioned_campaigns_by_player(self, campaign_player: str, limit: int = None, after: str = None,
+                                                fields: Fieldset = None) -> Tuple[List[Campaign], List[Stamp]]:
+        return await self.aggregate_versioned_campaigns({'players': ObjectId(campaign_player)}, limit, after, fields)
+
+    @single_flight
+    async def get_campaigns_by_ids(self, campaign_ids: List[str]) -> List[Campaign] | None:
+        ids = list(dict.fromkeys(map(str, campaign_ids)))
+        loader = request_loader('campaigns', self.load_campaigns)
+        if loader is None:
+            campaigns = await self.load_campaigns(ids)
+            return [campaigns[campaign_id] for campaign_id in ids if campaign_id in campaigns]
+        return [campaign for campaign in await loader.load_many(ids) if campaign is not None]
+
+    async def load_campaigns(self, campaign_ids: List[str]) -> Dict[str, Campaign]:
+        cached_campaigns, missing_ids = self.cache.get_many(campaign_ids)
+        if not missing_ids:
+            return cached_campaigns
+
+        campaign_object_ids = list(map(ObjectId, missing_ids))
+        campaigns = await self.find_campaigns({'_id': {"$in": campaign_object_ids}})
+
+        campaigns = {campaign.id: campaign for campaign in campaigns}
+        self.cache.set_many(campaigns)
+        return {**cached_campaigns, **campaigns}
+
+    async def find_campaigns(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                             fields: Fieldset = None) -> List[Campaign]:
+        if self.use_lookup:
+            return await self.aggregate_campaigns(query, limit, after, fields)
+
+        campaigns_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        cursor = page_cursor(campaigns_collection.find(page_query(query, after), projection), limit, after)
+        campaigns = await cursor.to_list(length=None)
+
+        if not campaigns:
+            return []
+        return await self.get_campaigns_with_users(campaigns, fields)
+
+    @single_flight
+    async def get_campaign_versions(self, campaign_id: str, fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        return await self.find_campaign_versions({'_id': ObjectId(campaign_id)}, fields=fields)
+
+    @single_flight
+    async def get_campaign_versions_by_master(self, campaign_master: str, limit: int = None, after: str = None,
+                                              fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        return await self.find_campaign_versions({'master': ObjectId(campaign_master)}, limit, after, fields)
+
+    @single_flight
+    async def get_campaign_versions_by_player(self, campaign_player: str, limit: int = None, after: str = None,
+                                              fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        return await self.find_campaign_versions({'players': ObjectId(campaign_player)}, limit, after, fields)
+
+    async def find_campaign_versions(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                     fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        campaigns_collection = self.get_db()
+        pipeline = campaign_versions_pipeline(query, limit, after, fields)
+        return await campaigns_collection.aggregate(pipeline).to_list(length=None)
+
+    async def existing_ids(self, campaign_ids: Iterable[str]) -> Set[str]:
+        # Always asks the database: the identity cache is per process, so another worker's delete may not be in it.
+        ids = object_ids(map(str, campaign_ids))
+        if not ids:
+            return set()
+
+        campaigns_collection = self.get_db()
+        documents = await campaigns_collection.find({'_id': {"$in": ids}}, {'_id': 1}).to_list(length=None)
+        return {str(document['_id']) for document in documents}
+
+    async def create_campaign(self, campaign: CampaignCreate) -> dict[str, str] | None:
+        campaigns_collection = self.get_db()
+
+        try:
+            new_campaign = campaign_document(campaign)
+            result = await campaigns_collection.insert_one({**new_campaign, **new_version()})
+
+            return {"detail": "Campanha cadastrada com sucesso!", "id": str(result.inserted_id)}
+        except ValidationError as e:
+            print(f"Validation Error: {e}")
+            raise
+
+    async def update_campaign(self, campaign_id: str, campaign: CampaignUpdate) -> dict[str, str] | None:
+        campaigns_collection = self.get_db()
+
+        update_data = campaign_document(campaign)
+
+        updated_campaign = await campaigns_collection.find_one_and_update(
+            {'_id': ObjectId(campaign_id)},
+            versioned_update(update_data),
+            return_document=True
+        )
+
+        self.forget(campaign_id)
+
+        if updated_campaign is None:
+            return None
+        live_hub.notify(campaign_id, change('campaign', campaign_id, updated_campaign.get('version')))
+        return {"detail": "Campanha atualizada com sucesso!", "id": str(updated_campaign['_id'])}
+
+    async def delete_campaign(self, campaign_id: str) -> bool:
+        campaigns_collection = self.get_db()
+
+        result = await campaigns_collection.delete_one({'_id': ObjectId(campaign_id)})
+        self.forget(campaign_id)
+
+        if result.deleted_count > 0:
+            live_hub.notify(campaign_id, deletion('campaign', campaign_id))
+        return result.deleted_count > 0
+
+    async def bulk_write(self, operations: List[CampaignBulkOperation],
+                         ordered: bool = True) -> List[BulkItemResult]:
+        campaigns_collection = self.get_db()
+        targets = target_ids(operations)
+        existing = await self.existing_ids(targets)
+
+        # Every master and player referenced by the batch is checked with a single query.
+        user_ids = set()
+        for operation in operations:
+            if not isinstance(operation, BulkDelete):
+                user_ids.update(filter(None, [operation.data.master, *(operation.data.players or [])]))
+        existing_users = await self.user_service.existing_ids(user_ids)
+
+        rejections = {}
+        for index, operation in enumerate(operations):
+            result = self.bulk_writer.check_target(index, operation, existing)
+            if result is None and not isinstance(operation, BulkDelete):
+                if operation.data.master is not None and operation.data.master not in existing_users:
+                    result = self.bulk_writer.reject(index, operation, "O mestre dessa campanha não foi encontrado.")
+                elif not set(operation.data.players or []) <= existing_users:
+                    result = self.bulk_writer.reject(
+                        index, operation, "Um ou mais jogadores dessa campanha não foram encontrados.")
+            if result is not None:
+                rejections[index] = result
+
+        try:
+            results = await self.bulk_writer.execute(campaigns_collection, operations, ordered, rejections,
+                                                     lambda operation: campaign_document(operation.data))
+        finally:
+            for campaign_id in targets:
+                self.forget(campaign_id)
+
+        for result in results:
+            if result.status == 200:
+                event = deletion('campaign', result.id) if result.op == 'delete' else change('campaign', result.id)
+                live_hub.notify(result.id, event)
+        return results
+
+    def forget(self, campaign_id: str):
+        self.cache.invalidate(str(campaign_id))
+        self.cache.invalidate(versioned_key(campaign_id))
+        forget_loaded('campaigns', str(campaign_id))
+
+    async def aggregate_campaigns(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                  fields: Fieldset = None) -> List[Campaign]:
+        campaigns, _ = await self.aggregate_versioned_campaigns(query, limit, after, fields)
+        return campaigns
+
+    async def aggregate_versioned_campaigns(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                            fields: Fieldset = None) -> Tuple[List[Campaign], List[Stamp]]:
+        campaigns_collection = self.get_db()
+        pipeline = campaigns_pipeline(query, limit, after, fields)
+        campaigns = await campaigns_collection.aggregate(pipeline).to_list(length=None)
+        return [campaign_from_document(campaign, fields) for campaign in campaigns], documents_stamps(campaigns)
+
+    async def get_campaigns_with_users(self, campaigns: list[Mapping[str, Any]], fields: Fieldset = None):
+        user_ids = set()
+        for campaign in campaigns:
+            if requested(fields, 'master'):
+                user_ids.add(campaign['master'])
+            if requested(fields, 'players'):
+                user_ids.update(campaign['players'])
+
+        user_map = {}
+        if user_ids:
+            users = await self.user_service.get_users_by_ids(list(user_ids))
+            user_map = {user.id: user for user in users}
+
+        result = []
+        for campaign in campaigns:
+            master = user_map.get(str(campaign.get('master')))
+            players = [user_map.get(str(player_id)) for player_id in campaign.get('players', [])]
+            result.append(build(
+                Campaign, fields,
+                id=str(campaign['_id']),
+                name=campaign.get('name'),
+                description=campaign.get('description'),
+                master=master,
+                players=players,
+                character_sheet=campaign.get('character_sheet')
+            ))
+        return result
@@ -0,0 +1,335 @@
+import asyncio
+from bson import ObjectId
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Any, Set, Tuple
+from pydantic import ValidationError
+from config import Config
+
+from app.conditional import Stamp, documents_stamps, new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
+from app.fieldsets import Fieldset, build, requested
+from app.live import change, deletion, live_hub
+from app.loaders import loader_scope
+from app.models.bulk_model import BulkDelete, BulkItemResult
+from app.models.character_model import Character, CharacterBulkOperation, CharacterCreate, CharacterUpdate
+from app.models.sheet_patch_model import CharacterSheetPatch, SheetDelta
+from app.pagination import page_cursor, page_query
+from app.streaming import STREAM_BATCH_SIZE, batched
+from app.singleflight import single_flight
+from app.tracing import traced
+from app.services.aggregations import character_from_document, character_versions_pipeline, characters_pipeline
+from app.services.async_user_service import AsyncUserService
+from app.services.async_campaign_service import AsyncCampaignService
+from app.services.bulk import BulkWriter, object_ids, target_ids
+from app.services.sheets import SHEET_CHANGE_KEYS, SheetDeltaWriter, changed_projection, sheet_change, sheet_update
+
+
+def character_document(character: CharacterCreate | CharacterUpdate) -> dict:
+    document = {k: v for k, v in character.model_dump().items() if v is not None}
+    if 'player' in document:
+        document['player'] = ObjectId(document['player'])
+    if 'campaign' in document:
+        document['campaign'] = ObjectId(document['campaign'])
+    return document
+
+
+def notify_character(character_id: Any, previous_campaign: Any, campaign: Any, version: int | None = None):
+    # A character moved to another campaign is gone from the old campaign's point of view; a new one left none.
+    if previous_campaign is not None and previous_campaign != campaign:
+        live_hub.notify(previous_campaign, deletion('character', character_id))
+    live_hub.notify(campaign, change('character', character_id, version))
+
+
+@traced
+class AsyncCharacterService:
+    bulk_writer = BulkWriter(
+        {'create': "Personagem cadastrado com sucesso!", 'update': "Personagem atualizado com sucesso!",
+         'delete': "Personagem excluído com sucesso."},
+        not_found="Personagem não encontrado."
+    )
+    sheet_writer = SheetDeltaWriter({'patch': "Ficha atualizada com sucesso!"},
+                                    not_found="Personagem não encontrado nesta campanha.")
+
+    def __init__(self, registry: MongoRegistry = None, user_service: AsyncUserService = None,
+                 campaign_service: AsyncCampaignService = None, use_lookup: bool = None):
+        self.registry = registry or default_registry
+        self.characters_collection = None
+        self.user_service = user_service or AsyncUserService(self.registry)
+        self.campaign_service = campaign_service or AsyncCampaignService(self.registry, self.user_service)
+        self.use_lookup = Config.USE_LOOKUP_AGGREGATION if use_lookup is None else use_lookup
+
+    def get_db(self):
+        if self.characters_collection is None:
+            self.characters_collection = self.registry.get_async_collection('Characters')
+        return self.characters_collection
+
+    @single_flight
+    async def get_all_characters(self, limit: int = None, after: str = None,
+                                 fields: Fieldset = None) -> list[Character] | None:
+        return await self.find_characters({}, limit, after, fields)
+
+    async def stream_characters(self, after: str = None, batch_size: int = STREAM_BATCH_SIZE,
+                                fields: Fieldset = None) -> AsyncIterator[Character]:
+        characters_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        cursor = page_cursor(characters_collection.find(page_query({}, after), projection, batch_size=batch_size),
+                             None, after)
+
+        async for characters in batched(cursor, batch_size):
+            # A scope per batch: the request's identity map would otherwise keep every related model streamed.
+            with loader_scope():
+                characters = await self.get_characters_with_players_and_campaigns(characters, fields)
+            for character in characters:
+                yield character
+
+    @single_flight
+    async def get_characters_by_player(self, player_id: str, limit: int = None, after: str = None,
+                                       fields: Fieldset = None) -> List[Character] | None:
+        return await self.find_characters({'player': ObjectId(player_id)}, limit, after, fields)
+
+    @single_flight
+    async def get_character_by_id(self, character_id: str, fields: Fieldset = None) -> Character | None:
+        characters = await self.aggregate_characters({'_id': ObjectId(character_id)}, fields=fields)
+        if not characters:
+            return None
+        return characters[0]
+
+    @single_flight
+    async def get_versioned_character(self, character_id: str,
+                                      fields: Fieldset = None) -> Tuple[Character | None, List[Stamp]]:
+        characters, stamps = await self.aggregate_versioned_characters({'_id': ObjectId(character_id)},
+                                                                       fields=fields)
+        return (characters[0] if characters else None), stamps
+
+    @single_flight
+    async def get_versioned_characters_by_player(self, player_id: str, limit: int = None, after: str = None,
+                                                 fields: Fieldset = None) -> Tuple[List[Character], List[Stamp]]:
+        return await self.aggregate_versioned_characters({'player': ObjectId(player_id)}, limit, after, fields)
+
+    async def find_characters(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                              fields: Fieldset = None) -> List[Character]:
+        if self.use_lookup:
+            return await self.aggregate_characters(query, limit, after, fields)
+
+        characters_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        cursor = page_cursor(characters_collection.find(page_query(query, after), projection), limit, after)
+        characters = await cursor.to_list(length=None)
+
+        if not characters:
+            return []
+        return await self.get_characters_with_players_and_campaigns(characters, fields)
+
+    @single_flight
+    async def get_character_versions(self, character_id: str, fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        return await self.find_character_versions({'_id': ObjectId(character_id)}, fields=fields)
+
+    @single_flight
+    async def get_character_versions_by_player(self, character_player: str, limit: int = None, after: str = None,
+                                               fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        return await self.find_character_versions({'player': ObjectId(character_player)}, limit, after, fields)
+
+    async def find_character_versions(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                      fields: Fieldset = None) -> List[Mapping[str, Any]]:
+        characters_collection = self.get_db()
+        pipeline = character_versions_pipeline(query, limit, after, fields)
+        return await characters_collection.aggregate(pipeline).to_list(length=None)
+
+    async def existing_ids(self, character_ids: Iterable[str]) -> Set[str]:
+        characters_collection = self.get_db()
+        ids = object_ids(character_ids)
+        if not ids:
+            return set()
+        documents = await characters_collection.find({'_id': {"$in": ids}}, {'_id': 1}).to_list(length=None)
+        return {str(document['_id']) for document in documents}
+
+    async def character_campaigns(self, character_ids: Iterable[str]) -> Dict[str, Any]:
+        # Existence and current campaign in one query, so a bulk write knows which campaigns to notify.
+        characters_collection = self.get_db()
+        ids = object_ids(character_ids)
+        if not ids:
+            return {}
+        documents = await characters_collection.find({'_id': {"$in": ids}}, {'campaign': 1}).to_list(length=None)
+        return {str(document['_id']): document.get('campaign') for document in documents}
+
+    async def create_character(self, character: CharacterCreate) -> dict[str, str] | None:
+        characters_collection = self.get_db()
+
+        try:
+            new_character = character_document(character)
+            result = await characters_collection.insert_one({**new_character, **new_version()})
+        except ValidationError as e:
+            print(f"Validation Error: {e}")
+            raise
+
+        notify_character(result.inserted_id, None, new_character.get('campaign'), 1)
+        return {"detail": "Personagem cadastrado com sucesso!", "id": str(result.inserted_id)}
+
+    async def update_character(self, character_id: str, character: CharacterUpdate) -> dict[str, str] | None:
+        characters_collection = self.get_db()
+
+        update_data = character_document(character)
+
+        # The document before the update tells which campaign the character leaves when it moves.
+        previous = await characters_collection.find_one_and_update(
+            {'_id': ObjectId(character_id)},
+            versioned_update(update_data),
+            projection={'campaign': 1, 'version': 1}
+        )
+
+        if previous is None:
+            return None
+        campaign = update_data.get('campaign', previous.get('campaign'))
+        notify_character(previous['_id'], previous.get('campaign'), campaign, previous.get('version', 0) + 1)
+        return {"detail": "Personagem atualizado com sucesso!", "id": str(previous['_id'])}
+
+    async def patch_character_sheet(self, character_id: str, patch: CharacterSheetPatch) -> dict[str, Any] | None:
+        characters_collection = self.get_db()
+
+        updated_character = await characters_collection.find_one_and_update(
+            {'_id': ObjectId(character_id)},
+            sheet_update(patch.operations),
+            projection={**changed_projection(patch.operations), 'campaign': 1},
+            return_document=True
+        )
+
+        if updated_character is None:
+            return None
+        event = sheet_change(updated_character, patch.operations)
+        live_hub.notify(updated_character.get('campaign'), event)
+        return {"detail": "Ficha atualizada com sucesso!", **{key: event[key] for key in SHEET_CHANGE_KEYS}}
+
+    async def delete_character(self, character_id: str) -> bool:
+        characters_collection = self.get_db()
+
+        deleted = await characters_collection.find_one_and_delete({'_id': ObjectId(character_id)},
+                                                                  projection={'campaign': 1})
+        if deleted is None:
+            return False
+        live_hub.notify(deleted.get('campaign'), deletion('character', character_id))
+        return True
+
+    async def bulk_write(self, operations: List[CharacterBulkOperation],
+                         ordered: bool = True) -> List[BulkItemResult]:
+        characters_collection = self.get_db()
+        campaigns = await self.character_campaigns(target_ids(operations))
+        existing = set(campaigns)
+
+        # Players and campaigns referenced by the batch are checked with one query per collection.
+        writes = [operation for operation in operations if not isinstance(operation, BulkDelete)]
+        existing_players = await self.user_service.existing_ids(
+            {operation.data.player for operation in writes if operation.data.player is not None})
+        existing_campaigns = await self.campaign_service.existing_ids(
+            {operation.data.campaign for operation in writes if operation.data.campaign is not None})
+
+        rejections = {}
+        for index, operation in enumerate(operations):
+            result = self.bulk_writer.check_target(index, operation, existing)
+            if result is None and not isinstance(operation, BulkDelete):
+                if operation.data.player is not None and operation.data.player not in existing_players:
+                    result = self.bulk_writer.reject(
+                        index, operation, "O jogador desse personagem não foi encontrado.")
+                elif operation.data.campaign is not None and operation.data.campaign not in existing_campaigns:
+                    result = self.bulk_writer.reject(
+                        index, operation, "A campanha desse personagem não foi encontrada.")
+            if result is not None:
+                rejections[index] = result
+
+        results = await self.bulk_writer.execute(characters_collection, operations, ordered, rejections,
+                                                 lambda operation: character_document(operation.data))
+
+        for operation, result in zip(operations, results):
+            if result.status == 201:
+                notify_character(result.id, None, ObjectId(operation.data.campaign), 1)
+            elif result.status == 200:
+                previous = campaigns.get(result.id)
+                if isinstance(operation, BulkDelete):
+                    live_hub.notify(previous, deletion('character', result.id))
+                else:
+                    campaign = previous if operation.data.campaign is None else ObjectId(operation.data.campaign)
+                    notify_character(result.id, previous, campaign)
+        return results
+
+    async def apply_sheet_deltas(self, campaign_id: str, deltas: List[SheetDelta]) -> List[BulkItemResult]:
+        characters_collection = self.get_db()
+        ids = object_ids(delta.id for delta in deltas)
+
+        # Existence and campaign membership are checked together in a single query.
+        members = await characters_collection.find(
+            {'_id': {"$in": ids}, 'campaign': ObjectId(campaign_id)}, {'_id': 1}).to_list(length=None)
+        members = {str(member['_id']) for member in members}
+
+        rejections = {}
+        for index, delta in enumerate(deltas):
+            result = self.sheet_writer.check_target(index, delta, members)
+            if result is not None:
+                rejections[index] = result
+
+        # Deltas touch different characters, so an unordered batch lets one failure leave the others applied.
+        results = await self.sheet_writer.execute(characters_collection, deltas, False, rejections,
+                                                  lambda delta: sheet_update(delta.operations))
+        if live_hub.listening(campaign_id):
+            await self.publish_sheet_deltas(campaign_id, [delta for delta, result in zip(deltas, results)
+                                                          if result.status == 200])
+        return results
+
+    async def publish_sheet_deltas(self, campaign_id: str, deltas: List[SheetDelta]):
+        # Increments only know their result after the write, so the touched paths are read back in one query.
+        if not deltas:
+            return
+        characters_collection = self.get_db()
+        projection = {}
+        for delta in deltas:
+            projection.update(changed_projection(delta.operations))
+        documents = await characters_collection.find(
+            {'_id': {"$in": object_ids(delta.id for delta in deltas)}}, projection).to_list(length=None)
+        documents = {str(document['_id']): document for document in documents}
+        for delta in deltas:
+            if delta.id in documents:
+                live_hub.publish(campaign_id, sheet_change(documents[delta.id], delta.operations))
+
+    async def aggregate_characters(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                   fields: Fieldset = None) -> List[Character]:
+        characters, _ = await self.aggregate_versioned_characters(query, limit, after, fields)
+        return characters
+
+    async def aggregate_versioned_characters(self, query: Mapping[str, Any], limit: int = None, after: str = None,
+                                             fields: Fieldset = None) -> Tuple[List[Character], List[Stamp]]:
+        # The joined documents carry the version stamps of everything they embed, so one round trip gives both.
+        characters_collection = self.get_db()
+        pipeline = characters_pipeline(query, limit, after, fields)
+        characters = await characters_collection.aggregate(pipeline).to_list(length=None)
+        return [character_from_document(character, fields) for character in characters], documents_stamps(characters)
+
+    async def get_characters_with_players_and_campaigns(self, characters: list[Mapping[str, Any]],
+                                                        fields: Fieldset = None):
+        user_ids = set()
+        campaign_ids = set()
+        for character in characters:
+            if requested(fields, 'player'):
+                user_ids.add(character['player'])
+            if requested(fields, 'campaign'):
+                campaign_ids.add(character['campaign'])
+
+        # Players and campaigns are fetched concurrently. The campaigns' users are only known afterwards, so they
+        # load in a second batch, where players already in the request's identity map are not fetched again.
+        users, campaigns = await asyncio.gather(
+            self.user_service.get_users_by_ids(list(user_ids)) if user_ids else asyncio.sleep(0, []),
+            self.campaign_service.get_campaigns_by_ids(list(campaign_ids)) if campaign_ids else asyncio.sleep(0, [])
+        )
+        user_map = {user.id: user for user in users or []}
+        campaign_map = {campaign.id: campaign for campaign in campaigns or []}
+
+        result = []
+        for character in characters:
+            player = user_map.get(str(character.get('player')))
+            campaign = campaign_map.get(str(character.get('campaign')))
+
+            result.append(build(
+                Character, fields,
+                id=str(character['_id']),
+                player=player,
+                campaign=campaign,
+                player_character_sheet=character.get('player_character_sheet')
+            ))
+
+        return result
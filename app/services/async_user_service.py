@@ -0,0 +1,171 @@
+from bson import ObjectId
+from typing import Dict, Iterable, List, Set
+from pydantic import ValidationError
+
+from app.cache import TTLCache, campaign_cache as default_campaign_cache, user_cache as default_user_cache
+from app.conditional import new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
+from app.fieldsets import Fieldset
+from app.indexes import EMAIL_COLLATION
+from app.loaders import forget_loaded, request_loader
+from app.models.bulk_model import BulkItemResult
+from app.models.user_model import User, UserBulkOperation, UserCreate, UserUpdate
+from app.pagination import page_cursor, page_query
+from app.singleflight import single_flight
+from app.tracing import traced
+from app.services.aggregations import user_from_document
+from app.services.bulk import BulkWriter, object_ids, target_ids
+
+
+def user_document(user: UserCreate | UserUpdate) -> dict:
+    return {k: v for k, v in user.model_dump().items() if v is not None}
+
+
+@traced
+class AsyncUserService:
+    bulk_writer = BulkWriter(
+        {'create': "Usuário cadastrado com sucesso!", 'update': "Usuário atualizado com sucesso!",
+         'delete': "Usuário excluído com sucesso."},
+        not_found="Usuário não encontrado.",
+        duplicate="Já existe um usuário com este e-mail."
+    )
+
+    def __init__(self, registry: MongoRegistry = None, cache: TTLCache = None, campaign_cache: TTLCache = None):
+        self.registry = registry or default_registry
+        self.users_collection = None
+        self.cache = default_user_cache if cache is None else cache
+        self.campaign_cache = default_campaign_cache if campaign_cache is None else campaign_cache
+
+    def get_db(self):
+        if self.users_collection is None:
+            self.users_collection = self.registry.get_async_collection('Users')
+        return self.users_collection
+
+    @single_flight
+    async def get_all_users(self, limit: int = None, after: str = None, fields: Fieldset = None) -> List[User] | None:
+        users_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        cursor = page_cursor(users_collection.find(page_query({}, after), projection), limit, after)
+        users = await cursor.to_list(length=None)
+
+        if not users:
+            return []
+        return [user_from_document(user, fields) for user in users]
+
+    @single_flight
+    async def get_user_by_id(self, user_id: str, fields: Fieldset = None) -> User | None:
+        if fields is None:
+            hit, cached_user = self.cache.get(str(user_id))
+            if hit:
+                return cached_user
+
+        users_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        user = await users_collection.find_one({'_id': ObjectId(user_id)}, projection)
+        if user is None:
+            return None
+
+        user = user_from_document(user, fields)
+        if fields is None:
+            self.cache.set(user.id, user)
+        return user
+
+    @single_flight
+    async def get_users_by_ids(self, user_ids: List[str]) -> List[User] | None:
+        ids = list(dict.fromkeys(map(str, user_ids)))
+        # Within a request every id goes through one loader, so a user is fetched at most once.
+        loader = request_loader('users', self.load_users)
+        if loader is None:
+            users = await self.load_users(ids)
+            return [users[user_id] for user_id in ids if user_id in users]
+        return [user for user in await loader.load_many(ids) if user is not None]
+
+    async def load_users(self, user_ids: List[str]) -> Dict[str, User]:
+        cached_users, missing_ids = self.cache.get_many(user_ids)
+        if not missing_ids:
+            return cached_users
+
+        users_collection = self.get_db()
+        user_object_ids = list(map(ObjectId, missing_ids))
+        users = await users_collection.find({'_id': {"$in": user_object_ids}}).to_list(length=None)
+
+        users = {str(user['_id']): user_from_document(user) for user in users or []}
+        self.cache.set_many(users)
+        return {**cached_users, **users}
+
+    @single_flight
+    async def get_user_by_email(self, user_email: str, fields: Fieldset = None) -> User | None:
+        users_collection = self.get_db()
+        projection = None if fields is None else fields.projection()
+        user = await users_collection.find_one({'email': user_email}, projection, collation=EMAIL_COLLATION)
+        if user is None:
+            return None
+        return user_from_document(user, fields)
+
+    async def existing_ids(self, user_ids: Iterable[str]) -> Set[str]:
+        # Always asks the database: the identity cache is per process, so another worker's delete may not be in it.
+        ids = object_ids(map(str, user_ids))
+        if not ids:
+            return set()
+
+        users_collection = self.get_db()
+        documents = await users_collection.find({'_id': {"$in": ids}}, {'_id': 1}).to_list(length=None)
+        return {str(document['_id']) for document in documents}
+
+    async def create_user(self, user: UserCreate) -> dict[str, str] | None:
+        users_collection = self.get_db()
+
+        try:
+            new_user = user_document(user)
+            result = await users_collection.insert_one({**new_user, **new_version()})
+            return {"detail": "Usuário cadastrado com sucesso!", "id": str(result.inserted_id)}
+        except ValidationError as e:
+            print(f"Validation Error: {e}")
+            raise
+
+    async def update_user(self, user_id: str, user: UserUpdate) -> User | None:
+        users_collection = self.get_db()
+
+        update_data = user_document(user)
+        updated_user = await users_collection.find_one_and_update(
+            {'_id': ObjectId(user_id)},
+            versioned_update(update_data),
+            return_document=True
+        )
+
+        self.invalidate(user_id)
+
+        if updated_user is None:
+            return None
+        return User(id=str(updated_user['_id']), name=updated_user['name'], email=updated_user['email'])
+
+    async def delete_user(self, user_id: str) -> bool:
+        users_collection = self.get_db()
+        result = await users_collection.delete_one({'_id': ObjectId(user_id)})
+        self.invalidate(user_id)
+        return result.deleted_count > 0
+
+    async def bulk_write(self, operations: List[UserBulkOperation], ordered: bool = True) -> List[BulkItemResult]:
+        users_collection = self.get_db()
+        targets = target_ids(operations)
+        existing = await self.existing_ids(targets)
+
+        rejections = {}
+        for index, operation in enumerate(operations):
+            result = self.bulk_writer.check_target(index, operation, existing)
+            if result is not None:
+                rejections[index] = result
+
+        try:
+            return await self.bulk_writer.execute(users_collection, operations, ordered, rejections,
+                                                  lambda operation: user_document(operation.data))
+        finally:
+            for user_id in targets:
+                self.invalidate(user_id)
+
+    def invalidate(self, user_id: str):
+        self.cache.invalidate(str(user_id))
+        forget_loaded('users', str(user_id))
+        # Cached campaigns embed their master and players, so any user change makes them stale.
+        self.campaign_cache.clear()
+        forget_loaded('campaigns')
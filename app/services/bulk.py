@@ -0,0 +1,93 @@
+from bson import ObjectId
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.conditional import new_version, versioned_update
+from app.models.bulk_model import BulkCreate, BulkDelete, BulkItemResult, BulkUpdate
+
+DUPLICATE_KEY_ERROR = 11000
+SKIPPED_STATUS = 424
+SKIPPED_DETAIL = "Operação não executada: uma operação anterior falhou."
+WRITE_ERROR_DETAIL = "Não foi possível executar a operação."
+
+
+def object_ids(ids: Iterable[str]) -> List[ObjectId]:
+    # Malformed ids cannot exist in the collection, so they are simply reported as missing.
+    return [ObjectId(_id) for _id in dict.fromkeys(ids) if ObjectId.is_valid(_id)]
+
+
+def target_ids(operations: List[Any]) -> Set[str]:
+    return {operation.id for operation in operations if not isinstance(operation, BulkCreate)}
+
+
+def rejection(index: int, operation: Any, status: int, detail: str) -> BulkItemResult:
+    return BulkItemResult(index=index, op=operation.op, status=status,
+                          id=getattr(operation, 'id', None), detail=detail)
+
+
+class BulkWriter:
+    def __init__(self, messages: Dict[str, str], not_found: str, duplicate: str = WRITE_ERROR_DETAIL):
+        self.messages = messages
+        self.not_found = not_found
+        self.duplicate = duplicate
+
+    def check_target(self, index: int, operation: Any, existing: Set[str]) -> BulkItemResult | None:
+        if isinstance(operation, BulkCreate) or operation.id in existing:
+            return None
+        return rejection(index, operation, 404, self.not_found)
+
+    def reject(self, index: int, operation: Any, detail: str) -> BulkItemResult:
+        return rejection(index, operation, 400, detail)
+
+    def request(self, operation: Any, document: Dict[str, Any]):
+        if isinstance(operation, BulkCreate):
+            return InsertOne({**document, **new_version()})
+        if isinstance(operation, BulkUpdate):
+            return UpdateOne({'_id': ObjectId(operation.id)}, versioned_update(document))
+        return DeleteOne({'_id': ObjectId(operation.id)})
+
+    def success(self, index: int, operation: Any, _id: str) -> BulkItemResult:
+        status = 201 if isinstance(operation, BulkCreate) else 200
+        return BulkItemResult(index=index, op=operation.op, status=status, id=_id, detail=self.messages[operation.op])
+
+    def write_error(self, index: int, operation: Any, error: Dict[str, Any]) -> BulkItemResult:
+        if error.get('code') == DUPLICATE_KEY_ERROR:
+            return rejection(index, operation, 400, self.duplicate)
+        return rejection(index, operation, 500, WRITE_ERROR_DETAIL)
+
+    async def execute(self, collection, operations: List[Any], ordered: bool,
+                      rejections: Dict[int, BulkItemResult],
+                      document: Callable[[Any], Dict[str, Any]]) -> List[BulkItemResult]:
+        results: List[BulkItemResult | None] = [None] * len(operations)
+        requests, indexes = [], []
+        for index, operation in enumerate(operations):
+            if index in rejections:
+                results[index] = rejections[index]
+                if ordered:
+                    break
+                continue
+
+            values = {} if isinstance(operation, BulkDelete) else document(operation)
+            if isinstance(operation, BulkCreate):
+                values['_id'] = ObjectId()
+            requests.append(self.request(operation, values))
+            indexes.append(index)
+            results[index] = self.success(index, operation, str(values.get('_id') or operation.id))
+
+        if requests:
+            try:
+                await collection.bulk_write(requests, ordered=ordered)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                for error in errors:
+                    index = indexes[error['index']]
+                    results[index] = self.write_error(index, operations[index], error)
+                if ordered and errors:
+                    # Mongo stops at the first failed write, so nothing after it ran either.
+                    first = indexes[errors[0]['index']]
+                    results[first + 1:] = [None] * (len(operations) - first - 1)
+
+        return [result or rejection(index, operations[index], SKIPPED_STATUS, SKIPPED_DETAIL)
+                for index, result in enumerate(results)]
@@ -1,28 +1,36 @@
-from pymongo import MongoClient
 from bson import ObjectId
 from typing import List, Mapping, Any
 from pydantic import ValidationError
 from config import Config
 
+from app.cache import TTLCache, campaign_cache as default_campaign_cache, versioned_key
+from app.conditional import new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
 from app.models.campaign_model import Campaign, CampaignCreate, CampaignUpdate
+from app.tracing import traced
+from app.services.aggregations import campaign_from_document, campaigns_pipeline
 from app.services.user_service import UserService
 
 
+@traced
 class CampaignService:
-    def __init__(self):
-        self.client = None
-        self.db = None
+    def __init__(self, registry: MongoRegistry = None, user_service: UserService = None, use_lookup: bool = None,
+                 cache: TTLCache = None):
+        self.registry = registry or default_registry
         self.campaigns_collection = None
-        self.user_service = UserService()
+        self.user_service = user_service or UserService(self.registry)
+        self.use_lookup = Config.USE_LOOKUP_AGGREGATION if use_lookup is None else use_lookup
+        self.cache = default_campaign_cache if cache is None else cache
 
     def get_db(self):
         if self.campaigns_collection is None:
-            self.client = MongoClient(Config.MONGO_URI)
-            self.db = self.client['RoleForge']
-            self.campaigns_collection = self.db['Campaigns']
+            self.campaigns_collection = self.registry.get_collection('Campaigns')
         return self.campaigns_collection
 
     def get_all_campaigns(self) -> List[Campaign] | None:
+        if self.use_lookup:
+            return self.aggregate_campaigns({})
+
         campaigns_collection = self.get_db()
         campaigns = list(campaigns_collection.find())
 
@@ -31,6 +39,9 @@ class CampaignService:
         return self.get_campaigns_with_users(campaigns)
 
     def get_campaigns_by_master(self, campaign_master: str) -> List[Campaign] | None:
+        if self.use_lookup:
+            return self.aggregate_campaigns({'master': ObjectId(campaign_master)})
+
         campaigns_collection = self.get_db()
         campaigns = list(campaigns_collection.find({'master': ObjectId(campaign_master)}))
 
@@ -39,6 +50,9 @@ class CampaignService:
         return self.get_campaigns_with_users(campaigns)
 
     def get_campaigns_by_player(self, campaign_player: str) -> List[Campaign] | None:
+        if self.use_lookup:
+            return self.aggregate_campaigns({'players': ObjectId(campaign_player)})
+
         campaigns_collection = self.get_db()
         campaigns = list(campaigns_collection.find({'players': ObjectId(campaign_player)}))
 
@@ -47,26 +61,32 @@ class CampaignService:
         return self.get_campaigns_with_users(campaigns)
 
     def get_campaign_by_id(self, campaign_id: str) -> Campaign | None:
-        campaigns_collection = self.get_db()
-        campaign = campaigns_collection.find_one({'_id': ObjectId(campaign_id)})
+        hit, cached_campaign = self.cache.get(str(campaign_id))
+        if hit:
+            return cached_campaign
 
-        if campaign is None:
-            return None
-
-        master = self.user_service.get_user_by_id(campaign['master'])
-        players = self.user_service.get_users_by_ids(campaign['players'])
+        campaigns = self.aggregate_campaigns({'_id': ObjectId(campaign_id)})
 
-        return Campaign(id=str(campaign['_id']), name=campaign['name'], description=campaign['description'],
-                        master=master, players=players, character_sheet=campaign['character_sheet'])
+        if not campaigns:
+            return None
+        self.cache.set(campaigns[0].id, campaigns[0])
+        return campaigns[0]
 
     def get_campaigns_by_ids(self, campaign_ids: List[str]) -> List[Campaign] | None:
+        cached_campaigns, missing_ids = self.cache.get_many(map(str, campaign_ids))
+        if not missing_ids:
+            return list(cached_campaigns.values())
+
         campaigns_collection = self.get_db()
-        campaign_object_ids = list(map(ObjectId, campaign_ids))
-        campaigns = list(campaigns_collection.find({'_id': {"$in": campaign_object_ids}}))
+        campaign_object_ids = list(map(ObjectId, missing_ids))
+        if self.use_lookup:
+            campaigns = self.aggregate_campaigns({'_id': {"$in": campaign_object_ids}})
+        else:
+            campaigns = list(campaigns_collection.find({'_id': {"$in": campaign_object_ids}}))
+            campaigns = self.get_campaigns_with_users(campaigns) if campaigns else []
 
-        if not campaigns:
-            return []
-        return self.get_campaigns_with_users(campaigns)
+        self.cache.set_many({campaign.id: campaign for campaign in campaigns})
+        return [*cached_campaigns.values(), *campaigns]
 
     def create_campaign(self, campaign: CampaignCreate) -> dict[str, str] | None:
         campaigns_collection = self.get_db()
@@ -75,7 +95,7 @@ class CampaignService:
             new_campaign = campaign.model_dump()
             new_campaign['master'] = ObjectId(new_campaign['master'])
             new_campaign['players'] = [ObjectId(player) for player in new_campaign['players']]
-            result = campaigns_collection.insert_one(new_campaign)
+            result = campaigns_collection.insert_one({**new_campaign, **new_version()})
 
             return {"detail": "Campanha cadastrada com sucesso!", "id": str(result.inserted_id)}
         except ValidationError as e:
@@ -94,10 +114,13 @@ class CampaignService:
 
         updated_campaign = campaigns_collection.find_one_and_update(
             {'_id': ObjectId(campaign_id)},
-            {'$set': update_data},
+            versioned_update(update_data),
             return_document=True
         )
 
+        self.cache.invalidate(str(campaign_id))
+        self.cache.invalidate(versioned_key(campaign_id))
+
         if updated_campaign is None:
             return None
         return {"detail": "Campanha atualizada com sucesso!", "id": str(updated_campaign['_id'])}
@@ -106,9 +129,16 @@ class CampaignService:
         campaigns_collection = self.get_db()
 
         result = campaigns_collection.delete_one({'_id': ObjectId(campaign_id)})
+        self.cache.invalidate(str(campaign_id))
+        self.cache.invalidate(versioned_key(campaign_id))
 
         return result.deleted_count > 0
 
+    def aggregate_campaigns(self, query: Mapping[str, Any]) -> List[Campaign]:
+        campaigns_collection = self.get_db()
+        campaigns = campaigns_collection.aggregate(campaigns_pipeline(query))
+        return [campaign_from_document(campaign) for campaign in campaigns]
+
     def get_campaigns_with_users(self, campaigns: list[Mapping[str, Any]]):
         user_ids = set()
         for campaign in campaigns:
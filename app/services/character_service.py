@@ -1,30 +1,36 @@
-from pymongo import MongoClient
 from bson import ObjectId
 from typing import List, Mapping, Any
 from pydantic import ValidationError
 from config import Config
 
+from app.conditional import new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
 from app.models.character_model import Character, CharacterCreate, CharacterUpdate
+from app.tracing import traced
+from app.services.aggregations import character_from_document, characters_pipeline
 from app.services.user_service import UserService
 from app.services.campaign_service import CampaignService
 
 
+@traced
 class CharacterService:
-    def __init__(self):
-        self.client = None
-        self.db = None
+    def __init__(self, registry: MongoRegistry = None, user_service: UserService = None,
+                 campaign_service: CampaignService = None, use_lookup: bool = None):
+        self.registry = registry or default_registry
         self.characters_collection = None
-        self.campaign_service = CampaignService()
-        self.user_service = UserService()
+        self.user_service = user_service or UserService(self.registry)
+        self.campaign_service = campaign_service or CampaignService(self.registry, self.user_service)
+        self.use_lookup = Config.USE_LOOKUP_AGGREGATION if use_lookup is None else use_lookup
 
     def get_db(self):
         if self.characters_collection is None:
-            self.client = MongoClient(Config.MONGO_URI)
-            self.db = self.client['RoleForge']
-            self.characters_collection = self.db['Characters']
+            self.characters_collection = self.registry.get_collection('Characters')
         return self.characters_collection
 
     def get_all_characters(self) -> list[Character] | None:
+        if self.use_lookup:
+            return self.aggregate_characters({})
+
         characters_collection = self.get_db()
         characters = list(characters_collection.find())
 
@@ -33,6 +39,9 @@ class CharacterService:
         return self.get_characters_with_players_and_campaigns(characters)
 
     def get_characters_by_player(self, player_id: str) -> List[Character] | None:
+        if self.use_lookup:
+            return self.aggregate_characters({'player': ObjectId(player_id)})
+
         characters_collection = self.get_db()
         characters = list(characters_collection.find({'player': ObjectId(player_id)}))
 
@@ -41,16 +50,10 @@ class CharacterService:
         return self.get_characters_with_players_and_campaigns(characters)
 
     def get_character_by_id(self, character_id: str) -> Character | None:
-        characters_collection = self.get_db()
-        character = characters_collection.find_one({'_id': ObjectId(character_id)})
-        if character is None:
+        characters = self.aggregate_characters({'_id': ObjectId(character_id)})
+        if not characters:
             return None
-
-        player = self.user_service.get_user_by_id(character['player'])
-        campaign = self.campaign_service.get_campaign_by_id(character['campaign'])
-
-        return Character(id=str(character['_id']), player=player, campaign=campaign,
-                         player_character_sheet=character['player_character_sheet'])
+        return characters[0]
 
     def create_character(self, character: CharacterCreate) -> dict[str, str] | None:
         characters_collection = self.get_db()
@@ -61,7 +64,7 @@ class CharacterService:
             new_character['player'] = ObjectId(new_character['player'])
             new_character['campaign'] = ObjectId(new_character['campaign'])
 
-            result = characters_collection.insert_one(new_character)
+            result = characters_collection.insert_one({**new_character, **new_version()})
             return {"detail": "Personagem cadastrado com sucesso!", "id": str(result.inserted_id)}
         except ValidationError as e:
             print(f"Validation Error: {e}")
@@ -79,7 +82,7 @@ class CharacterService:
 
         updated_character = characters_collection.find_one_and_update(
             {'_id': ObjectId(character_id)},
-            {'$set': update_data},
+            versioned_update(update_data),
             return_document=True
         )
 
@@ -93,6 +96,11 @@ class CharacterService:
         result = characters_collection.delete_one({'_id': ObjectId(character_id)})
         return result.deleted_count > 0
 
+    def aggregate_characters(self, query: Mapping[str, Any]) -> List[Character]:
+        characters_collection = self.get_db()
+        characters = characters_collection.aggregate(characters_pipeline(query))
+        return [character_from_document(character) for character in characters]
+
     def get_characters_with_players_and_campaigns(self, characters: list[Mapping[str, Any]]):
         user_ids = set()
         campaign_ids = set()
@@ -0,0 +1,58 @@
+from bson import ObjectId
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+from app.conditional import versioned_update
+from app.live import change
+from app.models.bulk_model import BulkItemResult
+from app.models.sheet_patch_model import SheetDelta, SheetIncrement, SheetOperation, SheetSet, SheetUnset
+from app.services.bulk import BulkWriter, rejection
+
+SHEET_FIELD = 'player_character_sheet'
+SHEET_CHANGE_KEYS = ('id', 'version', 'changes', 'removed')
+SHEET_WRITE_ERROR = "Não foi possível aplicar as alterações na ficha."
+
+
+def sheet_path(path: str) -> str:
+    return f'{SHEET_FIELD}.{path}'
+
+
+def sheet_update(operations: List[SheetOperation]) -> Dict[str, Any]:
+    # Only the touched fields go over the wire, and concurrent edits to different fields no longer overwrite each other.
+    update = versioned_update({sheet_path(op.path): op.value for op in operations if isinstance(op, SheetSet)})
+    update['$inc'].update({sheet_path(op.path): op.value for op in operations if isinstance(op, SheetIncrement)})
+    unset = {sheet_path(op.path): '' for op in operations if isinstance(op, SheetUnset)}
+    if unset:
+        update['$unset'] = unset
+    return update
+
+
+def changed_projection(operations: List[SheetOperation]) -> Dict[str, int]:
+    return {'version': 1, **{sheet_path(op.path): 1 for op in operations if not isinstance(op, SheetUnset)}}
+
+
+def changed_values(document: Dict[str, Any], operations: List[SheetOperation]) -> Dict[str, Any]:
+    changes = {}
+    for operation in operations:
+        if isinstance(operation, SheetUnset):
+            continue
+        value = document.get(SHEET_FIELD)
+        for segment in operation.path.split('.'):
+            value = value.get(segment) if isinstance(value, dict) else None
+        changes[operation.path] = value
+    return changes
+
+
+def sheet_change(document: Dict[str, Any], operations: List[SheetOperation]) -> Dict[str, Any]:
+    return change('character', document['_id'], document.get('version'), changed_values(document, operations),
+                  [op.path for op in operations if isinstance(op, SheetUnset)])
+
+
+class SheetDeltaWriter(BulkWriter):
+    def request(self, operation: SheetDelta, document: Dict[str, Any]):
+        return UpdateOne({'_id': ObjectId(operation.id)}, document)
+
+    def write_error(self, index: int, operation: SheetDelta, error: Dict[str, Any]) -> BulkItemResult:
+        # Sheet writes only fail on the document's contents, e.g. $inc on a text field.
+        return rejection(index, operation, 400, SHEET_WRITE_ERROR)
@@ -1,23 +1,26 @@
-from pymongo import MongoClient
 from bson import ObjectId
 from typing import List
 from pydantic import ValidationError
-from config import Config
 
+from app.cache import TTLCache, campaign_cache as default_campaign_cache, user_cache as default_user_cache
+from app.conditional import new_version, versioned_update
+from app.database import MongoRegistry, registry as default_registry
+from app.indexes import EMAIL_COLLATION
 from app.models.user_model import User, UserCreate, UserUpdate
+from app.tracing import traced
 
 
+@traced
 class UserService:
-    def __init__(self):
-        self.client = None
-        self.db = None
+    def __init__(self, registry: MongoRegistry = None, cache: TTLCache = None, campaign_cache: TTLCache = None):
+        self.registry = registry or default_registry
         self.users_collection = None
+        self.cache = default_user_cache if cache is None else cache
+        self.campaign_cache = default_campaign_cache if campaign_cache is None else campaign_cache
 
     def get_db(self):
         if self.users_collection is None:
-            self.client = MongoClient(Config.MONGO_URI)
-            self.db = self.client['RoleForge']
-            self.users_collection = self.db['Users']
+            self.users_collection = self.registry.get_collection('Users')
         return self.users_collection
 
     def get_all_users(self) -> List[User] | None:
@@ -29,24 +32,37 @@ class UserService:
         return [User(id=str(user['_id']), name=user['name'], email=user['email']) for user in users]
 
     def get_user_by_id(self, user_id: str) -> User | None:
+        hit, cached_user = self.cache.get(str(user_id))
+        if hit:
+            return cached_user
+
         users_collection = self.get_db()
         user = users_collection.find_one({'_id': ObjectId(user_id)})
         if user is None:
             return None
-        return User(id=str(user['_id']), name=user['name'], email=user['email'])
+
+        user = User(id=str(user['_id']), name=user['name'], email=user['email'])
+        self.cache.set(user.id, user)
+        return user
 
     def get_users_by_ids(self, user_ids: List[str]) -> List[User] | None:
+        cached_users, missing_ids = self.cache.get_many(map(str, user_ids))
+        if not missing_ids:
+            return list(cached_users.values())
+
         users_collection = self.get_db()
-        user_object_ids = list(map(ObjectId, user_ids))
+        user_object_ids = list(map(ObjectId, missing_ids))
         users = users_collection.find({'_id': {"$in": user_object_ids}})
 
         if users is None:
             return None
-        return [User(id=str(user['_id']), name=user['name'], email=user['email']) for user in users]
+        users = [User(id=str(user['_id']), name=user['name'], email=user['email']) for user in users]
+        self.cache.set_many({user.id: user for user in users})
+        return [*cached_users.values(), *users]
 
     def get_user_by_email(self, user_email: str) -> User | None:
         users_collection = self.get_db()
-        user = users_collection.find_one({'email': user_email})
+        user = users_collection.find_one({'email': user_email}, collation=EMAIL_COLLATION)
         if user is None:
             return None
         return User(id=str(user['_id']), name=user['name'], email=user['email'])
@@ -56,7 +72,7 @@ class UserService:
 
         try:
             new_user = user.model_dump()
-            result = users_collection.insert_one(new_user)
+            result = users_collection.insert_one({**new_user, **new_version()})
             return {"detail": "Usuário cadastrado com sucesso!", "id": str(result.inserted_id)}
         except ValidationError as e:
             print(f"Validation Error: {e}")
@@ -68,10 +84,12 @@ class UserService:
         update_data = {k: v for k, v in user.model_dump().items() if v is not None}
         updated_user = users_collection.find_one_and_update(
             {'_id': ObjectId(user_id)},
-            {'$set': update_data},
+            versioned_update(update_data),
             return_document=True
         )
 
+        self.invalidate(user_id)
+
         if updated_user is None:
             return None
         return User(id=str(updated_user['_id']), name=updated_user['name'], email=updated_user['email'])
@@ -79,4 +97,10 @@ class UserService:
     def delete_user(self, user_id: str) -> bool:
         users_collection = self.get_db()
         result = users_collection.delete_one({'_id': ObjectId(user_id)})
+        self.invalidate(user_id)
         return result.deleted_count > 0
+
+    def invalidate(self, user_id: str):
+        self.cache.invalidate(str(user_id))
+        # Cached campaigns embed their master and players, so any user change makes them stale.
+        self.campaign_cache.clear()
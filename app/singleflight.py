@@ -0,0 +1,77 @@
+import asyncio
+import functools
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from config import Config
+
+
+def freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+class SingleFlight:
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executions = Counter()
+        self.coalesced = Counter()
+
+    async def do(self, key: Hashable, name: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced[name] += 1
+        else:
+            self.executions[name] += 1
+            task = asyncio.ensure_future(function())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.forget(key, done))
+        # Shielded so that a caller disconnecting does not cancel the query the other callers are waiting on.
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            # Followers receive the exception; retrieving it here keeps asyncio from logging it as unhandled.
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'executions': sum(self.executions.values()),
+            'coalesced': sum(self.coalesced.values()),
+            'in_flight': len(self.in_flight),
+            'methods': {name: {'executions': self.executions[name], 'coalesced': self.coalesced[name]}
+                        for name in sorted(self.executions.keys() | self.coalesced.keys())},
+        }
+
+    def clear(self):
+        self.executions.clear()
+        self.coalesced.clear()
+
+
+flights = SingleFlight()
+
+
+def single_flight(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if not Config.SINGLE_FLIGHT:
+            return await method(self, *args, **kwargs)
+
+        # Calls are only shared within one service instance, so differently configured services never mix results.
+        key = (id(self), name, freeze(args), freeze(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            return await method(self, *args, **kwargs)
+        return await flights.do(key, name, lambda: method(self, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,137 @@
+import logging
+import random
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Tuple
+
+from pymongo import monitoring
+
+from app.command_events import TrackedCommandListener, command_collection
+from app.database import MongoRegistry, registry as default_registry
+from app.tracing import calling_method
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = {'find': 'filter', 'count': 'query', 'distinct': 'query', 'findAndModify': 'query'}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+INDEX_STAGES = {'IXSCAN', 'IDHACK', 'EXPRESS_IXSCAN', 'COUNT_SCAN', 'DISTINCT_SCAN'}
+
+
+def query_shape(value: Any) -> Any:
+    # Keys and operators are kept, values are replaced so that the same filter always logs the same shape.
+    if isinstance(value, Mapping):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, Mapping) for item in value):
+            return [query_shape(item) for item in value]
+        return ['?']
+    return '?'
+
+
+def pipeline_shape(pipeline: List[Mapping[str, Any]]) -> List[Any]:
+    return [{'$match': query_shape(stage['$match'])} if '$match' in stage else next(iter(stage), '?')
+            for stage in pipeline]
+
+
+def command_shape(command_name: str, command: Mapping[str, Any]) -> Any:
+    if command_name == 'aggregate':
+        return pipeline_shape(command.get('pipeline', []))
+    if command_name in FILTER_FIELDS:
+        return query_shape(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name in ('update', 'delete'):
+        shapes = []
+        for statement in command.get(f'{command_name}s', []):
+            shape = query_shape(statement.get('q', {}))
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return None
+
+
+def documents_returned(command_name: str, reply: Mapping[str, Any]) -> int | None:
+    cursor = reply.get('cursor')
+    if isinstance(cursor, Mapping):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return int(reply.get('value') is not None)
+    if 'n' in reply:
+        return reply['n']
+    return None
+
+
+def plan_summary(explain: Mapping[str, Any]) -> Dict[str, Any]:
+    stages, indexes = [], []
+
+    def walk(node: Any, in_plan: bool):
+        if isinstance(node, Mapping):
+            if in_plan and 'stage' in node:
+                stages.append(node['stage'])
+                if 'indexName' in node:
+                    indexes.append(node['indexName'])
+            for key, child in node.items():
+                if key != 'slotBasedPlan':
+                    walk(child, in_plan or key == 'winningPlan')
+        elif isinstance(node, list):
+            for child in node:
+                walk(child, in_plan)
+
+    walk(explain, False)
+    return {'index_used': any(stage in INDEX_STAGES for stage in stages), 'stages': stages, 'indexes': indexes}
+
+
+class SlowQueryListener(TrackedCommandListener):
+    def __init__(self, threshold_ms: float = None, explain_rate: float = None, registry: MongoRegistry = None,
+                 executor: Executor = None):
+        super().__init__()
+        self.threshold_ms = Config.SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+        self.explain_rate = Config.SLOW_QUERY_EXPLAIN_RATE if explain_rate is None else explain_rate
+        self.registry = registry or default_registry
+        self.executor = executor
+
+    def started_command(self, event: monitoring.CommandStartedEvent) -> Tuple[Mapping[str, Any], str] | None:
+        if self.threshold_ms < 0:
+            return None
+        # Only references are kept here; shapes are computed for the commands that turn out to be slow.
+        return event.command, calling_method.get()
+
+    def finished(self, event, started: Tuple[Mapping[str, Any], str] | None, succeeded: bool):
+        command, caller = started or ({}, '')
+        duration_ms = event.duration_micros / 1000
+        if self.threshold_ms < 0 or duration_ms < self.threshold_ms:
+            return
+
+        documents = documents_returned(event.command_name, event.reply) if succeeded else None
+        collection = command_collection(event.command_name, command)
+        logger.warning("Slow %s on %s took %.1f ms, returned %s documents, called from %s: %s",
+                       event.command_name, collection or event.database_name, duration_ms, documents,
+                       caller or 'unknown', command_shape(event.command_name, command))
+        if event.command_name in EXPLAINABLE_COMMANDS and random.random() < self.explain_rate:
+            self.submit_explain(event.database_name, event.command_name, command, caller)
+
+    def submit_explain(self, database_name: str, command_name: str, command: Mapping[str, Any], caller: str):
+        if self.executor is None:
+            # A single background thread, so explains never hold up the driver thread that reported the command.
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        self.executor.submit(self.explain, database_name, command_name, command, caller)
+
+    def explain(self, database_name: str, command_name: str, command: Mapping[str, Any], caller: str):
+        explained = {key: value for key, value in command.items()
+                     if not key.startswith('$') and key not in ('lsid', 'txnNumber', 'cursor')}
+        if command_name == 'aggregate':
+            explained['cursor'] = {}
+        try:
+            # The Motor client's own MongoClient: no second pool, monitor threads or handshake just for explains.
+            client = self.registry.get_async_client().delegate
+            result = client[database_name].command(
+                {'explain': explained, 'verbosity': 'queryPlanner'})
+        except Exception as e:
+            logger.error("Could not explain slow %s from %s: %s", command_name, caller or 'unknown', e)
+            return
+
+        summary = plan_summary(result)
+        logger.warning("Plan for slow %s on %s from %s: index used %s, stages %s, indexes %s",
+                       command_name, command_collection(command_name, command), caller or 'unknown',
+                       summary['index_used'], summary['stages'], summary['indexes'])
+
+
+slow_query_listener = SlowQueryListener()
@@ -0,0 +1,32 @@
+from typing import AsyncIterator, List
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 200
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+async def batched(cursor, size: int) -> AsyncIterator[List]:
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ndjson_lines(models: AsyncIterator[BaseModel]) -> AsyncIterator[bytes]:
+    async for model in models:
+        yield model.model_dump_json().encode() + b'\n'
+
+
+def ndjson_response(models: AsyncIterator[BaseModel]) -> StreamingResponse:
+    return StreamingResponse(ndjson_lines(models), media_type=NDJSON_MEDIA_TYPE)
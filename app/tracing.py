@@ -0,0 +1,37 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Any, Callable
+
+# Motor copies the context into its executor threads, so command listeners can read this too.
+calling_method: ContextVar[str] = ContextVar('calling_method', default='')
+
+
+def trace(function: Callable[..., Any], name: str) -> Callable[..., Any]:
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            token = calling_method.set(name)
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                calling_method.reset(token)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = calling_method.set(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                calling_method.reset(token)
+    return wrapper
+
+
+def traced(cls: type) -> type:
+    # Streams are left alone: a context variable reset between yields may run in another context.
+    for name, member in list(vars(cls).items()):
+        if name.startswith('_') or name == 'get_db' or not inspect.isfunction(member) \
+                or inspect.isasyncgenfunction(member):
+            continue
+        setattr(cls, name, trace(member, f'{cls.__name__}.{name}'))
+    return cls
@@ -0,0 +1,92 @@
+"""Measure compression time against bytes saved for GET /characters/ sized payloads.
+
+Runs offline: the payload is a serialized list of characters that embed their full campaign, as the API returns it.
+Every encoding available in this environment is measured (brotli and zstd need their optional packages).
+
+    python -m benchmarks.bench_compression --sizes 10 100 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.compression import available_encodings, compress
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character
+from app.models.character_sheet_model import CharacterSheet
+from app.models.user_model import User
+
+PLAYERS_PER_CAMPAIGN = 4
+CHARACTERS_PER_CAMPAIGN = 5
+
+
+def payload(size: int) -> bytes:
+    users = [User(id=str(ObjectId()), name=f'User {i}', email=f'user{i}@email.com') for i in range(size)]
+    campaigns = [Campaign(
+        id=str(ObjectId()),
+        name=f'Campaign {i}',
+        description='Benchmark campaign',
+        master=users[i % size],
+        players=[users[(i + offset) % size] for offset in range(1, PLAYERS_PER_CAMPAIGN + 1)],
+        character_sheet=CharacterSheet(fields=['PV', 'PE', 'Sanidade'], attributes=['Intelecto', 'Vigor', 'Presença'])
+    ) for i in range(max(1, size // CHARACTERS_PER_CAMPAIGN))]
+    characters = [Character(
+        id=str(ObjectId()),
+        player=users[i],
+        campaign=campaigns[i % len(campaigns)],
+        player_character_sheet={'fields': {'PV': 10 + i % 7, 'PE': 5}, 'attributes': {'Vigor': i % 4}}
+    ) for i in range(size)]
+    return json.dumps([character.model_dump() for character in characters]).encode()
+
+
+def measure(encoding: str, body: bytes, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        compressed = compress(encoding, body)
+        timings.append(time.process_time() - start)
+    return statistics.median(timings), len(compressed)
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        body = payload(size)
+        for encoding in available_encodings():
+            seconds, compressed_size = measure(encoding, body, repeat)
+            saved = len(body) - compressed_size
+            results.append({
+                'size': size,
+                'encoding': encoding,
+                'bytes_in': len(body),
+                'bytes_out': compressed_size,
+                'ratio': len(body) / compressed_size,
+                'cpu_ms': seconds * 1000,
+                'us_per_kb_saved': seconds * 1e6 / max(saved / 1024, 1),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'size':>8} {'encoding':>8} {'bytes in':>12} {'bytes out':>12} {'ratio':>7} {'cpu (ms)':>9} "
+          f"{'us/KB saved':>12}")
+    for result in results:
+        print(f"{result['size']:>8} {result['encoding']:>8} {result['bytes_in']:>12} {result['bytes_out']:>12} "
+              f"{result['ratio']:>7.1f} {result['cpu_ms']:>9.2f} {result['us_per_kb_saved']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
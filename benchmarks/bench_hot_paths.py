@@ -0,0 +1,199 @@
+"""Baseline timings for the service and controller hot paths, saved as JSON so runs can be compared.
+
+Runs offline with the stubbing the unit tests use: get_db returns a MagicMock collection and the nested services are
+AsyncMocks, so the service cases only time hydration and model validation. The client cases send requests to the
+app from main.py, with the controllers' services swapped for real ones over mocked collections. They add everything
+between the socket and the service: Server-Timing, metrics, request loaders, gzip compression, routing, response
+validation and serialization (bench_compression compares the codecs).
+
+    python -m benchmarks.bench_hot_paths --sizes 1 100 10000 --repeat 5 --output baseline.json
+    python -m benchmarks.bench_hot_paths --compare baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi.testclient import TestClient
+
+from app.cache import TTLCache
+from app.services.aggregations import user_from_document
+from app.services.async_campaign_service import AsyncCampaignService
+from app.services.async_character_service import AsyncCharacterService
+from app.services.async_user_service import AsyncUserService
+from benchmarks.bench_hydration import documents
+from main import app, campaign_controller, character_controller, user_controller
+
+ENDPOINTS = {
+    'client.users': '/users/?all=true',
+    'client.campaigns': '/campaigns/?all=true',
+    'client.characters': '/characters/?all=true',
+}
+
+
+def collection(documents: List[dict]) -> MagicMock:
+    by_id = {document['_id']: document for document in documents}
+
+    def find(query=None, *args, **kwargs):
+        ids = (query or {}).get('_id', {}).get('$in')
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(
+            return_value=documents if ids is None else [by_id[_id] for _id in ids if _id in by_id])
+        return cursor
+
+    mock = MagicMock()
+    mock.find.side_effect = find
+    return mock
+
+
+def services(users: List[dict], campaigns: List[dict], characters: List[dict]) -> AsyncCharacterService:
+    registry = MagicMock()
+    registry.get_async_collection.side_effect = {
+        'Users': collection(users), 'Campaigns': collection(campaigns), 'Characters': collection(characters)}.get
+
+    # Caches that never hit, so every repetition times a cold hydration.
+    user_service = AsyncUserService(registry, cache=TTLCache(ttl=0), campaign_cache=TTLCache(ttl=0))
+    campaign_service = AsyncCampaignService(registry, user_service, use_lookup=False, cache=TTLCache(ttl=0))
+    return AsyncCharacterService(registry, user_service, campaign_service, use_lookup=False)
+
+
+def build_client(character_service: AsyncCharacterService) -> TestClient:
+    user_controller.user_service = character_service.user_service
+    campaign_controller.campaign_service = character_service.campaign_service
+    campaign_controller.user_service = character_service.user_service
+    character_controller.character_service = character_service
+    character_controller.campaign_service = character_service.campaign_service
+    character_controller.user_service = character_service.user_service
+
+    # Not entered as a context manager, so the lifespan (Mongo warm-up, change stream) never runs.
+    return TestClient(app, headers={'Accept-Encoding': 'gzip'})
+
+
+def cases(size: int, loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[[], Any]]:
+    users, campaigns, characters = documents(size)
+    user_models = [user_from_document(user) for user in users]
+
+    user_service = AsyncUserService(cache=TTLCache(ttl=0))
+    user_service.get_db = MagicMock(return_value=collection(users))
+
+    campaign_service = AsyncCampaignService(user_service=AsyncMock(), use_lookup=False)
+    campaign_service.user_service.get_users_by_ids.return_value = user_models
+    campaign_models = loop.run_until_complete(campaign_service.get_campaigns_with_users(campaigns))
+
+    character_service = AsyncCharacterService(user_service=AsyncMock(), campaign_service=AsyncMock(), use_lookup=False)
+    character_service.user_service.get_users_by_ids.return_value = user_models
+    character_service.campaign_service.get_campaigns_by_ids.return_value = campaign_models
+
+    def run(function: Callable[[], Awaitable[Any]]) -> Callable[[], Any]:
+        return lambda: loop.run_until_complete(function())
+
+    client = build_client(services(users, campaigns, characters))
+    return {
+        'service.get_all_users': run(user_service.get_all_users),
+        'service.get_campaigns_with_users': run(lambda: campaign_service.get_campaigns_with_users(campaigns)),
+        'service.get_characters_with_players_and_campaigns':
+            run(lambda: character_service.get_characters_with_players_and_campaigns(characters)),
+        **{name: (lambda url=url: client.get(url).raise_for_status()) for name, url in ENDPOINTS.items()},
+    }
+
+
+def measure(function: Callable[[], Any], repeat: int) -> List[float]:
+    function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(sizes: List[int], repeat: int) -> List[dict]:
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for size in sizes:
+            for case, function in cases(size, loop).items():
+                timings = measure(function, repeat)
+                median = statistics.median(timings)
+                results.append({
+                    'case': case,
+                    'size': size,
+                    'median_ms': median,
+                    'min_ms': min(timings),
+                    'max_ms': max(timings),
+                    'us_per_item': median * 1000 / size,
+                })
+    finally:
+        loop.close()
+    return results
+
+
+def report(sizes: List[int], repeat: int, results: List[dict]) -> dict:
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(baseline: dict, results: List[dict], threshold: float) -> List[dict]:
+    previous = {(result['case'], result['size']): result for result in baseline['results']}
+    comparisons = []
+    for result in results:
+        before = previous.get((result['case'], result['size']))
+        if before is None:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        comparisons.append({
+            'case': result['case'],
+            'size': result['size'],
+            'baseline_ms': before['median_ms'],
+            'median_ms': result['median_ms'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from a previous run to compare the medians against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown over the baseline median reported as a regression (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report(args.sizes, args.repeat, results), file, indent=2)
+
+    print(f"{'case':>50} {'size':>6} {'median (ms)':>12} {'us/item':>9}")
+    for result in results:
+        print(f"{result['case']:>50} {result['size']:>6} {result['median_ms']:>12.2f} {result['us_per_item']:>9.2f}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            comparisons = compare(json.load(file), results, args.threshold)
+        print(f"\n{'case':>50} {'size':>6} {'baseline (ms)':>14} {'median (ms)':>12} {'ratio':>6}")
+        for comparison in comparisons:
+            flag = '  REGRESSION' if comparison['regression'] else ''
+            print(f"{comparison['case']:>50} {comparison['size']:>6} {comparison['baseline_ms']:>14.2f} "
+                  f"{comparison['median_ms']:>12.2f} {comparison['ratio']:>6.2f}{flag}")
+        if any(comparison['regression'] for comparison in comparisons):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Compare Python-side joins with $lookup aggregation for campaign and character hydration.
+
+Needs a reachable MongoDB (BENCH_DATABASE_URL, falling back to DATABASE_URL). The data is seeded into a
+throwaway database that is dropped at the end of every size.
+
+    python -m benchmarks.bench_hydration --sizes 100 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.database import MongoRegistry
+from app.services.campaign_service import CampaignService
+from app.services.character_service import CharacterService
+from config import Config
+
+BENCH_DB_NAME = 'RoleForgeBench'
+PLAYERS_PER_CAMPAIGN = 4
+
+
+def documents(size: int) -> tuple[list[dict], list[dict], list[dict]]:
+    users = [{'_id': ObjectId(), 'name': f'User {i}', 'email': f'user{i}@email.com'} for i in range(size)]
+    user_ids = [user['_id'] for user in users]
+    campaigns = [{
+        '_id': ObjectId(),
+        'name': f'Campaign {i}',
+        'description': 'Benchmark campaign',
+        'master': random.choice(user_ids),
+        'players': random.sample(user_ids, min(PLAYERS_PER_CAMPAIGN, size)),
+        'character_sheet': {'fields': ['PV', 'PE', 'Sanidade'], 'attributes': ['Intelecto', 'Vigor', 'Presença']}
+    } for i in range(max(1, size // 5))]
+    characters = [{
+        '_id': ObjectId(),
+        'player': random.choice(user_ids),
+        'campaign': random.choice(campaigns)['_id'],
+        'player_character_sheet': {'fields': {'PV': 10, 'PE': 5}, 'attributes': {'Vigor': 2}}
+    } for _ in range(size)]
+    return users, campaigns, characters
+
+
+def seed(registry: MongoRegistry, size: int):
+    users, campaigns, characters = documents(size)
+    registry.get_collection('Users').insert_many(users)
+    registry.get_collection('Campaigns').insert_many(campaigns)
+    registry.get_collection('Characters').insert_many(characters)
+
+
+def measure(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    registry = MongoRegistry(os.getenv('BENCH_DATABASE_URL') or Config.MONGO_URI, db_name=BENCH_DB_NAME)
+    results = []
+    try:
+        for size in sizes:
+            registry.get_client().drop_database(BENCH_DB_NAME)
+            seed(registry, size)
+            for use_lookup in (False, True):
+                campaign_service = CampaignService(registry, use_lookup=use_lookup)
+                character_service = CharacterService(registry, use_lookup=use_lookup)
+                results.append({
+                    'size': size,
+                    'strategy': 'lookup' if use_lookup else 'python',
+                    'campaigns_ms': measure(campaign_service.get_all_campaigns, repeat),
+                    'characters_ms': measure(character_service.get_all_characters, repeat),
+                })
+    finally:
+        registry.get_client().drop_database(BENCH_DB_NAME)
+        registry.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'size':>8} {'strategy':>8} {'campaigns (ms)':>15} {'characters (ms)':>16}")
+    for result in results:
+        print(f"{result['size']:>8} {result['strategy']:>8} {result['campaigns_ms']:>15.2f} "
+              f"{result['characters_ms']:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
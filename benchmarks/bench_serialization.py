@@ -0,0 +1,106 @@
+"""Compare response_model serialization with the orjson fast path on the list endpoints.
+
+Runs offline: the controllers are mounted on a test app with mocked services that return prebuilt models, so the
+timings only cover routing, validation and serialization.
+
+    python -m benchmarks.bench_serialization --sizes 1 100 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers.campaign_controller import CampaignController
+from app.controllers.character_controller import CharacterController
+from app.controllers.user_controller import UserController
+from app.models.character_model import Character
+from benchmarks.bench_compression import payload
+from config import Config
+
+ENDPOINTS = {
+    'users': '/users/?all=true',
+    'campaigns': '/campaigns/?all=true',
+    'characters': '/characters/?all=true',
+}
+
+
+def build_app(characters: list[Character]) -> FastAPI:
+    app = FastAPI()
+    controllers = {'users': UserController(), 'campaigns': CampaignController(), 'characters': CharacterController()}
+
+    users = {character.player.id: character.player for character in characters}
+    campaigns = {character.campaign.id: character.campaign for character in characters}
+    services = {
+        'users': AsyncMock(get_all_users=AsyncMock(return_value=list(users.values()))),
+        'campaigns': AsyncMock(get_all_campaigns=AsyncMock(return_value=list(campaigns.values()))),
+        'characters': AsyncMock(get_all_characters=AsyncMock(return_value=characters)),
+    }
+    controllers['users'].user_service = services['users']
+    controllers['campaigns'].campaign_service = services['campaigns']
+    controllers['characters'].character_service = services['characters']
+
+    for prefix, controller in controllers.items():
+        app.include_router(controller.router, prefix=f'/{prefix}')
+    return app
+
+
+def build_client(characters: list[Character]) -> TestClient:
+    return TestClient(build_app(characters))
+
+
+def measure(client: TestClient, url: str, repeat: int) -> tuple[float, int]:
+    client.get(url)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(response.json())
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        characters = [Character(**character) for character in json.loads(payload(size))]
+        client = build_client(characters)
+        for endpoint, url in ENDPOINTS.items():
+            timings = {}
+            for fast in (False, True):
+                with patch.object(Config, 'FAST_RESPONSES', fast):
+                    timings[fast], items = measure(client, url, repeat)
+            results.append({
+                'size': size,
+                'endpoint': endpoint,
+                'items': items,
+                'response_model_ms': timings[False] * 1000,
+                'fast_ms': timings[True] * 1000,
+                'saved_us_per_item': (timings[False] - timings[True]) * 1e6 / items,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'size':>8} {'endpoint':>10} {'items':>7} {'response_model (ms)':>20} {'fast (ms)':>10} "
+          f"{'saved (us/item)':>16}")
+    for result in results:
+        print(f"{result['size']:>8} {result['endpoint']:>10} {result['items']:>7} "
+              f"{result['response_model_ms']:>20.2f} {result['fast_ms']:>10.2f} {result['saved_us_per_item']:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Measure requests per second against the launcher as the number of uvicorn workers grows.
+
+Runs offline: each worker imports this module's `app`, the real controllers over mocked services returning prebuilt
+characters (BENCH_ITEMS, default 50), so every request is routing, validation and serialization work. The load is
+generated by separate client processes on the same machine, so the numbers only scale up to the free CPU cores.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 2 --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.models.character_model import Character
+from benchmarks.bench_compression import payload
+from benchmarks.bench_serialization import build_app
+
+URL_PATH = '/characters/?all=true'
+
+app = build_app([Character(**character) for character in
+                 json.loads(payload(int(os.getenv('BENCH_ITEMS', '50'))))])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, loop: str, http: str) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, '-m', 'app.server', '--app', 'benchmarks.bench_workers:app',
+                               '--workers', str(workers), '--port', str(port), '--loop', loop, '--http', http],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}{URL_PATH}').status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+async def load(url: str, concurrency: int, duration: float) -> tuple[int, int]:
+    deadline = time.monotonic() + duration
+    completed, failed = 0, 0
+
+    async def user(client: httpx.AsyncClient):
+        nonlocal completed, failed
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url)
+                completed += response.status_code == 200
+                failed += response.status_code != 200
+            except httpx.TransportError:
+                failed += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+    return completed, failed
+
+
+def client_process(arguments: tuple[str, int, float]) -> tuple[int, int]:
+    return asyncio.run(load(*arguments))
+
+
+def run(worker_counts: list[int], clients: int, concurrency: int, duration: float, loop: str,
+        http: str) -> list[dict]:
+    results = []
+    for workers in worker_counts:
+        port = free_port()
+        server = start_server(workers, port, loop, http)
+        try:
+            with multiprocessing.Pool(clients) as pool:
+                counts = pool.map(client_process,
+                                  [(f'http://127.0.0.1:{port}{URL_PATH}', concurrency, duration)] * clients)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        completed = sum(count[0] for count in counts)
+        results.append({
+            'workers': workers,
+            'requests': completed,
+            'errors': sum(count[1] for count in counts),
+            'requests_per_second': completed / duration,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=2, help='load generator processes')
+    parser.add_argument('--concurrency', type=int, default=32, help='connections per client process')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--loop', default='auto', choices=['auto', 'asyncio', 'uvloop'])
+    parser.add_argument('--http', default='auto', choices=['auto', 'h11', 'httptools'])
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.workers, args.clients, args.concurrency, args.duration, args.loop, args.http)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    baseline = results[0]['requests_per_second'] or 1
+    print(f"{'workers':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'speedup':>8}")
+    for result in results:
+        print(f"{result['workers']:>8} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['requests_per_second']:>9.1f} {result['requests_per_second'] / baseline:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
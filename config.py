@@ -6,3 +6,24 @@ load_dotenv()
 
 class Config:
     MONGO_URI = os.getenv('DATABASE_URL')
+    HOST = os.getenv('HOST', '127.0.0.1')
+    PORT = int(os.getenv('PORT', '8000'))
+    WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+    EVENT_LOOP = os.getenv('EVENT_LOOP', 'auto')
+    HTTP_PARSER = os.getenv('HTTP_PARSER', 'auto')
+    KEEP_ALIVE_SECONDS = int(os.getenv('KEEP_ALIVE_SECONDS', '5'))
+    BACKLOG = int(os.getenv('BACKLOG', '2048'))
+    ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '30'))
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_OFFLOAD_SIZE = int(os.getenv('COMPRESSION_OFFLOAD_SIZE', '65536'))
+    SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true'
+    FAST_RESPONSES = os.getenv('FAST_RESPONSES', 'false').lower() == 'true'
+    LIVE_MAX_PENDING = int(os.getenv('LIVE_MAX_PENDING', '256'))
+    LIVE_CHANGE_STREAM = os.getenv('LIVE_CHANGE_STREAM', 'false').lower() == 'true'
+    PREWARM_CONNECTIONS = int(os.getenv('PREWARM_CONNECTIONS', '4'))
+    SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', '0'))
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', '0'))
+    USE_LOOKUP_AGGREGATION = os.getenv('USE_LOOKUP_AGGREGATION', 'false').lower() == 'true'
@@ -1,9 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.controllers.user_controller import UserController
 from app.controllers.campaign_controller import CampaignController
 from app.controllers.character_controller import CharacterController
+from app.change_stream import follow_changes
+from app.compression import CompressionMiddleware
+from app.database import registry
+from app.indexes import ensure_indexes_async
+from app.loaders import RequestLoadersMiddleware
+from app.metrics import MetricsMiddleware, command_metrics, metrics_endpoint
+from app.readiness import ready, warm_schemas, warm_up
+from app.server_timing import ServerTimingMiddleware, server_timing_listener
+from app.slow_queries import slow_query_listener
+from config import Config
+
+
+async def startup():
+    await warm_up(registry)
+    if Config.ENSURE_INDEXES:
+        await ensure_indexes_async(registry)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_schemas(app)
+    # Runs in the background so /ready can answer 503 while Mongo is still being reached.
+    starting = asyncio.create_task(startup())
+    following = asyncio.create_task(follow_changes(registry)) if Config.LIVE_CHANGE_STREAM else None
+    yield
+    starting.cancel()
+    if following is not None:
+        following.cancel()
+    registry.close()
+
+
+registry.add_listener(command_metrics)
+registry.add_listener(slow_query_listener)
+registry.add_listener(server_timing_listener)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestLoadersMiddleware)
+# Added last so they are the outermost layers and their timings include compression.
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+app.add_api_route("/ready", ready, include_in_schema=False)
 
 user_controller = UserController()
 campaign_controller = CampaignController()
@@ -14,6 +58,6 @@ app.include_router(campaign_controller.router, prefix="/campaigns")
 app.include_router(character_controller.router, prefix="/characters")
 
 if __name__ == "__main__":
-    import uvicorn
+    from app.server import serve
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    serve()
@@ -0,0 +1,30 @@
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+
+from app.cache import campaign_cache, user_cache
+from app.singleflight import flights
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    user_cache.clear()
+    campaign_cache.clear()
+    flights.clear()
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+def mock_async_collection():
+    collection = MagicMock()
+    for method in ('find_one', 'insert_one', 'find_one_and_update', 'find_one_and_delete', 'delete_one',
+                   'bulk_write'):
+        setattr(collection, method, AsyncMock())
+    collection.find.return_value.to_list = AsyncMock(return_value=[])
+    collection.aggregate.return_value.to_list = AsyncMock(return_value=[])
+    return collection
@@ -1,11 +1,18 @@
+import json
+
+from datetime import datetime
+
 import pytest
 
 from bson import ObjectId
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, MagicMock
 
-from app.controllers.campaign_controller import CampaignController
+from app.conditional import version_stamps
+from app.controllers.campaign_controller import WS_NOT_FOUND, CampaignController
+from app.live import change, live_hub
 from app.models.character_sheet_model import CharacterSheet
 from app.models.user_model import User
 from app.models.campaign_model import Campaign, CampaignCreate, CampaignUpdate
@@ -20,10 +27,14 @@ class TestCampaignController:
         self.app.include_router(self.controller.router, prefix="/campaigns")
         self.client = TestClient(self.app)
 
-        self.mock_campaign_service = MagicMock()
+        self.mock_campaign_service = AsyncMock()
+        self.mock_campaign_service.get_campaign_versions.return_value = []
+        self.mock_campaign_service.get_campaign_versions_by_master.return_value = []
+        self.mock_campaign_service.get_campaign_versions_by_player.return_value = []
         mocker.patch.object(self.controller, 'campaign_service', self.mock_campaign_service)
 
-        self.mock_user_service = MagicMock()
+        self.mock_user_service = AsyncMock()
+        self.mock_user_service.existing_ids.side_effect = set
         mocker.patch.object(self.controller, 'user_service', self.mock_user_service)
 
     @pytest.fixture
@@ -96,6 +107,23 @@ class TestCampaignController:
         assert response.json() == [expected_response]
         self.mock_campaign_service.get_all_campaigns.assert_called_once()
 
+    def test_get_campaigns_ndjson(self, campaign_data):
+        campaign, expected_response = campaign_data
+
+        async def stream():
+            yield campaign
+            yield campaign
+
+        self.mock_campaign_service.stream_campaigns = MagicMock(return_value=stream())
+
+        response = self.client.get("/campaigns/", headers={"Accept": "application/x-ndjson"})
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        assert [json.loads(line) for line in response.text.splitlines()] == [expected_response, expected_response]
+        self.mock_campaign_service.stream_campaigns.assert_called_once_with(after=None, fields=None)
+        self.mock_campaign_service.get_all_campaigns.assert_not_called()
+
     def test_get_campaigns_no_data(self):
         self.mock_campaign_service.get_all_campaigns.return_value = []
 
@@ -108,101 +136,145 @@ class TestCampaignController:
     def test_get_campaigns_by_master_with_data(self, campaign_data):
         campaign, expected_response = campaign_data
 
-        self.mock_campaign_service.get_campaigns_by_master.return_value = [campaign]
+        self.mock_campaign_service.get_versioned_campaigns_by_master.return_value = ([campaign], [])
 
         response = self.client.get(f'/campaigns/master/{str(ObjectId())}')
 
         assert response.status_code == 200
         assert response.json() == [expected_response]
-        self.mock_campaign_service.get_campaigns_by_master.assert_called_once()
+        self.mock_campaign_service.get_versioned_campaigns_by_master.assert_called_once()
 
     def test_get_campaigns_by_master_no_data(self):
-        self.mock_campaign_service.get_campaigns_by_master.return_value = []
+        self.mock_campaign_service.get_versioned_campaigns_by_master.return_value = ([], [])
 
         response = self.client.get(f'/campaigns/master/{str(ObjectId())}')
 
         assert response.status_code == 404
         assert response.json() == {"detail": "Este usuário não possui campanhas."}
-        self.mock_campaign_service.get_campaigns_by_master.assert_called_once()
+        self.mock_campaign_service.get_versioned_campaigns_by_master.assert_called_once()
 
     def test_get_campaigns_by_player_with_data(self, campaign_data):
         campaign, expected_response = campaign_data
 
-        self.mock_campaign_service.get_campaigns_by_player.return_value = [campaign]
+        self.mock_campaign_service.get_versioned_campaigns_by_player.return_value = ([campaign], [])
 
         response = self.client.get(f'/campaigns/player/{str(ObjectId())}')
 
         assert response.status_code == 200
         assert response.json() == [expected_response]
-        self.mock_campaign_service.get_campaigns_by_player.assert_called_once()
+        self.mock_campaign_service.get_versioned_campaigns_by_player.assert_called_once()
 
     def test_get_campaigns_by_player_no_data(self):
-        self.mock_campaign_service.get_campaigns_by_player.return_value = []
+        self.mock_campaign_service.get_versioned_campaigns_by_player.return_value = ([], [])
 
         response = self.client.get(f'/campaigns/player/{str(ObjectId())}')
 
         assert response.status_code == 404
         assert response.json() == {"detail": "Este usuário não participa de nenhuma campanha."}
-        self.mock_campaign_service.get_campaigns_by_player.assert_called_once()
+        self.mock_campaign_service.get_versioned_campaigns_by_player.assert_called_once()
 
     def test_get_campaign_by_id_with_data(self, campaign_data):
         campaign, expected_response = campaign_data
 
-        self.mock_campaign_service.get_campaign_by_id.return_value = campaign
+        self.mock_campaign_service.get_versioned_campaign.return_value = (campaign, [])
 
         response = self.client.get(f'/campaigns/{campaign.id}')
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_campaign_service.get_campaign_by_id.assert_called_once_with(campaign.id)
+        self.mock_campaign_service.get_versioned_campaign.assert_called_once_with(campaign.id, fields=None,
+                                                                                  cached=True)
+
+    def test_get_campaign_by_id_sets_validators_from_one_read(self, campaign_data):
+        campaign, expected_response = campaign_data
+
+        self.mock_campaign_service.get_versioned_campaign.return_value = (campaign, version_stamps(
+            {'_id': ObjectId(campaign.id), 'version': 2, 'updated_at': datetime(2024, 5, 1, 12, 0, 0)}))
+
+        response = self.client.get(f'/campaigns/{campaign.id}')
+
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('"')
+        assert response.headers['Last-Modified'] == 'Wed, 01 May 2024 12:00:00 GMT'
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        self.mock_campaign_service.get_campaign_versions.assert_not_called()
+
+    def test_get_campaign_by_id_not_modified(self, campaign_data):
+        campaign, expected_response = campaign_data
+
+        versions = [{'_id': ObjectId(campaign.id), 'version': 2, 'updated_at': datetime(2024, 5, 1, 12, 0, 0)}]
+        self.mock_campaign_service.get_campaign_versions.return_value = versions
+        self.mock_campaign_service.get_versioned_campaign.return_value = (campaign, version_stamps(versions[0]))
+        etag = self.client.get(f'/campaigns/{campaign.id}').headers['ETag']
+        self.mock_campaign_service.get_versioned_campaign.reset_mock()
+
+        response = self.client.get(f'/campaigns/{campaign.id}', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        self.mock_campaign_service.get_campaign_versions.assert_called_once_with(campaign.id, fields=None)
+        self.mock_campaign_service.get_versioned_campaign.assert_not_called()
+
+    def test_get_campaign_by_id_modified_skips_the_cache(self, campaign_data):
+        campaign, expected_response = campaign_data
+
+        versions = [{'_id': ObjectId(campaign.id), 'version': 3, 'updated_at': datetime(2024, 5, 2)}]
+        self.mock_campaign_service.get_campaign_versions.return_value = versions
+        self.mock_campaign_service.get_versioned_campaign.return_value = (campaign, version_stamps(versions[0]))
+
+        response = self.client.get(f'/campaigns/{campaign.id}', headers={'If-None-Match': '"outdated"'})
+
+        assert response.status_code == 200
+        assert response.json() == expected_response
+        self.mock_campaign_service.get_versioned_campaign.assert_called_once_with(campaign.id, fields=None,
+                                                                                  cached=False)
 
     def test_get_campaign_by_id_no_data(self):
-        self.mock_campaign_service.get_campaign_by_id.return_value = None
+        self.mock_campaign_service.get_versioned_campaign.return_value = (None, [])
 
         response = self.client.get(f'/campaigns/{str(ObjectId())}')
 
         assert response.status_code == 404
         assert response.json() == {"detail": "Campanha não encontrada."}
-        self.mock_campaign_service.get_campaign_by_id.assert_called_once()
+        self.mock_campaign_service.get_versioned_campaign.assert_called_once()
 
     def test_create_campaign(self, create_campaign_data):
         campaign_create, expected_response = create_campaign_data
 
-        self.mock_user_service.get_user_by_id.return_value = MagicMock()
-        self.mock_user_service.get_users_by_ids.return_value = [MagicMock() for _ in campaign_create.players]
         self.mock_campaign_service.create_campaign.return_value = expected_response
 
         response = self.client.post("/campaigns/", json=campaign_create.model_dump())
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_user_service.get_user_by_id.assert_called_once_with(campaign_create.master)
-        self.mock_user_service.get_users_by_ids.assert_called_once_with(campaign_create.players)
+        self.mock_user_service.existing_ids.assert_awaited_once()
+        self.mock_user_service.get_user_by_id.assert_not_called()
+        self.mock_user_service.get_users_by_ids.assert_not_called()
         self.mock_campaign_service.create_campaign.assert_called_once_with(campaign_create)
 
     def test_create_campaign_master_not_found(self, create_campaign_data):
         campaign_create, _ = create_campaign_data
 
-        self.mock_user_service.get_user_by_id.return_value = None
+        self.mock_user_service.existing_ids.side_effect = None
+        self.mock_user_service.existing_ids.return_value = set(campaign_create.players)
 
         response = self.client.post("/campaigns/", json=campaign_create.model_dump())
 
         assert response.status_code == 400
         assert response.json() == {"detail": "O mestre dessa campanha não foi encontrado."}
-        self.mock_user_service.get_user_by_id.assert_called_once_with(campaign_create.master)
+        self.mock_campaign_service.create_campaign.assert_not_called()
 
     def test_create_campaign_players_not_found(self, create_campaign_data):
         campaign_create, _ = create_campaign_data
 
-        self.mock_user_service.get_user_by_id.return_value = MagicMock()
-        self.mock_user_service.get_users_by_ids.return_value = []
+        self.mock_user_service.existing_ids.side_effect = None
+        self.mock_user_service.existing_ids.return_value = {campaign_create.master}
 
         response = self.client.post("/campaigns/", json=campaign_create.model_dump())
 
         assert response.status_code == 400
         assert response.json() == {"detail": "Um ou mais jogadores dessa campanha não foram encontrados."}
-        self.mock_user_service.get_user_by_id.assert_called_once_with(campaign_create.master)
-        self.mock_user_service.get_users_by_ids.assert_called_once_with(campaign_create.players)
+        self.mock_user_service.existing_ids.assert_awaited_once()
 
     def test_update_campaign(self, update_campaign_data):
         _id = str(ObjectId())
@@ -216,6 +288,27 @@ class TestCampaignController:
         assert response.json() == expected_response
         self.mock_campaign_service.update_campaign.assert_called_once_with(_id, campaign_update)
 
+    def test_update_campaign_players_not_found(self, update_campaign_data):
+        campaign_update, _ = update_campaign_data
+
+        self.mock_user_service.existing_ids.side_effect = None
+        self.mock_user_service.existing_ids.return_value = {campaign_update.master}
+
+        response = self.client.put(f"/campaigns/{str(ObjectId())}", json=campaign_update.model_dump())
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Um ou mais jogadores dessa campanha não foram encontrados."}
+        self.mock_campaign_service.update_campaign.assert_not_called()
+
+    def test_update_campaign_without_references_skips_checks(self):
+        self.mock_user_service.existing_ids.side_effect = None
+        self.mock_user_service.existing_ids.return_value = set()
+        self.mock_campaign_service.update_campaign.return_value = {"detail": "ok", "id": "1"}
+
+        response = self.client.put(f"/campaigns/{str(ObjectId())}", json={"name": "Renamed"})
+
+        assert response.status_code == 200
+
     def test_update_campaign_no_data(self, update_campaign_data):
         _id = str(ObjectId())
         campaign_update, _ = update_campaign_data
@@ -249,3 +342,24 @@ class TestCampaignController:
         assert response.status_code == 404
         assert response.json() == {"detail": "Campanha não encontrada."}
         self.mock_campaign_service.delete_campaign.assert_called_once_with(_id)
+
+    def test_live_pushes_campaign_changes(self):
+        _id = str(ObjectId())
+        self.mock_campaign_service.existing_ids.return_value = {_id}
+        event = change('character', ObjectId(), 3, {'attributes.PV': 12})
+
+        with self.client.websocket_connect(f"/campaigns/{_id}/live") as websocket:
+            assert live_hub.subscribers[_id]
+            websocket.portal.call(live_hub.publish, _id, event)
+            assert websocket.receive_json() == [event]
+
+        assert _id not in live_hub.subscribers
+
+    def test_live_campaign_not_found(self):
+        self.mock_campaign_service.existing_ids.return_value = set()
+
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with self.client.websocket_connect(f"/campaigns/{str(ObjectId())}/live"):
+                pass
+
+        assert closed.value.code == WS_NOT_FOUND
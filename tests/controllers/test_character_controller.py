@@ -1,15 +1,21 @@
 import pytest
 
+from datetime import datetime
+
 from bson import ObjectId
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock
+from pymongo.errors import OperationFailure
+from unittest.mock import AsyncMock
 
+from app.conditional import version_stamps
 from app.controllers.character_controller import CharacterController
+from app.models.bulk_model import BulkItemResult
 from app.models.campaign_model import Campaign
 from app.models.character_model import Character, CharacterCreate, CharacterUpdate
 from app.models.character_sheet_model import CharacterSheet
 from app.models.user_model import User
+from config import Config
 
 
 class TestCharacterController:
@@ -21,13 +27,17 @@ class TestCharacterController:
         self.app.include_router(self.controller.router, prefix="/characters")
         self.client = TestClient(self.app)
 
-        self.mock_character_service = MagicMock()
+        self.mock_character_service = AsyncMock()
+        self.mock_character_service.get_character_versions.return_value = []
+        self.mock_character_service.get_character_versions_by_player.return_value = []
         mocker.patch.object(self.controller, 'character_service', self.mock_character_service)
 
-        self.mock_campaign_service = MagicMock()
+        self.mock_campaign_service = AsyncMock()
+        self.mock_campaign_service.existing_ids.side_effect = set
         mocker.patch.object(self.controller, 'campaign_service', self.mock_campaign_service)
 
-        self.mock_user_service = MagicMock()
+        self.mock_user_service = AsyncMock()
+        self.mock_user_service.existing_ids.side_effect = set
         mocker.patch.object(self.controller, 'user_service', self.mock_user_service)
 
     @pytest.fixture
@@ -119,6 +129,18 @@ class TestCharacterController:
         assert response.json() == [expected_response]
         self.mock_character_service.get_all_characters.assert_called_once()
 
+    def test_get_characters_fast_response(self, mocker, character_data):
+        character, expected_response = character_data
+        mocker.patch.object(Config, 'FAST_RESPONSES', True)
+
+        self.mock_character_service.get_all_characters.return_value = [character, character]
+
+        response = self.client.get("/characters/?limit=1")
+
+        assert response.status_code == 200
+        assert response.json() == [expected_response]
+        assert response.headers['X-Next-Cursor']
+
     def test_get_characters_no_data(self):
         self.mock_character_service.get_all_characters.return_value = []
 
@@ -131,81 +153,122 @@ class TestCharacterController:
     def test_get_character_by_id_with_data(self, character_data):
         character, expected_response = character_data
 
-        self.mock_character_service.get_character_by_id.return_value = character
+        self.mock_character_service.get_versioned_character.return_value = (character, [])
 
         response = self.client.get(f'/characters/{character.id}')
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_character_service.get_character_by_id.assert_called_once_with(character.id)
+        self.mock_character_service.get_versioned_character.assert_called_once_with(character.id, fields=None)
+        self.mock_character_service.get_character_versions.assert_not_called()
+
+    def test_get_character_by_id_with_fields(self, character_data):
+        character, expected_response = character_data
+
+        async def get_versioned_character(character_id, fields):
+            return fields.partial_model(id=character.id, player_character_sheet=character.player_character_sheet), []
+
+        self.mock_character_service.get_versioned_character.side_effect = get_versioned_character
+
+        response = self.client.get(f'/characters/{character.id}?fields=player_character_sheet')
+
+        assert response.status_code == 200
+        assert response.json() == {"id": character.id,
+                                   "player_character_sheet": expected_response["player_character_sheet"]}
+
+    def test_get_characters_invalid_fields(self):
+        response = self.client.get('/characters/?fields=player,password')
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Campos inválidos: password."}
+        self.mock_character_service.get_all_characters.assert_not_called()
+
+    def test_get_characters_by_player_not_modified(self, character_data):
+        character, expected_response = character_data
+
+        versions = [{
+            '_id': ObjectId(character.id), 'version': 1, 'updated_at': datetime(2024, 5, 1),
+            'player_user': [{'_id': ObjectId(character.player.id), 'version': 3, 'updated_at': datetime(2024, 5, 2)}],
+        }]
+        self.mock_character_service.get_character_versions_by_player.return_value = versions
+        self.mock_character_service.get_versioned_characters_by_player.return_value = ([character],
+                                                                                       version_stamps(versions[0]))
+        first = self.client.get(f'/characters/player/{character.player.id}')
+        self.mock_character_service.get_versioned_characters_by_player.reset_mock()
+
+        response = self.client.get(f'/characters/player/{character.player.id}',
+                                   headers={'If-None-Match': first.headers['ETag']})
+
+        assert first.headers['Last-Modified'] == 'Thu, 02 May 2024 00:00:00 GMT'
+        assert response.status_code == 304
+        self.mock_character_service.get_versioned_characters_by_player.assert_not_called()
 
     def test_get_character_by_id_no_data(self):
-        self.mock_character_service.get_character_by_id.return_value = None
+        self.mock_character_service.get_versioned_character.return_value = (None, [])
 
         response = self.client.get(f'/characters/{str(ObjectId())}')
 
         assert response.status_code == 404
         assert response.json() == {"detail": "Personagem não encontrado."}
-        self.mock_character_service.get_character_by_id.assert_called_once()
+        self.mock_character_service.get_versioned_character.assert_called_once()
 
     def test_get_characters_by_player_with_data(self, character_data):
         character, expected_response = character_data
 
-        self.mock_character_service.get_characters_by_player.return_value = [character]
+        self.mock_character_service.get_versioned_characters_by_player.return_value = ([character], [])
 
         response = self.client.get(f'/characters/player/{character.player.id}')
 
         assert response.status_code == 200
         assert response.json() == [expected_response]
-        self.mock_character_service.get_characters_by_player.assert_called_once()
+        self.mock_character_service.get_versioned_characters_by_player.assert_called_once()
 
     def test_get_characters_by_player_no_data(self):
-        self.mock_character_service.get_characters_by_player.return_value = []
+        self.mock_character_service.get_versioned_characters_by_player.return_value = ([], [])
 
         response = self.client.get(f'/characters/player/{str(ObjectId())}')
 
         assert response.status_code == 404
         assert response.json() == {"detail": "Este usuário não possui personagens."}
-        self.mock_character_service.get_characters_by_player.assert_called_once()
+        self.mock_character_service.get_versioned_characters_by_player.assert_called_once()
 
     def test_create_character(self, create_character_data):
         character_create, expected_response = create_character_data
 
-        self.mock_user_service.get_user_by_id.return_value = MagicMock()
-        self.mock_campaign_service.get_campaign_by_id.return_value = MagicMock()
         self.mock_character_service.create_character.return_value = expected_response
 
         response = self.client.post("/characters/", json=character_create.model_dump())
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_user_service.get_user_by_id.assert_called_once_with(character_create.player)
-        self.mock_campaign_service.get_campaign_by_id.assert_called_once_with(character_create.campaign)
+        self.mock_user_service.existing_ids.assert_awaited_once_with([character_create.player])
+        self.mock_campaign_service.existing_ids.assert_awaited_once_with([character_create.campaign])
+        self.mock_campaign_service.get_campaign_by_id.assert_not_called()
         self.mock_character_service.create_character.assert_called_once_with(character_create)
 
     def test_create_character_player_not_found(self, create_character_data):
         character_create, _ = create_character_data
 
-        self.mock_user_service.get_user_by_id.return_value = None
+        self.mock_user_service.existing_ids.side_effect = None
+        self.mock_user_service.existing_ids.return_value = set()
 
         response = self.client.post("/characters/", json=character_create.model_dump())
 
         assert response.status_code == 400
         assert response.json() == {"detail": "O jogador desse personagem não foi encontrado."}
-        self.mock_user_service.get_user_by_id.assert_called_once_with(character_create.player)
+        self.mock_campaign_service.existing_ids.assert_not_called()
 
     def test_create_character_campaign_not_found(self, create_character_data):
         character_create, _ = create_character_data
 
-        self.mock_user_service.get_user_by_id.return_value = MagicMock()
-        self.mock_campaign_service.get_campaign_by_id.return_value = None
+        self.mock_campaign_service.existing_ids.side_effect = None
+        self.mock_campaign_service.existing_ids.return_value = set()
 
         response = self.client.post("/characters/", json=character_create.model_dump())
 
         assert response.status_code == 400
         assert response.json() == {"detail": "A campanha desse personagem não foi encontrada."}
-        self.mock_user_service.get_user_by_id.assert_called_once_with(character_create.player)
-        self.mock_campaign_service.get_campaign_by_id.assert_called_once_with(character_create.campaign)
+        self.mock_character_service.create_character.assert_not_called()
 
     def test_update_character(self, update_character_data):
         _id = str(ObjectId())
@@ -219,6 +282,18 @@ class TestCharacterController:
         assert response.json() == expected_response
         self.mock_character_service.update_character.assert_called_once_with(_id, character_update)
 
+    def test_update_character_campaign_not_found(self, update_character_data):
+        character_update, _ = update_character_data
+
+        self.mock_campaign_service.existing_ids.side_effect = None
+        self.mock_campaign_service.existing_ids.return_value = set()
+
+        response = self.client.put(f"/characters/{str(ObjectId())}", json=character_update.model_dump())
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "A campanha desse personagem não foi encontrada."}
+        self.mock_character_service.update_character.assert_not_called()
+
     def test_update_character_no_data(self, update_character_data):
         _id = str(ObjectId())
         character_update, _ = update_character_data
@@ -231,6 +306,76 @@ class TestCharacterController:
         assert response.json() == {"detail": "Personagem não encontrado."}
         self.mock_character_service.update_character.assert_called_once_with(_id, character_update)
 
+    def test_patch_character_sheet(self):
+        _id = str(ObjectId())
+        expected_response = {"detail": "Ficha atualizada com sucesso!", "id": _id, "version": 2,
+                             "changes": {'attributes.PV': 7}, "removed": []}
+        self.mock_character_service.patch_character_sheet.return_value = expected_response
+
+        response = self.client.patch(f"/characters/{_id}/sheet",
+                                     json={'operations': [{'op': 'inc', 'path': 'attributes.PV', 'value': -3}]})
+
+        assert response.status_code == 200
+        assert response.json() == expected_response
+        character_id, patch = self.mock_character_service.patch_character_sheet.call_args.args
+        assert character_id == _id
+        assert patch.operations[0].path == 'attributes.PV'
+
+    @pytest.mark.parametrize('operations', [
+        [],
+        [{'op': 'inc', 'path': 'attributes.PV', 'value': '3'}],
+        [{'op': 'inc', 'path': 'attributes.PV', 'value': True}],
+        [{'op': 'set', 'path': 'attributes.$where', 'value': 1}],
+        [{'op': 'set', 'path': 'attributes..PV', 'value': 1}],
+        [{'op': 'set', 'path': 'attributes', 'value': {}}, {'op': 'inc', 'path': 'attributes.PV', 'value': 1}],
+        [{'op': 'set', 'path': 'fields.PV', 'value': 1}, {'op': 'unset', 'path': 'fields.PV'}],
+    ])
+    def test_patch_character_sheet_rejects_invalid_operations(self, operations):
+        response = self.client.patch(f"/characters/{str(ObjectId())}/sheet", json={'operations': operations})
+
+        assert response.status_code == 422
+        self.mock_character_service.patch_character_sheet.assert_not_called()
+
+    def test_patch_character_sheet_type_mismatch(self):
+        self.mock_character_service.patch_character_sheet.side_effect = OperationFailure(
+            "Cannot apply $inc to a value of non-numeric type", code=14)
+
+        response = self.client.patch(f"/characters/{str(ObjectId())}/sheet",
+                                     json={'operations': [{'op': 'inc', 'path': 'fields.Nome', 'value': 1}]})
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Não foi possível aplicar as alterações na ficha."}
+
+    def test_patch_character_sheet_not_found(self):
+        self.mock_character_service.patch_character_sheet.return_value = None
+
+        response = self.client.patch(f"/characters/{str(ObjectId())}/sheet",
+                                     json={'operations': [{'op': 'unset', 'path': 'fields.PV'}]})
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Personagem não encontrado."}
+
+    def test_apply_sheet_deltas(self):
+        campaign_id, character_id = str(ObjectId()), str(ObjectId())
+        self.mock_character_service.apply_sheet_deltas.return_value = [
+            BulkItemResult(index=0, op='patch', status=200, id=character_id, detail="Ficha atualizada com sucesso!")]
+
+        response = self.client.patch(f"/characters/campaign/{campaign_id}/sheets", json={'deltas': [
+            {'id': character_id, 'operations': [{'op': 'inc', 'path': 'attributes.PV', 'value': -2}]}]})
+
+        assert response.status_code == 200
+        assert response.json()[0]['status'] == 200
+        called_campaign, deltas = self.mock_character_service.apply_sheet_deltas.call_args.args
+        assert called_campaign == campaign_id
+        assert [delta.id for delta in deltas] == [character_id]
+
+    def test_apply_sheet_deltas_rejects_invalid_delta(self):
+        response = self.client.patch(f"/characters/campaign/{str(ObjectId())}/sheets", json={'deltas': [
+            {'id': str(ObjectId()), 'operations': [{'op': 'set', 'path': '$set', 'value': 1}]}]})
+
+        assert response.status_code == 422
+        self.mock_character_service.apply_sheet_deltas.assert_not_called()
+
     def test_delete_character_success(self):
         _id = str(ObjectId())
 
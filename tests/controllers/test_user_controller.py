@@ -3,10 +3,12 @@ import pytest
 from bson import ObjectId
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock
+from pymongo.errors import DuplicateKeyError
+from unittest.mock import AsyncMock
 
 from app.controllers.user_controller import UserController
 from app.models.user_model import User, UserCreate, UserUpdate
+from app.pagination import DEFAULT_PAGE_SIZE, encode_cursor
 
 
 class TestUserController:
@@ -18,7 +20,7 @@ class TestUserController:
         self.app.include_router(self.controller.router, prefix="/users")
         self.client = TestClient(self.app)
 
-        self.mock_user_service = MagicMock()
+        self.mock_user_service = AsyncMock()
         mocker.patch.object(self.controller, 'user_service', self.mock_user_service)
 
     @pytest.fixture
@@ -79,6 +81,65 @@ class TestUserController:
         assert response.json() == {"detail": "Nenhum usuário encontrado."}
         self.mock_user_service.get_all_users.assert_called_once()
 
+    def test_get_users_first_page(self):
+        users = [User(id=str(ObjectId()), name=f"Player {i}", email=f"player{i}@email.com") for i in range(3)]
+
+        self.mock_user_service.get_all_users.return_value = users
+
+        response = self.client.get("/users/?limit=2")
+
+        assert response.status_code == 200
+        assert [user['id'] for user in response.json()] == [users[0].id, users[1].id]
+        assert response.headers['X-Next-Cursor'] == encode_cursor(users[1].id)
+        assert f'after={encode_cursor(users[1].id)}' in response.headers['Link']
+        assert response.headers['Link'].endswith('rel="next"')
+        self.mock_user_service.get_all_users.assert_called_once_with(limit=3, after=None, fields=None)
+
+    def test_get_users_last_page(self, user_data):
+        user, expected_response = user_data
+        after = str(ObjectId())
+
+        self.mock_user_service.get_all_users.return_value = [user]
+
+        response = self.client.get(f"/users/?after={encode_cursor(after)}")
+
+        assert response.status_code == 200
+        assert response.json() == [expected_response]
+        assert 'Link' not in response.headers
+        self.mock_user_service.get_all_users.assert_called_once_with(limit=DEFAULT_PAGE_SIZE + 1, after=after,
+                                                                     fields=None)
+
+    def test_get_users_all(self, user_data):
+        user, _ = user_data
+
+        self.mock_user_service.get_all_users.return_value = [user]
+
+        response = self.client.get("/users/?all=true")
+
+        assert response.status_code == 200
+        self.mock_user_service.get_all_users.assert_called_once_with(limit=None, after=None, fields=None)
+
+    def test_get_users_with_fields_keeps_pagination_headers(self):
+        users = [User(id=str(ObjectId()), name=f"Player {i}", email=f"player{i}@email.com") for i in range(2)]
+
+        async def get_all_users(limit, after, fields):
+            return [fields.partial_model(id=user.id, name=user.name) for user in users]
+
+        self.mock_user_service.get_all_users.side_effect = get_all_users
+
+        response = self.client.get("/users/?limit=1&fields=name")
+
+        assert response.status_code == 200
+        assert response.json() == [{"id": users[0].id, "name": users[0].name}]
+        assert response.headers['X-Next-Cursor'] == encode_cursor(users[0].id)
+
+    def test_get_users_invalid_cursor(self):
+        response = self.client.get("/users/?after=invalid")
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Cursor de paginação inválido."}
+        self.mock_user_service.get_all_users.assert_not_called()
+
     def test_get_user_by_id_with_data(self, user_data):
         user, expected_response = user_data
 
@@ -88,7 +149,7 @@ class TestUserController:
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_user_service.get_user_by_id.assert_called_once_with(user.id)
+        self.mock_user_service.get_user_by_id.assert_called_once_with(user.id, fields=None)
 
     def test_get_user_by_id_no_data(self):
         self.mock_user_service.get_user_by_id.return_value = None
@@ -108,7 +169,7 @@ class TestUserController:
 
         assert response.status_code == 200
         assert response.json() == expected_response
-        self.mock_user_service.get_user_by_email.assert_called_once_with(user.email)
+        self.mock_user_service.get_user_by_email.assert_called_once_with(user.email, fields=None)
 
     def test_get_user_by_email_no_data(self):
         self.mock_user_service.get_user_by_email.return_value = None
@@ -130,6 +191,38 @@ class TestUserController:
         assert response.json() == expected_response
         self.mock_user_service.create_user.assert_called_once_with(user_create)
 
+    def test_create_user_duplicate_email(self, create_user_data):
+        user_create, _ = create_user_data
+
+        self.mock_user_service.create_user.side_effect = DuplicateKeyError("E11000 duplicate key error")
+
+        response = self.client.post("/users/", json=user_create.model_dump())
+
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Já existe um usuário com este e-mail."}
+
+    def test_bulk_write(self):
+        operations = [{'op': 'create', 'data': {'name': 'User 1', 'email': 'user1@email.com'}},
+                      {'op': 'delete', 'id': str(ObjectId())}]
+        results = [{'index': 0, 'op': 'create', 'status': 201, 'id': str(ObjectId()), 'detail': "Criado."},
+                   {'index': 1, 'op': 'delete', 'status': 404, 'id': operations[1]['id'], 'detail': "Não existe."}]
+
+        self.mock_user_service.bulk_write.return_value = results
+
+        response = self.client.post("/users/bulk", json={'ordered': False, 'operations': operations})
+
+        assert response.status_code == 200
+        assert response.json() == results
+        sent, = self.mock_user_service.bulk_write.call_args.args
+        assert [operation.op for operation in sent] == ['create', 'delete']
+        assert self.mock_user_service.bulk_write.call_args.kwargs == {'ordered': False}
+
+    def test_bulk_write_invalid_operation(self):
+        response = self.client.post("/users/bulk", json={'operations': [{'op': 'upsert'}]})
+
+        assert response.status_code == 422
+        self.mock_user_service.bulk_write.assert_not_called()
+
     def test_update_user(self, update_user_data):
         _id, user_update, updated_user, expected_response = update_user_data
 
@@ -0,0 +1,33 @@
+from bson import ObjectId
+
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character
+from app.models.user_model import User
+
+
+def user_document(user: User) -> dict:
+    return {'_id': ObjectId(user.id), 'name': user.name, 'email': user.email}
+
+
+def joined_campaign_document(campaign: Campaign) -> dict:
+    return {
+        '_id': ObjectId(campaign.id),
+        'name': campaign.name,
+        'description': campaign.description,
+        'master': ObjectId(campaign.master.id),
+        'players': [ObjectId(player.id) for player in campaign.players],
+        'character_sheet': campaign.character_sheet.model_dump(),
+        'master_user': [user_document(campaign.master)],
+        'player_users': [user_document(player) for player in campaign.players]
+    }
+
+
+def joined_character_document(character: Character) -> dict:
+    return {
+        '_id': ObjectId(character.id),
+        'player': ObjectId(character.player.id),
+        'campaign': ObjectId(character.campaign.id),
+        'player_character_sheet': character.player_character_sheet,
+        'player_user': [user_document(character.player)],
+        'campaign_document': [joined_campaign_document(character.campaign)]
+    }
@@ -0,0 +1,109 @@
+import pytest
+
+from bson import ObjectId
+
+from app.fieldsets import Fieldset
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character
+from app.models.character_sheet_model import CharacterSheet
+from app.models.user_model import User
+from app.services.aggregations import (campaign_from_document, campaigns_pipeline, character_from_document,
+                                       character_versions_pipeline, characters_pipeline)
+
+
+class TestAggregations:
+    @pytest.fixture
+    def joined_campaign(self):
+        master = {'_id': ObjectId(), 'name': 'Master 1', 'email': 'master1@email.com'}
+        first = {'_id': ObjectId(), 'name': 'Player 1', 'email': 'player1@email.com'}
+        second = {'_id': ObjectId(), 'name': 'Player 2', 'email': 'player2@email.com'}
+
+        document = {
+            '_id': ObjectId(),
+            'name': 'Campaign 1',
+            'description': 'First campaign',
+            'master': master['_id'],
+            'players': [second['_id'], first['_id']],
+            'character_sheet': {'fields': ['Field 1'], 'attributes': ['Attribute 1']},
+            'master_user': [master],
+            'player_users': [first, second]
+        }
+
+        campaign = Campaign(
+            id=str(document['_id']),
+            name='Campaign 1',
+            description='First campaign',
+            master=User(id=str(master['_id']), name='Master 1', email='master1@email.com'),
+            players=[User(id=str(second['_id']), name='Player 2', email='player2@email.com'),
+                     User(id=str(first['_id']), name='Player 1', email='player1@email.com')],
+            character_sheet=CharacterSheet(fields=['Field 1'], attributes=['Attribute 1'])
+        )
+
+        return document, campaign
+
+    def test_campaigns_pipeline_without_paging(self):
+        master = ObjectId()
+
+        pipeline = campaigns_pipeline({'master': master})
+
+        assert pipeline[0] == {'$match': {'master': master}}
+        assert [list(stage)[0] for stage in pipeline] == ['$match', '$lookup', '$lookup']
+
+    def test_campaigns_pipeline_pages_before_lookup(self):
+        after = ObjectId()
+
+        pipeline = campaigns_pipeline({}, limit=10, after=str(after))
+
+        assert pipeline[:3] == [{'$match': {'_id': {'$gt': after}}}, {'$sort': {'_id': 1}}, {'$limit': 10}]
+
+    def test_characters_pipeline_nests_campaign_lookups(self):
+        pipeline = characters_pipeline({})
+
+        campaign_lookup = pipeline[-1]['$lookup']
+        assert campaign_lookup['from'] == 'Campaigns'
+        assert [stage['$lookup']['from'] for stage in campaign_lookup['pipeline']] == ['Users', 'Users']
+
+    def test_campaign_from_document_keeps_player_order(self, joined_campaign):
+        document, campaign = joined_campaign
+
+        assert campaign_from_document(document) == campaign
+
+    def test_character_from_document(self, joined_campaign):
+        document, campaign = joined_campaign
+        player = document['player_users'][1]
+
+        character_document = {
+            '_id': ObjectId(),
+            'player': player['_id'],
+            'campaign': document['_id'],
+            'player_character_sheet': {'fields': {'Field 1': 'Value 1'}},
+            'player_user': [player],
+            'campaign_document': [document]
+        }
+
+        result = character_from_document(character_document)
+
+        assert result == Character(id=str(character_document['_id']), player=campaign.players[0], campaign=campaign,
+                                   player_character_sheet={'fields': {'Field 1': 'Value 1'}})
+
+    def test_character_versions_pipeline_only_projects_stamps(self):
+        player_id = ObjectId()
+
+        pipeline = character_versions_pipeline({'player': player_id}, limit=11)
+
+        assert pipeline[0] == {'$match': {'player': player_id}}
+        assert pipeline[2] == {'$limit': 11}
+        assert set(pipeline[3]['$project']) == {'version', 'updated_at', 'player', 'campaign'}
+        campaign_lookup = pipeline[5]['$lookup']
+        assert campaign_lookup['as'] == 'campaign_document'
+        assert [stage['$lookup']['as'] for stage in campaign_lookup['pipeline'][1:]] == ['master_user', 'player_users']
+
+    def test_versions_pipelines_join_what_the_fieldset_joins(self):
+        fields = Fieldset(Character, {'player_character_sheet', 'player'})
+
+        versions = character_versions_pipeline({'_id': ObjectId()}, fields=fields)
+        data = characters_pipeline({'_id': ObjectId()}, fields=fields)
+
+        assert [stage['$lookup']['as'] for stage in versions if '$lookup' in stage] == ['player_user']
+        assert [stage['$lookup']['as'] for stage in data if '$lookup' in stage] == ['player_user']
+        assert {'version', 'updated_at'} <= set(data[1]['$project'])
@@ -0,0 +1,316 @@
+import asyncio
+
+import pytest
+
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo.results import InsertOneResult
+from unittest.mock import AsyncMock, MagicMock
+
+from app.cache import TTLCache
+from app.conditional import version_stamps
+from app.fieldsets import Fieldset
+from app.live import change, live_hub
+from app.models.campaign_model import Campaign, CampaignBulkRequest, CampaignCreate, CampaignUpdate
+from app.models.character_sheet_model import CharacterSheet
+from app.models.user_model import User
+from app.services.async_campaign_service import AsyncCampaignService
+from tests.documents import joined_campaign_document
+
+pytestmark = pytest.mark.anyio
+
+
+class TestAsyncCampaignService:
+    @pytest.fixture(autouse=True)
+    def setup(self, mocker, mock_async_collection):
+        self.service = AsyncCampaignService()
+
+        self.mock_user_service = AsyncMock()
+        mocker.patch.object(self.service, 'user_service', self.mock_user_service)
+
+        self.mock_collection = mock_async_collection
+        mocker.patch.object(self.service, 'get_db', return_value=self.mock_collection)
+
+    @pytest.fixture
+    def campaign_data(self):
+        _id = str(ObjectId())
+        master_user = User(id=str(ObjectId()), name="Master 1", email="master1@email.com")
+        player_user = User(id=str(ObjectId()), name="Player", email="player@email.com")
+
+        raw_campaign = {
+            '_id': ObjectId(_id),
+            'name': 'Campaign 1',
+            'description': 'First campaign',
+            'master': ObjectId(master_user.id),
+            'players': [ObjectId(player_user.id)],
+            'character_sheet': {'fields': ['Field 1', 'Field 2'], 'attributes': ['Attribute 1', 'Attribute 2']}
+        }
+
+        campaign = Campaign(
+            id=_id,
+            name='Campaign 1',
+            description='First campaign',
+            master=master_user,
+            players=[player_user],
+            character_sheet=CharacterSheet(fields=["Field 1", "Field 2"], attributes=["Attribute 1", "Attribute 2"])
+        )
+
+        return raw_campaign, campaign
+
+    def test_get_db_uses_async_collection(self):
+        mock_registry = MagicMock()
+        service = AsyncCampaignService(registry=mock_registry)
+
+        result = service.get_db()
+
+        mock_registry.get_async_collection.assert_called_once_with('Campaigns')
+        assert result == mock_registry.get_async_collection.return_value
+        assert service.user_service.registry is mock_registry
+
+    async def test_get_all_campaigns_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_campaign]
+        self.mock_user_service.get_users_by_ids.return_value = [campaign.master, campaign.players[0]]
+
+        result = await self.service.get_all_campaigns()
+
+        assert result == [campaign]
+        self.mock_user_service.get_users_by_ids.assert_awaited_once()
+
+    async def test_get_all_campaigns_no_data(self):
+        result = await self.service.get_all_campaigns()
+
+        assert result == []
+        self.mock_user_service.get_users_by_ids.assert_not_awaited()
+
+    async def test_get_campaigns_by_master_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_campaign]
+        self.mock_user_service.get_users_by_ids.return_value = [campaign.master, campaign.players[0]]
+
+        result = await self.service.get_campaigns_by_master(campaign.master.id)
+
+        assert result == [campaign]
+        self.mock_collection.find.assert_called_once_with({'master': ObjectId(campaign.master.id)}, None)
+
+    async def test_get_campaigns_by_player_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_campaign]
+        self.mock_user_service.get_users_by_ids.return_value = [campaign.master, campaign.players[0]]
+
+        result = await self.service.get_campaigns_by_player(campaign.players[0].id)
+
+        assert result == [campaign]
+        self.mock_collection.find.assert_called_once_with({'players': ObjectId(campaign.players[0].id)}, None)
+
+    async def test_get_campaigns_by_player_with_fields(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        fields = Fieldset(Campaign, {'name'})
+
+        projected_campaign = {'_id': raw_campaign['_id'], 'name': 'Campaign 1'}
+        self.mock_collection.find.return_value.to_list.return_value = [projected_campaign]
+
+        result = await self.service.get_campaigns_by_player(campaign.players[0].id, fields=fields)
+
+        assert [item.model_dump() for item in result] == [{'id': campaign.id, 'name': 'Campaign 1'}]
+        self.mock_collection.find.assert_called_once_with({'players': ObjectId(campaign.players[0].id)}, {'name': 1})
+        self.mock_user_service.get_users_by_ids.assert_not_awaited()
+
+    async def test_get_campaign_by_id_with_fields_skips_lookups(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        fields = Fieldset(Campaign, {'name', 'master'})
+
+        projected_keys = ('_id', 'name', 'master', 'master_user')
+        self.mock_collection.aggregate.return_value.to_list.return_value = [
+            {key: value for key, value in joined_campaign_document(campaign).items() if key in projected_keys}
+        ]
+
+        result = await self.service.get_campaign_by_id(campaign.id, fields=fields)
+
+        assert result.model_dump() == {'id': campaign.id, 'name': campaign.name,
+                                       'master': campaign.master.model_dump()}
+        pipeline = self.mock_collection.aggregate.call_args.args[0]
+        assert pipeline[1] == {'$project': {'master': 1, 'name': 1, 'version': 1, 'updated_at': 1}}
+        assert [stage['$lookup']['as'] for stage in pipeline[2:]] == ['master_user']
+
+    async def test_get_campaigns_by_master_paginated(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        after = str(ObjectId())
+
+        paged_cursor = self.mock_collection.find.return_value.sort.return_value.limit.return_value
+        paged_cursor.to_list = AsyncMock(return_value=[raw_campaign])
+        self.mock_user_service.get_users_by_ids.return_value = [campaign.master, campaign.players[0]]
+
+        result = await self.service.get_campaigns_by_master(campaign.master.id, limit=10, after=after)
+
+        assert result == [campaign]
+        self.mock_collection.find.assert_called_once_with(
+            {'master': ObjectId(campaign.master.id), '_id': {'$gt': ObjectId(after)}}, None)
+        self.mock_collection.find.return_value.sort.assert_called_once_with('_id', 1)
+        self.mock_collection.find.return_value.sort.return_value.limit.assert_called_once_with(10)
+
+    async def test_get_campaign_by_id_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.aggregate.return_value.to_list.return_value = [joined_campaign_document(campaign)]
+
+        result = await self.service.get_campaign_by_id(campaign.id)
+
+        assert result == campaign
+        self.mock_collection.aggregate.assert_called_once()
+        self.mock_user_service.get_users_by_ids.assert_not_awaited()
+
+    async def test_get_campaign_by_id_no_data(self):
+        result = await self.service.get_campaign_by_id(str(ObjectId()))
+
+        assert result is None
+
+    async def test_get_campaigns_by_ids_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_campaign]
+        self.mock_user_service.get_users_by_ids.return_value = [campaign.master, campaign.players[0]]
+
+        result = await self.service.get_campaigns_by_ids([campaign.id])
+
+        assert result == [campaign]
+
+    async def test_get_campaign_by_id_uses_cache(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.aggregate.return_value.to_list.return_value = [joined_campaign_document(campaign)]
+
+        await self.service.get_campaign_by_id(campaign.id)
+        result = await self.service.get_campaign_by_id(campaign.id)
+
+        assert result == campaign
+        self.mock_collection.aggregate.assert_called_once()
+
+    async def test_get_versioned_campaign_stamps_the_served_document(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        document = {**joined_campaign_document(campaign), 'version': 4, 'updated_at': datetime(2024, 5, 1)}
+        document['master_user'][0].update(version=2, updated_at=datetime(2024, 6, 1))
+        self.mock_collection.aggregate.return_value.to_list.return_value = [document]
+
+        result, stamps = await self.service.get_versioned_campaign(campaign.id)
+        cached, cached_stamps = await self.service.get_versioned_campaign(campaign.id)
+
+        assert result == cached == campaign
+        assert stamps == cached_stamps == version_stamps(document)
+        assert (campaign.master.id, 2, datetime(2024, 6, 1, tzinfo=timezone.utc)) in stamps
+        self.mock_collection.aggregate.assert_called_once()
+
+    async def test_get_versioned_campaign_uncached_and_invalidated(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.mock_collection.aggregate.return_value.to_list.return_value = [joined_campaign_document(campaign)]
+        self.mock_collection.find_one_and_update.return_value = raw_campaign
+
+        await self.service.get_versioned_campaign(campaign.id)
+        await self.service.get_versioned_campaign(campaign.id, cached=False)
+        await self.service.update_campaign(campaign.id, CampaignUpdate(name='Renamed'))
+        await self.service.get_versioned_campaign(campaign.id)
+
+        assert self.mock_collection.aggregate.call_count == 3
+
+    async def test_concurrent_get_campaign_by_id_is_coalesced(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.service.cache = TTLCache(maxsize=0, ttl=0)
+
+        self.mock_collection.aggregate.return_value.to_list.return_value = [joined_campaign_document(campaign)]
+
+        results = await asyncio.gather(*(self.service.get_campaign_by_id(campaign.id) for _ in range(3)))
+
+        assert results == [campaign] * 3
+        self.mock_collection.aggregate.assert_called_once()
+
+    async def test_get_campaigns_by_ids_served_from_cache(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.service.cache.set(campaign.id, campaign)
+
+        result = await self.service.get_campaigns_by_ids([campaign.id])
+
+        assert result == [campaign]
+        self.mock_collection.find.assert_not_called()
+
+    async def test_create_campaign(self):
+        _id = ObjectId()
+        self.mock_collection.insert_one.return_value = InsertOneResult(_id, acknowledged=True)
+
+        campaign_create = CampaignCreate(
+            name="New Campaign",
+            description="A New Campaign",
+            master=str(ObjectId()),
+            players=[str(ObjectId())],
+            character_sheet=CharacterSheet(fields=["Field 1"], attributes=["Attribute 1"])
+        )
+
+        result = await self.service.create_campaign(campaign_create)
+
+        assert result == {"detail": "Campanha cadastrada com sucesso!", "id": str(_id)}
+        inserted = self.mock_collection.insert_one.call_args.args[0]
+        assert inserted['master'] == ObjectId(campaign_create.master)
+        assert inserted['version'] == 1
+
+    async def test_update_campaign_with_data(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+
+        self.mock_collection.find_one_and_update.return_value = raw_campaign
+
+        result = await self.service.update_campaign(campaign.id, CampaignUpdate(name="Updated Campaign"))
+
+        assert result == {"detail": "Campanha atualizada com sucesso!", "id": campaign.id}
+
+    async def test_update_campaign_no_data(self):
+        self.mock_collection.find_one_and_update.return_value = None
+
+        result = await self.service.update_campaign(str(ObjectId()), CampaignUpdate(name="Updated Campaign"))
+
+        assert result is None
+
+    async def test_update_campaign_invalidates_cache(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.service.cache.set(campaign.id, campaign)
+
+        self.mock_collection.find_one_and_update.return_value = raw_campaign
+
+        await self.service.update_campaign(campaign.id, CampaignUpdate(name="Updated Campaign"))
+
+        assert self.service.cache.get(campaign.id) == (False, None)
+
+    async def test_update_campaign_notifies_live_subscribers(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.mock_collection.find_one_and_update.return_value = {**raw_campaign, 'version': 7}
+
+        with live_hub.subscribe(campaign.id) as subscription:
+            await self.service.update_campaign(campaign.id, CampaignUpdate(name="Updated Campaign"))
+
+        assert list(subscription.pending.values()) == [change('campaign', campaign.id, 7)]
+
+    async def test_delete_campaign(self):
+        self.mock_collection.delete_one.return_value = MagicMock(deleted_count=0)
+
+        result = await self.service.delete_campaign(str(ObjectId()))
+
+        assert result is False
+
+    async def test_bulk_write_rejects_missing_users_and_campaigns(self, campaign_data):
+        raw_campaign, campaign = campaign_data
+        self.service.cache.set(campaign.id, campaign)
+        self.mock_collection.find.return_value.to_list.return_value = [{'_id': ObjectId(campaign.id)}]
+        self.mock_user_service.existing_ids.return_value = {campaign.master.id}
+        operations = CampaignBulkRequest.model_validate({'operations': [
+            {'op': 'update', 'id': campaign.id, 'data': {'name': 'Renamed'}},
+            {'op': 'update', 'id': campaign.id, 'data': {'players': [str(ObjectId())]}},
+            {'op': 'delete', 'id': str(ObjectId())},
+        ]}).operations
+
+        results = await self.service.bulk_write(operations, ordered=False)
+
+        assert [result.status for result in results] == [200, 400, 404]
+        assert results[1].detail == "Um ou mais jogadores dessa campanha não foram encontrados."
+        assert self.service.cache.get(campaign.id) == (False, None)
+        self.mock_collection.bulk_write.assert_awaited_once()
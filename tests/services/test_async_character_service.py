@@ -0,0 +1,376 @@
+import pytest
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertOneResult
+from unittest.mock import AsyncMock, MagicMock
+
+from app.live import change, deletion, live_hub
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character, CharacterBulkRequest, CharacterCreate, CharacterUpdate
+from app.models.character_sheet_model import CharacterSheet
+from app.models.sheet_patch_model import CharacterSheetPatch, SheetDeltaRequest
+from app.models.user_model import User
+from app.services.async_character_service import AsyncCharacterService
+from tests.documents import joined_character_document
+
+pytestmark = pytest.mark.anyio
+
+
+class TestAsyncCharacterService:
+    @pytest.fixture(autouse=True)
+    def setup(self, mocker, mock_async_collection):
+        self.service = AsyncCharacterService()
+
+        self.mock_campaign_service = AsyncMock()
+        mocker.patch.object(self.service, 'campaign_service', self.mock_campaign_service)
+
+        self.mock_user_service = AsyncMock()
+        mocker.patch.object(self.service, 'user_service', self.mock_user_service)
+
+        self.mock_collection = mock_async_collection
+        mocker.patch.object(self.service, 'get_db', return_value=self.mock_collection)
+
+    @pytest.fixture
+    def character_data(self):
+        _id = str(ObjectId())
+        master_user = User(id=str(ObjectId()), name="Master 1", email="master1@email.com")
+        player_user = User(id=str(ObjectId()), name="Player", email="player@email.com")
+        campaign = Campaign(
+            id=str(ObjectId()),
+            name='Campaign 1',
+            description='First campaign',
+            master=master_user,
+            players=[player_user],
+            character_sheet=CharacterSheet(fields=["Field 1", "Field 2"], attributes=["Attribute 1", "Attribute 2"])
+        )
+
+        raw_character = {
+            "_id": ObjectId(_id),
+            "player": ObjectId(player_user.id),
+            "campaign": ObjectId(campaign.id),
+            "player_character_sheet": {"fields": {"Field 1": "Value 1"}, "attributes": {"Attribute 1": 20}}
+        }
+
+        character = Character(
+            id=_id,
+            player=player_user,
+            campaign=campaign,
+            player_character_sheet={"fields": {"Field 1": "Value 1"}, "attributes": {"Attribute 1": 20}}
+        )
+
+        return raw_character, character
+
+    def test_nested_services_share_registry(self):
+        mock_registry = MagicMock()
+        service = AsyncCharacterService(registry=mock_registry)
+
+        service.get_db()
+
+        mock_registry.get_async_collection.assert_called_once_with('Characters')
+        assert service.campaign_service.user_service is service.user_service
+
+    async def test_get_all_characters_with_data(self, character_data):
+        raw_character, character = character_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_character]
+        self.mock_user_service.get_users_by_ids.return_value = [character.player]
+        self.mock_campaign_service.get_campaigns_by_ids.return_value = [character.campaign]
+
+        result = await self.service.get_all_characters()
+
+        assert result == [character]
+
+    async def test_get_all_characters_no_data(self):
+        result = await self.service.get_all_characters()
+
+        assert result == []
+
+    async def test_stream_characters_hydrates_per_batch(self, character_data):
+        raw_character, character = character_data
+
+        self.mock_collection.find.return_value.__aiter__.return_value = [raw_character] * 5
+        self.mock_user_service.get_users_by_ids.return_value = [character.player]
+        self.mock_campaign_service.get_campaigns_by_ids.return_value = [character.campaign]
+
+        result = [item async for item in self.service.stream_characters(batch_size=2)]
+
+        assert result == [character] * 5
+        assert self.mock_user_service.get_users_by_ids.await_count == 3
+        self.mock_collection.find.assert_called_once_with({}, None, batch_size=2)
+
+    async def test_get_characters_by_player_with_lookup(self, character_data):
+        raw_character, character = character_data
+
+        self.service.use_lookup = True
+        self.mock_collection.aggregate.return_value.to_list = AsyncMock(
+            return_value=[joined_character_document(character)])
+
+        result = await self.service.get_characters_by_player(character.player.id, limit=5)
+
+        assert result == [character]
+        pipeline = self.mock_collection.aggregate.call_args.args[0]
+        assert pipeline[:3] == [{'$match': {'player': ObjectId(character.player.id)}}, {'$sort': {'_id': 1}},
+                                {'$limit': 5}]
+        self.mock_campaign_service.get_campaigns_by_ids.assert_not_awaited()
+
+    async def test_get_characters_by_player_with_data(self, character_data):
+        raw_character, character = character_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_character]
+        self.mock_user_service.get_users_by_ids.return_value = [character.player]
+        self.mock_campaign_service.get_campaigns_by_ids.return_value = [character.campaign]
+
+        result = await self.service.get_characters_by_player(character.player.id)
+
+        assert result == [character]
+        self.mock_collection.find.assert_called_once_with({'player': ObjectId(character.player.id)}, None)
+
+    async def test_get_character_by_id_with_data(self, character_data):
+        raw_character, character = character_data
+
+        self.mock_collection.aggregate.return_value.to_list.return_value = [joined_character_document(character)]
+
+        result = await self.service.get_character_by_id(character.id)
+
+        assert result == character
+        self.mock_collection.aggregate.assert_called_once()
+        self.mock_user_service.get_user_by_id.assert_not_awaited()
+        self.mock_campaign_service.get_campaign_by_id.assert_not_awaited()
+
+    async def test_get_character_by_id_no_data(self):
+        result = await self.service.get_character_by_id(str(ObjectId()))
+
+        assert result is None
+        self.mock_user_service.get_user_by_id.assert_not_awaited()
+
+    async def test_create_character(self):
+        _id, campaign_id = ObjectId(), str(ObjectId())
+        self.mock_collection.insert_one.return_value = InsertOneResult(_id, acknowledged=True)
+
+        with live_hub.subscribe(campaign_id) as subscription, live_hub.subscribe('None') as nowhere:
+            result = await self.service.create_character(CharacterCreate(player=str(ObjectId()), campaign=campaign_id))
+
+        assert result == {"detail": "Personagem cadastrado com sucesso!", "id": str(_id)}
+        assert list(subscription.pending.values()) == [change('character', _id, 1)]
+        assert nowhere.pending == {}
+
+    async def test_update_character_with_data(self, character_data):
+        raw_character, character = character_data
+
+        self.mock_collection.find_one_and_update.return_value = raw_character
+
+        result = await self.service.update_character(character.id, CharacterUpdate(campaign=character.campaign.id))
+
+        assert result == {"detail": "Personagem atualizado com sucesso!", "id": character.id}
+        update = self.mock_collection.find_one_and_update.call_args.args[1]
+        assert update['$set']['campaign'] == ObjectId(character.campaign.id)
+        assert 'updated_at' in update['$set']
+        assert update['$inc'] == {'version': 1}
+
+    async def test_update_character_no_data(self):
+        self.mock_collection.find_one_and_update.return_value = None
+
+        result = await self.service.update_character(str(ObjectId()), CharacterUpdate(player=str(ObjectId())))
+
+        assert result is None
+
+    async def test_patch_character_sheet_sends_only_dotted_paths(self, character_data):
+        raw_character, character = character_data
+        patch = CharacterSheetPatch.model_validate({'operations': [
+            {'op': 'inc', 'path': 'attributes.PV', 'value': -3},
+            {'op': 'set', 'path': 'fields.Condição', 'value': 'Atordoado'},
+            {'op': 'unset', 'path': 'fields.Field 1'},
+        ]})
+        self.mock_collection.find_one_and_update.return_value = {
+            '_id': raw_character['_id'], 'version': 4,
+            'player_character_sheet': {'attributes': {'PV': 17}, 'fields': {'Condição': 'Atordoado'}}}
+
+        result = await self.service.patch_character_sheet(character.id, patch)
+
+        assert result == {"detail": "Ficha atualizada com sucesso!", "id": character.id, "version": 4,
+                          "changes": {'attributes.PV': 17, 'fields.Condição': 'Atordoado'},
+                          "removed": ['fields.Field 1']}
+        query, update = self.mock_collection.find_one_and_update.call_args.args
+        assert query == {'_id': ObjectId(character.id)}
+        assert update['$inc'] == {'version': 1, 'player_character_sheet.attributes.PV': -3}
+        assert update['$set']['player_character_sheet.fields.Condição'] == 'Atordoado'
+        assert set(update['$set']) == {'player_character_sheet.fields.Condição', 'updated_at'}
+        assert update['$unset'] == {'player_character_sheet.fields.Field 1': ''}
+        assert self.mock_collection.find_one_and_update.call_args.kwargs['projection'] == {
+            'version': 1, 'player_character_sheet.attributes.PV': 1, 'player_character_sheet.fields.Condição': 1,
+            'campaign': 1}
+
+    async def test_patch_character_sheet_no_data(self):
+        self.mock_collection.find_one_and_update.return_value = None
+        patch = CharacterSheetPatch.model_validate({'operations': [{'op': 'set', 'path': 'fields.PV', 'value': 1}]})
+
+        assert await self.service.patch_character_sheet(str(ObjectId()), patch) is None
+
+    async def test_update_character_moving_campaigns_notifies_both(self, character_data):
+        raw_character, character = character_data
+        new_campaign = str(ObjectId())
+        self.mock_collection.find_one_and_update.return_value = {**raw_character, 'version': 3}
+
+        with live_hub.subscribe(character.campaign.id) as old, live_hub.subscribe(new_campaign) as new:
+            await self.service.update_character(character.id, CharacterUpdate(campaign=new_campaign))
+
+        assert list(old.pending.values()) == [deletion('character', character.id)]
+        assert list(new.pending.values()) == [change('character', character.id, 4)]
+        projection = self.mock_collection.find_one_and_update.call_args.kwargs['projection']
+        assert projection == {'campaign': 1, 'version': 1}
+
+    async def test_delete_character(self, character_data):
+        raw_character, character = character_data
+        self.mock_collection.find_one_and_delete.return_value = {'_id': raw_character['_id'],
+                                                                 'campaign': raw_character['campaign']}
+
+        with live_hub.subscribe(character.campaign.id) as subscription:
+            result = await self.service.delete_character(character.id)
+
+        assert result is True
+        assert list(subscription.pending.values()) == [deletion('character', character.id)]
+        self.mock_collection.find_one_and_delete.assert_awaited_once_with({'_id': ObjectId(character.id)},
+                                                                          projection={'campaign': 1})
+
+    async def test_delete_character_not_found(self):
+        self.mock_collection.find_one_and_delete.return_value = None
+
+        assert await self.service.delete_character(str(ObjectId())) is False
+
+    async def test_bulk_write_checks_references_once_per_batch(self, character_data):
+        raw_character, character = character_data
+        missing_campaign = str(ObjectId())
+
+        self.mock_user_service.existing_ids.return_value = {character.player.id}
+        self.mock_campaign_service.existing_ids.return_value = {character.campaign.id}
+        operations = CharacterBulkRequest.model_validate({'operations': [
+            {'op': 'create', 'data': {'player': character.player.id, 'campaign': character.campaign.id}},
+            {'op': 'create', 'data': {'player': character.player.id, 'campaign': missing_campaign}},
+            {'op': 'create', 'data': {'player': str(ObjectId()), 'campaign': character.campaign.id}},
+        ]}).operations
+
+        results = await self.service.bulk_write(operations, ordered=False)
+
+        assert [result.status for result in results] == [201, 400, 400]
+        assert results[1].detail == "A campanha desse personagem não foi encontrada."
+        assert results[2].detail == "O jogador desse personagem não foi encontrado."
+        self.mock_user_service.existing_ids.assert_awaited_once()
+        self.mock_campaign_service.existing_ids.assert_awaited_once_with({character.campaign.id, missing_campaign})
+        inserted = self.mock_collection.bulk_write.call_args.args[0]
+        assert len(inserted) == 1
+        assert inserted[0]._doc['campaign'] == ObjectId(character.campaign.id)
+
+    async def test_bulk_write_notifies_creates(self, character_data):
+        raw_character, character = character_data
+        self.mock_user_service.existing_ids.return_value = {character.player.id}
+        self.mock_campaign_service.existing_ids.return_value = {character.campaign.id}
+        operations = CharacterBulkRequest.model_validate({'operations': [
+            {'op': 'create', 'data': {'player': character.player.id, 'campaign': character.campaign.id}},
+        ]}).operations
+
+        with live_hub.subscribe(character.campaign.id) as subscription, live_hub.subscribe('None') as nowhere:
+            results = await self.service.bulk_write(operations)
+
+        assert list(subscription.pending.values()) == [change('character', results[0].id, 1)]
+        assert nowhere.pending == {}
+
+    async def test_bulk_write_notifies_updates_deletes_and_moves(self, character_data):
+        raw_character, character = character_data
+        moved, deleted, new_campaign = ObjectId(), ObjectId(), str(ObjectId())
+        self.mock_collection.find.return_value.to_list.return_value = [
+            {'_id': raw_character['_id'], 'campaign': raw_character['campaign']},
+            {'_id': moved, 'campaign': raw_character['campaign']},
+            {'_id': deleted, 'campaign': raw_character['campaign']},
+        ]
+        self.mock_campaign_service.existing_ids.return_value = {new_campaign}
+        operations = CharacterBulkRequest.model_validate({'operations': [
+            {'op': 'update', 'id': character.id, 'data': {'player_character_sheet': {'fields': {'Nota': 'x'}}}},
+            {'op': 'update', 'id': str(moved), 'data': {'campaign': new_campaign}},
+            {'op': 'delete', 'id': str(deleted)},
+        ]}).operations
+
+        with live_hub.subscribe(character.campaign.id) as old, live_hub.subscribe(new_campaign) as new:
+            results = await self.service.bulk_write(operations)
+
+        assert [result.status for result in results] == [200, 200, 200]
+        assert list(old.pending.values()) == [change('character', character.id), deletion('character', moved),
+                                              deletion('character', deleted)]
+        assert list(new.pending.values()) == [change('character', moved)]
+        query, projection = self.mock_collection.find.call_args.args
+        assert set(query['_id']['$in']) == {ObjectId(character.id), moved, deleted}
+        assert projection == {'campaign': 1}
+
+    async def test_apply_sheet_deltas_checks_membership_once_and_writes_unordered(self):
+        campaign_id, member, outsider = str(ObjectId()), str(ObjectId()), str(ObjectId())
+        self.mock_collection.find.return_value.to_list.return_value = [{'_id': ObjectId(member)}]
+        deltas = SheetDeltaRequest.model_validate({'deltas': [
+            {'id': member, 'operations': [{'op': 'inc', 'path': 'attributes.PV', 'value': -4}]},
+            {'id': outsider, 'operations': [{'op': 'set', 'path': 'fields.Condição', 'value': 'Caído'}]},
+            {'id': 'invalid', 'operations': [{'op': 'unset', 'path': 'fields.Condição'}]},
+        ]}).deltas
+
+        results = await self.service.apply_sheet_deltas(campaign_id, deltas)
+
+        assert [(result.status, result.id) for result in results] == [(200, member), (404, outsider),
+                                                                      (404, 'invalid')]
+        assert results[1].detail == "Personagem não encontrado nesta campanha."
+        self.mock_collection.find.assert_called_once_with(
+            {'_id': {"$in": [ObjectId(member), ObjectId(outsider)]}, 'campaign': ObjectId(campaign_id)}, {'_id': 1})
+        requests = self.mock_collection.bulk_write.call_args.args[0]
+        assert self.mock_collection.bulk_write.call_args.kwargs == {'ordered': False}
+        assert len(requests) == 1
+        assert requests[0]._filter == {'_id': ObjectId(member)}
+        assert requests[0]._doc['$inc'] == {'version': 1, 'player_character_sheet.attributes.PV': -4}
+
+    async def test_apply_sheet_deltas_reports_failed_writes(self):
+        first, second = str(ObjectId()), str(ObjectId())
+        self.mock_collection.find.return_value.to_list.return_value = [{'_id': ObjectId(first)},
+                                                                       {'_id': ObjectId(second)}]
+        self.mock_collection.bulk_write.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 0, 'code': 14, 'errmsg': 'Cannot apply $inc to a value of non-numeric type'}]})
+        deltas = SheetDeltaRequest.model_validate({'deltas': [
+            {'id': first, 'operations': [{'op': 'inc', 'path': 'fields.Nome', 'value': 1}]},
+            {'id': second, 'operations': [{'op': 'inc', 'path': 'attributes.PV', 'value': 1}]},
+        ]}).deltas
+
+        results = await self.service.apply_sheet_deltas(str(ObjectId()), deltas)
+
+        assert [result.status for result in results] == [400, 200]
+        assert results[0].detail == "Não foi possível aplicar as alterações na ficha."
+
+    async def test_apply_sheet_deltas_publishes_written_values_to_live_subscribers(self):
+        campaign_id, member = str(ObjectId()), str(ObjectId())
+        self.mock_collection.find.return_value.to_list.side_effect = [
+            [{'_id': ObjectId(member)}],
+            [{'_id': ObjectId(member), 'version': 6, 'player_character_sheet': {'attributes': {'PV': 9}}}],
+        ]
+        deltas = SheetDeltaRequest.model_validate({'deltas': [
+            {'id': member, 'operations': [{'op': 'inc', 'path': 'attributes.PV', 'value': -1}]}]}).deltas
+
+        with live_hub.subscribe(campaign_id) as subscription:
+            await self.service.apply_sheet_deltas(campaign_id, deltas)
+
+        assert list(subscription.pending.values()) == [change('character', member, 6, {'attributes.PV': 9})]
+        assert self.mock_collection.find.call_args.args == (
+            {'_id': {"$in": [ObjectId(member)]}}, {'version': 1, 'player_character_sheet.attributes.PV': 1})
+
+    async def test_get_character_versions_by_player(self, character_data):
+        raw_character, character = character_data
+        stamps = [{'_id': ObjectId(character.id), 'version': 1}]
+        self.mock_collection.aggregate.return_value.to_list.return_value = stamps
+
+        result = await self.service.get_character_versions_by_player(character.player.id, limit=11)
+
+        assert result == stamps
+        pipeline = self.mock_collection.aggregate.call_args.args[0]
+        assert pipeline[0] == {'$match': {'player': ObjectId(character.player.id)}}
+
+    async def test_existing_ids_only_projects_ids(self):
+        _id = ObjectId()
+        self.mock_collection.find.return_value.to_list.return_value = [{'_id': _id}]
+
+        result = await self.service.existing_ids([str(_id), 'invalid'])
+
+        assert result == {str(_id)}
+        self.mock_collection.find.assert_called_once_with({'_id': {'$in': [_id]}}, {'_id': 1})
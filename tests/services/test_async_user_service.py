@@ -0,0 +1,169 @@
+import pytest
+
+from bson import ObjectId
+from pymongo.results import InsertOneResult
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.user_model import User, UserCreate, UserUpdate
+from app.services.async_user_service import AsyncUserService
+
+pytestmark = pytest.mark.anyio
+
+
+class TestAsyncUserService:
+    @pytest.fixture(autouse=True)
+    def setup(self, mocker, mock_async_collection):
+        self.service = AsyncUserService()
+
+        self.mock_collection = mock_async_collection
+        mocker.patch.object(self.service, 'get_db', return_value=self.mock_collection)
+
+    @pytest.fixture
+    def user_data(self):
+        _id = str(ObjectId())
+        user = User(id=_id, name="User 1", email="user1@email.com")
+        raw_user = {'_id': ObjectId(_id), 'name': 'User 1', 'email': 'user1@email.com'}
+
+        return user, raw_user
+
+    def test_get_db_uses_async_collection(self):
+        mock_registry = MagicMock()
+        service = AsyncUserService(registry=mock_registry)
+
+        result = service.get_db()
+
+        mock_registry.get_async_collection.assert_called_once_with('Users')
+        assert result == mock_registry.get_async_collection.return_value
+
+    async def test_get_all_users_with_data(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_user]
+
+        result = await self.service.get_all_users()
+
+        assert result == [user]
+        self.mock_collection.find.assert_called_once()
+
+    async def test_get_all_users_no_data(self):
+        result = await self.service.get_all_users()
+
+        assert result == []
+
+    async def test_get_user_by_id_with_data(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find_one.return_value = raw_user
+
+        result = await self.service.get_user_by_id(user.id)
+
+        assert result == user
+        self.mock_collection.find_one.assert_awaited_once_with({'_id': ObjectId(user.id)}, None)
+
+    async def test_get_user_by_id_no_data(self):
+        self.mock_collection.find_one.return_value = None
+
+        result = await self.service.get_user_by_id(str(ObjectId()))
+
+        assert result is None
+
+    async def test_get_users_by_ids_with_data(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find.return_value.to_list.return_value = [raw_user]
+
+        result = await self.service.get_users_by_ids([user.id])
+
+        assert result == [user]
+        self.mock_collection.find.assert_called_once_with({'_id': {'$in': [ObjectId(user.id)]}})
+
+    async def test_get_user_by_id_uses_cache(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find_one.return_value = raw_user
+
+        await self.service.get_user_by_id(user.id)
+        result = await self.service.get_user_by_id(user.id)
+
+        assert result == user
+        self.mock_collection.find_one.assert_awaited_once()
+
+    async def test_get_users_by_ids_fetches_only_misses(self, user_data):
+        user, raw_user = user_data
+        other_id = str(ObjectId())
+        other_user = User(id=other_id, name="User 2", email="user2@email.com")
+        self.service.cache.set(user.id, user)
+
+        self.mock_collection.find.return_value.to_list.return_value = [
+            {'_id': ObjectId(other_id), 'name': 'User 2', 'email': 'user2@email.com'}]
+
+        result = await self.service.get_users_by_ids([user.id, other_id])
+
+        assert result == [user, other_user]
+        self.mock_collection.find.assert_called_once_with({'_id': {'$in': [ObjectId(other_id)]}})
+
+    async def test_existing_ids_queries_even_when_cached(self, user_data):
+        user, raw_user = user_data
+        other_id = ObjectId()
+        # A cached user may have been deleted through another worker since it was cached.
+        self.service.cache.set(user.id, user)
+
+        self.mock_collection.find.return_value.to_list.return_value = [{'_id': other_id}]
+
+        result = await self.service.existing_ids([user.id, str(other_id), 'invalid'])
+
+        assert result == {str(other_id)}
+        self.mock_collection.find.assert_called_once_with({'_id': {'$in': [ObjectId(user.id), other_id]}}, {'_id': 1})
+
+    async def test_get_user_by_email_with_data(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find_one.return_value = raw_user
+
+        result = await self.service.get_user_by_email(user.email)
+
+        assert result == user
+
+    async def test_create_user(self):
+        _id = ObjectId()
+        self.mock_collection.insert_one.return_value = InsertOneResult(_id, acknowledged=True)
+
+        result = await self.service.create_user(UserCreate(name="User 1", email="user1@email.com"))
+
+        assert result == {"detail": "Usuário cadastrado com sucesso!", "id": str(_id)}
+        self.mock_collection.insert_one.assert_awaited_once()
+
+    async def test_update_user_with_data(self, user_data):
+        user, raw_user = user_data
+
+        self.mock_collection.find_one_and_update.return_value = raw_user
+
+        result = await self.service.update_user(user.id, UserUpdate(name="User 1"))
+
+        assert result == user
+
+    async def test_update_user_no_data(self):
+        self.mock_collection.find_one_and_update.return_value = None
+
+        result = await self.service.update_user(str(ObjectId()), UserUpdate(name="User 1"))
+
+        assert result is None
+
+    async def test_update_user_invalidates_cached_user_and_campaigns(self, user_data):
+        user, raw_user = user_data
+        self.service.cache.set(user.id, user)
+        self.service.campaign_cache.set('campaign', object())
+
+        self.mock_collection.find_one_and_update.return_value = raw_user
+
+        await self.service.update_user(user.id, UserUpdate(name="User 1"))
+
+        assert self.service.cache.get(user.id) == (False, None)
+        assert self.service.campaign_cache.get('campaign') == (False, None)
+
+    async def test_delete_user(self):
+        self.mock_collection.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+
+        result = await self.service.delete_user(str(ObjectId()))
+
+        assert result is True
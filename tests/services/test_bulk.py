@@ -0,0 +1,89 @@
+import pytest
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.user_model import UserBulkRequest, UserUpdate
+from app.services.bulk import SKIPPED_STATUS, BulkWriter, object_ids, target_ids
+
+pytestmark = pytest.mark.anyio
+
+
+class TestBulkWriter:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.writer = BulkWriter({'create': "Criado.", 'update': "Atualizado.", 'delete': "Excluído."},
+                                 not_found="Não encontrado.", duplicate="Duplicado.")
+        self.collection = MagicMock(bulk_write=AsyncMock())
+        self.existing_id = str(ObjectId())
+        self.operations = UserBulkRequest.model_validate({'operations': [
+            {'op': 'create', 'data': {'name': 'User 1', 'email': 'user1@email.com'}},
+            {'op': 'update', 'id': str(ObjectId()), 'data': {'name': 'Missing'}},
+            {'op': 'delete', 'id': self.existing_id},
+        ]}).operations
+
+    def rejections(self):
+        existing = {self.existing_id}
+        results = {index: self.writer.check_target(index, operation, existing)
+                   for index, operation in enumerate(self.operations)}
+        return {index: result for index, result in results.items() if result is not None}
+
+    @staticmethod
+    def document(operation):
+        return operation.data.model_dump(exclude_none=True)
+
+    def test_object_ids_skips_malformed_and_repeated_ids(self):
+        _id = str(ObjectId())
+
+        assert object_ids([_id, 'not-an-id', _id]) == [ObjectId(_id)]
+
+    def test_target_ids_ignores_creates(self):
+        assert target_ids(self.operations) == {self.operations[1].id, self.existing_id}
+
+    async def test_unordered_runs_everything_that_passed_checks(self):
+        results = await self.writer.execute(self.collection, self.operations, False, self.rejections(), self.document)
+
+        assert [result.status for result in results] == [201, 404, 200]
+        assert results[1].detail == "Não encontrado."
+        requests = self.collection.bulk_write.call_args.args[0]
+        assert [type(request) for request in requests] == [InsertOne, DeleteOne]
+        assert results[0].id == str(requests[0]._doc['_id'])
+        assert requests[0]._doc['version'] == 1
+        assert self.collection.bulk_write.call_args.kwargs == {'ordered': False}
+
+    async def test_ordered_stops_at_first_rejection(self):
+        results = await self.writer.execute(self.collection, self.operations, True, self.rejections(), self.document)
+
+        assert [result.status for result in results] == [201, 404, SKIPPED_STATUS]
+        assert len(self.collection.bulk_write.call_args.args[0]) == 1
+
+    async def test_write_errors_are_reported_per_item(self):
+        self.operations[1] = UserBulkRequest.model_validate({'operations': [
+            {'op': 'update', 'id': self.existing_id, 'data': {'email': 'user1@email.com'}}]}).operations[0]
+        self.collection.bulk_write.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}]})
+
+        results = await self.writer.execute(self.collection, self.operations, True, {}, self.document)
+
+        assert [result.status for result in results] == [201, 400, SKIPPED_STATUS]
+        assert results[1].detail == "Duplicado."
+        update = self.collection.bulk_write.call_args.args[0][1]
+        assert isinstance(update, UpdateOne)
+        assert update._doc['$inc'] == {'version': 1}
+
+    async def test_unknown_write_errors(self):
+        self.collection.bulk_write.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 0, 'code': 2, 'errmsg': 'bad value'}]})
+
+        results = await self.writer.execute(self.collection, self.operations, False, self.rejections(), self.document)
+
+        assert [result.status for result in results] == [500, 404, 200]
+
+    def test_bulk_request_rejects_unknown_operations(self):
+        with pytest.raises(ValueError):
+            UserBulkRequest.model_validate({'operations': [{'op': 'upsert', 'id': '1', 'data': {}}]})
+
+    def test_update_data_model(self):
+        assert isinstance(self.operations[1].data, UserUpdate)
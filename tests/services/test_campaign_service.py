@@ -2,7 +2,6 @@ import pytest
 
 from pydantic import ValidationError
 from pymongo.results import InsertOneResult
-from config import Config
 from bson import ObjectId
 from unittest.mock import MagicMock
 
@@ -10,6 +9,7 @@ from app.models.character_sheet_model import CharacterSheet
 from app.models.user_model import User
 from app.services.campaign_service import CampaignService
 from app.models.campaign_model import Campaign, CampaignCreate, CampaignUpdate
+from tests.documents import joined_campaign_document
 
 
 class TestCampaignService:
@@ -107,22 +107,19 @@ class TestCampaignService:
 
         return _id, campaign_update, updated_campaign, expected_response
 
-    def test_get_db_initializes_connection(self, mocker):
-        service = CampaignService()
-
-        mock_mongo_client = mocker.patch('app.services.campaign_service.MongoClient')
-
-        mock_db = mock_mongo_client.return_value['RoleForge']
-        mock_collection = mock_db['Campaigns']
+    def test_get_db_initializes_connection(self):
+        mock_registry = MagicMock()
+        service = CampaignService(registry=mock_registry)
 
         result = service.get_db()
 
-        mock_mongo_client.assert_called_once_with(Config.MONGO_URI)
-        assert result == mock_collection
-        assert service.campaigns_collection == mock_collection
+        mock_registry.get_collection.assert_called_once_with('Campaigns')
+        assert result == mock_registry.get_collection.return_value
+        assert service.campaigns_collection == result
 
-    def test_get_db_reuses_existing_connection(self, mocker):
-        service = CampaignService()
+    def test_get_db_reuses_existing_connection(self):
+        mock_registry = MagicMock()
+        service = CampaignService(registry=mock_registry)
 
         mock_collection = MagicMock()
         service.campaigns_collection = mock_collection
@@ -130,7 +127,7 @@ class TestCampaignService:
         result = service.get_db()
 
         assert result == mock_collection
-        mocker.patch('app.services.campaign_service.MongoClient').assert_not_called()
+        mock_registry.get_collection.assert_not_called()
 
     def test_get_all_campaigns_with_data(self, campaign_data):
         raw_campaign, campaign, expected_response = campaign_data
@@ -167,6 +164,24 @@ class TestCampaignService:
         assert result == expected_campaigns
         self.mock_collection.find.assert_called_once()
 
+    def test_get_campaigns_by_master_with_lookup(self, campaign_data):
+        raw_campaign, campaign, _ = campaign_data
+
+        self.service.use_lookup = True
+        self.mock_collection.aggregate.return_value = [{
+            **raw_campaign,
+            'master_user': [{'_id': raw_campaign['master'], 'name': 'Master 1', 'email': 'master1@email.com'}],
+            'player_users': [{'_id': raw_campaign['players'][0], 'name': 'Player', 'email': 'player@email.com'}]
+        }]
+
+        result = self.service.get_campaigns_by_master(campaign.master.id)
+
+        assert result == [campaign]
+        pipeline = self.mock_collection.aggregate.call_args.args[0]
+        assert pipeline[0] == {'$match': {'master': ObjectId(campaign.master.id)}}
+        self.mock_collection.find.assert_not_called()
+        self.mock_user_service.get_users_by_ids.assert_not_called()
+
     def test_get_campaigns_by_master_no_data(self):
         self.mock_collection.find.return_value = []
 
@@ -199,24 +214,25 @@ class TestCampaignService:
     def test_get_campaign_by_id_with_data(self, campaign_data):
         raw_campaign, campaign, expected_response = campaign_data
 
-        self.mock_collection.find_one.return_value = raw_campaign
-        self.mock_user_service.get_user_by_id.return_value = campaign.master
-        self.mock_user_service.get_users_by_ids.return_value = campaign.players
+        self.mock_collection.aggregate.return_value = [joined_campaign_document(campaign)]
 
         expected_campaign = campaign
 
         result = self.service.get_campaign_by_id(campaign.id)
 
         assert result == expected_campaign
-        self.mock_collection.find_one.assert_called_once()
+        self.mock_collection.aggregate.assert_called_once()
+        assert self.mock_collection.aggregate.call_args.args[0][0] == {'$match': {'_id': ObjectId(campaign.id)}}
+        self.mock_user_service.get_user_by_id.assert_not_called()
+        self.mock_user_service.get_users_by_ids.assert_not_called()
 
     def test_get_campaign_by_id_no_data(self):
-        self.mock_collection.find_one.return_value = None
+        self.mock_collection.aggregate.return_value = []
 
         result = self.service.get_campaign_by_id(str(ObjectId()))
 
         assert result is None
-        self.mock_collection.find_one.assert_called_once()
+        self.mock_collection.aggregate.assert_called_once()
 
     def test_get_campaigns_by_ids_with_data(self, campaign_data):
         raw_campaign, campaign, expected_response = campaign_data
@@ -7,11 +7,11 @@ from app.models.campaign_model import Campaign
 from app.models.character_model import Character, CharacterCreate, CharacterUpdate
 from app.models.character_sheet_model import CharacterSheet
 from app.models.user_model import User
-from config import Config
 from bson import ObjectId
 from unittest.mock import MagicMock
 
 from app.services.character_service import CharacterService
+from tests.documents import joined_character_document
 
 
 class TestCharacterService:
@@ -127,22 +127,19 @@ class TestCharacterService:
 
         return _id, character_update, updated_character, expected_response
 
-    def test_get_db_initializes_connection(self, mocker):
-        service = CharacterService()
-
-        mock_mongo_client = mocker.patch('app.services.character_service.MongoClient')
-
-        mock_db = mock_mongo_client.return_value['RoleForge']
-        mock_collection = mock_db['Characters']
+    def test_get_db_initializes_connection(self):
+        mock_registry = MagicMock()
+        service = CharacterService(registry=mock_registry)
 
         result = service.get_db()
 
-        mock_mongo_client.assert_called_once_with(Config.MONGO_URI)
-        assert result == mock_collection
-        assert service.characters_collection == mock_collection
+        mock_registry.get_collection.assert_called_once_with('Characters')
+        assert result == mock_registry.get_collection.return_value
+        assert service.characters_collection == result
 
-    def test_get_db_reuses_existing_connection(self, mocker):
-        service = CharacterService()
+    def test_get_db_reuses_existing_connection(self):
+        mock_registry = MagicMock()
+        service = CharacterService(registry=mock_registry)
 
         mock_collection = MagicMock()
         service.characters_collection = mock_collection
@@ -150,7 +147,15 @@ class TestCharacterService:
         result = service.get_db()
 
         assert result == mock_collection
-        mocker.patch('app.services.character_service.MongoClient').assert_not_called()
+        mock_registry.get_collection.assert_not_called()
+
+    def test_nested_services_share_registry(self):
+        mock_registry = MagicMock()
+        service = CharacterService(registry=mock_registry)
+
+        assert service.user_service.registry is mock_registry
+        assert service.campaign_service.registry is mock_registry
+        assert service.campaign_service.user_service is service.user_service
 
     def test_get_all_characters_with_data(self, character_data):
         raw_character, character, expected_response = character_data
@@ -199,24 +204,24 @@ class TestCharacterService:
     def test_get_character_by_id_with_data(self, character_data):
         raw_character, character, expected_response = character_data
 
-        self.mock_collection.find_one.return_value = raw_character
-        self.mock_user_service.get_user_by_id.return_value = character.player
-        self.mock_campaign_service.get_campaign_by_id.return_value = character.campaign
+        self.mock_collection.aggregate.return_value = [joined_character_document(character)]
 
         expected_character = character
 
         result = self.service.get_character_by_id(character.id)
 
         assert result == expected_character
-        self.mock_collection.find_one.assert_called_once()
+        self.mock_collection.aggregate.assert_called_once()
+        self.mock_user_service.get_user_by_id.assert_not_called()
+        self.mock_campaign_service.get_campaign_by_id.assert_not_called()
 
     def test_get_character_by_id_no_data(self):
-        self.mock_collection.find_one.return_value = None
+        self.mock_collection.aggregate.return_value = []
 
         result = self.service.get_character_by_id(str(ObjectId()))
 
         assert result is None
-        self.mock_collection.find_one.assert_called_once()
+        self.mock_collection.aggregate.assert_called_once()
 
     def test_create_character(self, create_character_data):
         _id, character_create, expected_response = create_character_data
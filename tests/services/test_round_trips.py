@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+
+from app.controllers.character_controller import CharacterController
+
+from app.models.campaign_model import Campaign
+from app.models.character_model import Character
+from app.models.character_sheet_model import CharacterSheet
+from app.models.user_model import User
+from app.services.async_campaign_service import AsyncCampaignService
+from app.services.async_character_service import AsyncCharacterService
+from tests.documents import joined_campaign_document, joined_character_document
+
+pytestmark = pytest.mark.anyio
+
+RTT = 0.05
+
+
+class RoundTripCollection:
+    def __init__(self, name: str, round_trips: list, documents: list):
+        self.name = name
+        self.round_trips = round_trips
+        self.documents = documents
+
+    async def round_trip(self, operation: str):
+        self.round_trips.append((self.name, operation))
+        await asyncio.sleep(RTT)
+
+    async def find_one(self, *args, **kwargs):
+        await self.round_trip('find_one')
+        return self.documents[0] if self.documents else None
+
+    def find(self, *args, **kwargs):
+        return self.cursor('find')
+
+    def aggregate(self, *args, **kwargs):
+        return self.cursor('aggregate')
+
+    def cursor(self, operation: str):
+        cursor = MagicMock()
+
+        async def to_list(length=None):
+            await self.round_trip(operation)
+            return self.documents
+
+        cursor.to_list = to_list
+        return cursor
+
+
+class TestRoundTrips:
+    @pytest.fixture
+    def character(self):
+        master = User(id=str(ObjectId()), name="Master 1", email="master1@email.com")
+        player = User(id=str(ObjectId()), name="Player", email="player@email.com")
+        campaign = Campaign(
+            id=str(ObjectId()),
+            name='Campaign 1',
+            description='First campaign',
+            master=master,
+            players=[player],
+            character_sheet=CharacterSheet(fields=["Field 1"], attributes=["Attribute 1"])
+        )
+        return Character(id=str(ObjectId()), player=player, campaign=campaign,
+                         player_character_sheet={"fields": {"Field 1": "Value 1"}})
+
+    def registry(self, round_trips: list, documents: dict):
+        registry = MagicMock()
+        registry.get_async_collection.side_effect = \
+            lambda name: RoundTripCollection(name, round_trips, documents.get(name, []))
+        return registry
+
+    async def test_get_character_by_id_is_one_round_trip(self, character):
+        round_trips = []
+        service = AsyncCharacterService(self.registry(round_trips, {
+            'Characters': [joined_character_document(character)]
+        }))
+
+        start = time.perf_counter()
+        result = await service.get_character_by_id(character.id)
+        elapsed = time.perf_counter() - start
+
+        assert result == character
+        assert round_trips == [('Characters', 'aggregate')]
+        assert elapsed < 2 * RTT
+
+    async def test_get_campaign_by_id_is_one_round_trip(self, character):
+        round_trips = []
+        service = AsyncCampaignService(self.registry(round_trips, {
+            'Campaigns': [joined_campaign_document(character.campaign)]
+        }))
+
+        start = time.perf_counter()
+        result = await service.get_campaign_by_id(character.campaign.id)
+        elapsed = time.perf_counter() - start
+
+        assert result == character.campaign
+        assert round_trips == [('Campaigns', 'aggregate')]
+        assert elapsed < 2 * RTT
+
+    async def test_get_character_by_id_not_found_is_one_round_trip(self):
+        round_trips = []
+        service = AsyncCharacterService(self.registry(round_trips, {}))
+
+        result = await service.get_character_by_id(str(ObjectId()))
+
+        assert result is None
+        assert round_trips == [('Characters', 'aggregate')]
+
+    def test_get_character_route_is_one_round_trip_with_validators(self, character):
+        round_trips = []
+        app = FastAPI()
+        controller = CharacterController()
+        controller.character_service = AsyncCharacterService(self.registry(round_trips, {
+            'Characters': [joined_character_document(character)]
+        }))
+        app.include_router(controller.router, prefix="/characters")
+
+        response = TestClient(app).get(f"/characters/{character.id}")
+
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('"')
+        assert round_trips == [('Characters', 'aggregate')]
@@ -2,11 +2,11 @@ import pytest
 
 from pydantic import ValidationError
 from pymongo.results import InsertOneResult
-from config import Config
 from bson import ObjectId
 from unittest.mock import MagicMock
 
 from app.models.user_model import User, UserUpdate, UserCreate
+from app.indexes import EMAIL_COLLATION
 from app.services.user_service import UserService
 
 
@@ -61,22 +61,19 @@ class TestUserService:
 
         return _id, user_update, updated_user, expected_response
 
-    def test_get_db_initializes_connection(self, mocker):
-        service = UserService()
-
-        mock_mongo_client = mocker.patch('app.services.user_service.MongoClient')
-
-        mock_db = mock_mongo_client.return_value['RoleForge']
-        mock_collection = mock_db['Users']
+    def test_get_db_initializes_connection(self):
+        mock_registry = MagicMock()
+        service = UserService(registry=mock_registry)
 
         result = service.get_db()
 
-        mock_mongo_client.assert_called_once_with(Config.MONGO_URI)
-        assert result == mock_collection
-        assert service.users_collection == mock_collection
+        mock_registry.get_collection.assert_called_once_with('Users')
+        assert result == mock_registry.get_collection.return_value
+        assert service.users_collection == result
 
-    def test_get_db_reuses_existing_connection(self, mocker):
-        service = UserService()
+    def test_get_db_reuses_existing_connection(self):
+        mock_registry = MagicMock()
+        service = UserService(registry=mock_registry)
 
         mock_collection = MagicMock()
         service.users_collection = mock_collection
@@ -84,7 +81,7 @@ class TestUserService:
         result = service.get_db()
 
         assert result == mock_collection
-        mocker.patch('app.services.user_service.MongoClient').assert_not_called()
+        mock_registry.get_collection.assert_not_called()
 
     def test_get_all_users_with_data(self, user_data):
         user, raw_user = user_data
@@ -156,7 +153,7 @@ class TestUserService:
         result = self.service.get_user_by_email(user.email)
 
         assert result == expected_user
-        self.mock_collection.find_one.assert_called_once()
+        self.mock_collection.find_one.assert_called_once_with({'email': user.email}, collation=EMAIL_COLLATION)
 
     def test_get_user_by_email_no_data(self):
         self.mock_collection.find_one.return_value = None
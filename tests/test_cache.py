@@ -0,0 +1,74 @@
+from app.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_get_miss_and_hit(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+
+        assert cache.get('a') == (False, None)
+        cache.set('a', 1)
+
+        assert cache.get('a') == (True, 1)
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_caches_none_values(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', None)
+
+        assert cache.get('a') == (True, None)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') == (False, None)
+        assert cache.get('a') == (True, 1)
+        assert cache.get('c') == (True, 3)
+        assert cache.stats()['evictions'] == 1
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=2, ttl=5, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 4.9
+        assert cache.get('a') == (True, 1)
+
+        clock.now = 5
+        assert cache.get('a') == (False, None)
+        assert cache.stats()['expirations'] == 1
+        assert cache.stats()['size'] == 0
+
+    def test_get_many_splits_hits_and_misses(self):
+        cache = TTLCache(maxsize=10, ttl=10)
+        cache.set_many({'a': 1, 'b': 2})
+
+        found, missing = cache.get_many(['a', 'c', 'b', 'c'])
+
+        assert found == {'a': 1, 'b': 2}
+        assert missing == ['c']
+
+    def test_invalidate_and_clear(self):
+        cache = TTLCache(maxsize=10, ttl=10)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        assert cache.get('a') == (False, None)
+        assert cache.stats()['invalidations'] == 1
+
+        cache.clear()
+        assert cache.stats()['size'] == 0
+        assert cache.stats()['invalidations'] == 3
@@ -0,0 +1,161 @@
+import gzip
+import zlib
+
+import anyio
+import pytest
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, CompressionStats, negotiate, parse_accept_encoding
+
+LARGE = [{"name": f"Character {i}", "campaign": {"name": "Campaign 1", "description": "First campaign"}}
+         for i in range(200)]
+
+
+def decompressor(encoding: str):
+    if encoding == 'br':
+        import brotli
+        return brotli.Decompressor().process
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+
+
+class TestCompression:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.stats = CompressionStats()
+        self.app = FastAPI()
+        self.app.add_middleware(CompressionMiddleware, minimum_size=500, offload_size=4096, stats=self.stats)
+
+        @self.app.get('/large/{item_id}')
+        def large(item_id: str):
+            return LARGE
+
+        @self.app.get('/small')
+        def small(response: Response):
+            response.headers['ETag'] = '"small"'
+            return {"detail": "ok"}
+
+        @self.app.get('/tagged')
+        def tagged(response: Response):
+            response.headers['ETag'] = '"large"'
+            return LARGE
+
+        @self.app.get('/not-modified')
+        def not_modified():
+            return Response(status_code=304, headers={'ETag': '"abc"'})
+
+        @self.app.get('/stream')
+        def stream():
+            lines = (f'{{"line": {i}, "text": "repeated text repeated text"}}\n'.encode() for i in range(500))
+            return StreamingResponse(lines, media_type='application/x-ndjson')
+
+        self.client = TestClient(self.app)
+
+    def test_parse_accept_encoding(self):
+        assert parse_accept_encoding('gzip, br;q=0.5, zstd;q=0') == {'gzip': 1.0, 'br': 0.5, 'zstd': 0.0}
+
+    def test_negotiate_honours_weights_and_preference(self):
+        assert negotiate('gzip;q=0.5, br', ['zstd', 'br', 'gzip']) == 'br'
+        assert negotiate('gzip, br', ['zstd', 'br', 'gzip']) == 'br'
+        assert negotiate('*;q=0.1, gzip;q=0', ['zstd', 'gzip']) == 'zstd'
+        assert negotiate('identity', ['zstd', 'br', 'gzip']) is None
+        assert negotiate('', ['gzip']) is None
+
+    def test_compresses_large_body_and_records_stats(self):
+        response = self.client.get('/large/1', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert response.json() == LARGE
+
+        [entry] = self.stats.stats()
+        assert entry['route'] == '/large/{item_id}'
+        assert entry['encoding'] == 'gzip'
+        assert entry['bytes_out'] < entry['bytes_in']
+        assert entry['bytes_saved'] == entry['bytes_in'] - entry['bytes_out']
+
+    def test_small_body_is_not_compressed(self):
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'content-encoding' not in response.headers
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert self.stats.stats() == []
+
+    def test_without_accept_encoding_body_is_untouched(self):
+        response = self.client.get('/large/1', headers={'Accept-Encoding': 'identity'})
+
+        assert 'content-encoding' not in response.headers
+        assert response.json() == LARGE
+
+    def test_only_encoded_bodies_get_a_weak_etag(self):
+        small = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        large = self.client.get('/tagged', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'content-encoding' not in small.headers
+        assert small.headers['etag'] == '"small"'
+        assert large.headers['content-encoding'] == 'gzip'
+        assert large.headers['etag'] == 'W/"large"'
+
+    def test_not_modified_gets_weak_etag(self):
+        response = self.client.get('/not-modified', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 304
+        assert response.headers['etag'] == 'W/"abc"'
+
+    def test_streamed_body_is_compressed_incrementally(self):
+        with self.client.stream('GET', '/stream', headers={'Accept-Encoding': 'gzip'}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == 'gzip'
+        assert 'content-length' not in response.headers
+        assert gzip.decompress(raw).count(b'\n') == 500
+        assert self.stats.stats()[0]['route'] == '/stream'
+
+    @pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+    def test_streamed_lines_reach_the_client_before_the_stream_ends(self, encoding):
+        if encoding not in CompressionMiddleware(None).encodings:
+            pytest.skip(f"{encoding} is not installed")
+        messages = []
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'application/x-ndjson')]})
+            for i in range(50):
+                await send({'type': 'http.response.body', 'body': f'{{"line": {i}}}\n'.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def send(message):
+            messages.append(message)
+
+        middleware = CompressionMiddleware(app, minimum_size=500, stats=self.stats)
+        scope = {'type': 'http', 'path': '/stream', 'headers': [(b'accept-encoding', encoding.encode())]}
+        anyio.run(middleware, scope, None, send)
+
+        bodies = [message for message in messages if message['type'] == 'http.response.body']
+        assert len(bodies) == 51
+        # Every chunk is a complete block: what arrived so far already decodes to the first line.
+        first = bodies[0]['body']
+        assert decompressor(encoding)(first) == b'{"line": 0}\n'
+
+    def test_brotli(self):
+        brotli = pytest.importorskip('brotli')
+
+        with self.client.stream('GET', '/large/1', headers={'Accept-Encoding': 'br'}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == 'br'
+        assert brotli.decompress(raw).startswith(b'[{"name":"Character 0"')
+
+    def test_zstd(self):
+        zstandard = pytest.importorskip('zstandard')
+
+        with self.client.stream('GET', '/large/1', headers={'Accept-Encoding': 'zstd'}) as response:
+            raw = b''.join(response.iter_raw())
+
+        assert response.headers['content-encoding'] == 'zstd'
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(raw).startswith(b'[{"name":"Character 0"')
@@ -0,0 +1,144 @@
+from datetime import datetime, timezone
+
+from unittest.mock import AsyncMock, MagicMock
+
+from bson import ObjectId
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.cache import TTLCache
+from app.conditional import ConditionalGet, entity_tag, version_stamps, versioned_update
+from app.controllers.campaign_controller import CampaignController
+from app.services.async_campaign_service import AsyncCampaignService
+
+
+def make_request(query: str = '', **headers) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/',
+        'query_string': query.encode(),
+        'headers': [(name.replace('_', '-').lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+class TestConditional:
+    def setup_method(self):
+        self.campaign_id = ObjectId()
+        self.master_id = ObjectId()
+        self.document = {
+            '_id': self.campaign_id, 'version': 2, 'updated_at': datetime(2024, 5, 1), 'master': self.master_id,
+            'players': [ObjectId()],
+            'master_user': [{'_id': self.master_id, 'version': 5, 'updated_at': datetime(2024, 6, 1)}],
+        }
+
+    def test_version_stamps_include_nested_documents(self):
+        stamps = version_stamps(self.document)
+
+        assert [(_id, version) for _id, version, _ in stamps] == [(str(self.campaign_id), 2), (str(self.master_id), 5)]
+        assert stamps[1][2] == datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    def test_entity_tag_changes_with_nested_version_and_variant(self):
+        etag = entity_tag(version_stamps(self.document))
+        self.document['master_user'][0]['version'] = 6
+
+        assert entity_tag(version_stamps(self.document)) != etag
+        assert entity_tag(version_stamps(self.document), 'fields=name') != entity_tag(version_stamps(self.document))
+
+    def test_versioned_update_bumps_version(self):
+        update = versioned_update({'name': 'Campaign'})
+
+        assert update['$set']['name'] == 'Campaign'
+        assert isinstance(update['$set']['updated_at'], datetime)
+        assert update['$inc'] == {'version': 1}
+
+    def test_evaluate_without_documents_does_nothing(self):
+        response = Response()
+
+        assert ConditionalGet(make_request()).evaluate([], response) is None
+        assert 'ETag' not in response.headers
+
+    def test_evaluate_matches_weak_and_listed_tags(self):
+        etag = entity_tag(version_stamps(self.document))
+
+        result = ConditionalGet(make_request(if_none_match=f'"other", W/{etag}')).evaluate([self.document], Response())
+
+        assert result.status_code == 304
+
+    def test_evaluate_if_modified_since(self):
+        fresh = ConditionalGet(make_request(if_modified_since='Sat, 01 Jun 2024 00:00:00 GMT'))
+        stale = ConditionalGet(make_request(if_modified_since='Fri, 31 May 2024 00:00:00 GMT'))
+        invalid = ConditionalGet(make_request(if_modified_since='yesterday'))
+
+        assert fresh.evaluate([self.document], Response()).status_code == 304
+        assert stale.evaluate([self.document], Response()) is None
+        assert invalid.evaluate([self.document], Response()) is None
+
+    def test_if_none_match_takes_precedence(self):
+        conditional = ConditionalGet(make_request(if_none_match='"other"',
+                                                  if_modified_since='Sat, 01 Jun 2024 00:00:00 GMT'))
+
+        assert conditional.evaluate([self.document], Response()) is None
+
+
+def test_validators_always_describe_the_body_served(mock_async_collection):
+    campaign_id, master_id = ObjectId(), ObjectId()
+    stored = {'name': 'Campaign v1', 'version': 1}
+    pipelines = []
+
+    def aggregate(pipeline):
+        pipelines.append('metadata' if '$ifNull' in str(pipeline) else 'data')
+        cursor = MagicMock()
+        if pipelines[-1] == 'metadata':
+            documents = [{'_id': campaign_id, 'version': stored['version'], 'updated_at': datetime(2024, 5, 1),
+                          'master': master_id, 'players': [], 'player_users': [],
+                          'master_user': [{'_id': master_id, 'version': 0, 'updated_at': master_id.generation_time}]}]
+        else:
+            documents = [{'_id': campaign_id, 'name': stored['name'], 'description': 'Campanha', 'master': master_id,
+                          'players': [], 'character_sheet': {'attributes': ['PV'], 'fields': ['Nome']},
+                          'version': stored['version'], 'updated_at': datetime(2024, 5, 1),
+                          'master_user': [{'_id': master_id, 'name': 'Mestre', 'email': 'mestre@test.com'}],
+                          'player_users': []}]
+        cursor.to_list = AsyncMock(return_value=documents)
+        return cursor
+
+    mock_async_collection.aggregate.side_effect = aggregate
+    registry = MagicMock()
+    registry.get_async_collection.return_value = mock_async_collection
+
+    # Two workers: each has its own identity cache, so a write through one never invalidates the other.
+    workers = []
+    for _ in range(2):
+        app = FastAPI()
+        controller = CampaignController()
+        controller.campaign_service = AsyncCampaignService(registry, cache=TTLCache(ttl=60))
+        app.include_router(controller.router, prefix="/campaigns")
+        workers.append(TestClient(app))
+    worker_a, worker_b = workers
+
+    # An unconditional read is one aggregate, and the next one is served with its validators from the cache.
+    first = worker_b.get(f"/campaigns/{campaign_id}")
+    assert worker_b.get(f"/campaigns/{campaign_id}").headers['etag'] == first.headers['etag']
+    assert pipelines == ['data']
+
+    stored.update(name='Campaign v2', version=2)
+    cached = worker_b.get(f"/campaigns/{campaign_id}")
+    assert (cached.json()['name'], cached.headers['etag']) == ('Campaign v1', first.headers['etag'])
+
+    second = worker_b.get(f"/campaigns/{campaign_id}", headers={'If-None-Match': first.headers['etag']})
+
+    assert second.status_code == 200
+    assert second.json()['name'] == 'Campaign v2'
+    assert second.headers['etag'] != first.headers['etag']
+    assert worker_a.get(f"/campaigns/{campaign_id}").headers['etag'] == second.headers['etag']
+    assert worker_b.get(f"/campaigns/{campaign_id}",
+                        headers={'If-None-Match': second.headers['etag']}).status_code == 304
+    assert pipelines == ['data', 'metadata', 'data', 'data', 'metadata']
+
+
+def test_version_stamps_default_like_the_version_pipelines():
+    _id = ObjectId()
+
+    assert version_stamps({'_id': _id, 'player_character_sheet': {'fields': [{'nested': 1}]}}) == [
+        (str(_id), 0, _id.generation_time)]
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from unittest.mock import MagicMock
+
+from app.database import MongoRegistry
+from app.services.campaign_service import CampaignService
+from app.services.character_service import CharacterService
+from app.services.user_service import UserService
+from config import Config
+
+
+class TestMongoRegistry:
+    @pytest.fixture(autouse=True)
+    def setup(self, mocker):
+        self.mock_mongo_client = mocker.patch('app.database.MongoClient')
+        self.mock_async_client = mocker.patch('app.database.AsyncIOMotorClient')
+        self.registry = MongoRegistry()
+
+    def test_get_client_creates_single_client(self):
+        first = self.registry.get_client()
+        second = self.registry.get_client()
+
+        assert first is second
+        self.mock_mongo_client.assert_called_once()
+        assert self.mock_mongo_client.call_args.args == (Config.MONGO_URI,)
+        assert self.registry.pool_counter in self.mock_mongo_client.call_args.kwargs['event_listeners']
+
+    def test_get_client_is_thread_safe(self):
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            self.registry.get_client()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.mock_mongo_client.assert_called_once()
+        assert self.registry.clients_created == 1
+
+    def test_get_collection_is_cached(self):
+        first = self.registry.get_collection('Users')
+        second = self.registry.get_collection('Users')
+
+        assert first is second
+        assert self.registry.stats()['collections'] == ['Users']
+
+    def test_services_share_one_client(self):
+        user_service = UserService(self.registry)
+        campaign_service = CampaignService(self.registry)
+        character_service = CharacterService(self.registry)
+
+        user_service.get_db()
+        campaign_service.get_db()
+        character_service.get_db()
+        character_service.campaign_service.get_db()
+        character_service.user_service.get_db()
+
+        self.mock_mongo_client.assert_called_once()
+        assert self.registry.stats()['clients'] == 1
+        assert self.registry.stats()['collections'] == ['Campaigns', 'Characters', 'Users']
+
+    def test_get_async_collection_uses_single_async_client(self):
+        users = self.registry.get_async_collection('Users')
+        self.registry.get_async_collection('Campaigns')
+
+        assert users is self.registry.get_async_collection('Users')
+        assert self.registry.stats()['collections'] == ['Campaigns', 'Users']
+        self.mock_async_client.assert_called_once()
+        self.mock_mongo_client.assert_not_called()
+        assert self.registry.stats()['clients'] == 1
+
+    def test_stats_counts_pools(self):
+        self.registry.pool_counter.pool_created(MagicMock())
+        self.registry.pool_counter.connection_created(MagicMock())
+        self.registry.pool_counter.connection_created(MagicMock())
+        self.registry.pool_counter.connection_closed(MagicMock())
+
+        stats = self.registry.stats()
+
+        assert stats['pools'] == 1
+        assert stats['connections'] == 1
+        assert stats['clients'] == 0
+
+    def test_add_listener_after_client_creation_fails(self):
+        self.registry.get_client()
+
+        with pytest.raises(RuntimeError):
+            self.registry.add_listener(MagicMock())
+
+    def test_close_releases_client(self):
+        client = self.registry.get_client()
+        self.registry.get_collection('Users')
+
+        self.registry.close()
+
+        client.close.assert_called_once()
+        assert self.registry.stats()['clients'] == 0
+        assert self.registry.stats()['collections'] == []
+
+    def test_add_listener_is_idempotent(self):
+        listener = MagicMock()
+
+        self.registry.add_listener(listener)
+        self.registry.add_listener(listener)
+        self.registry.get_client()
+
+        assert self.registry.event_listeners == [listener]
+        self.registry.add_listener(listener)
+
+    def test_clients_are_recreated_after_fork(self, mocker):
+        self.mock_async_client.side_effect = lambda *args, **kwargs: MagicMock()
+        parent_client = self.registry.get_async_client()
+        self.registry.get_async_collection('Users')
+
+        mocker.patch('app.database.os.getpid', return_value=self.registry.pid + 1)
+        child_client = self.registry.get_async_client()
+
+        assert child_client is not parent_client
+        assert self.mock_async_client.call_count == 2
+        assert self.registry.async_collections == {}
+        parent_client.close.assert_not_called()
@@ -0,0 +1,49 @@
+import pytest
+
+from fastapi import HTTPException
+
+from app.fieldsets import Fieldset, build, fieldset, partial_model, requested
+from app.models.campaign_model import Campaign
+from app.models.user_model import User
+
+
+class TestFieldsets:
+    def test_dependency_without_fields(self):
+        assert fieldset(Campaign)(None) is None
+
+    def test_dependency_parses_fields(self):
+        fields = fieldset(Campaign)('name, description')
+
+        assert fields.fields == {'id', 'name', 'description'}
+        assert 'master' not in fields
+
+    def test_dependency_rejects_unknown_fields(self):
+        with pytest.raises(HTTPException) as error:
+            fieldset(Campaign)('name,password')
+
+        assert error.value.status_code == 400
+        assert error.value.detail == "Campos inválidos: password."
+
+    def test_projection_omits_id(self):
+        fields = Fieldset(Campaign, {'name', 'master'})
+
+        assert fields.projection() == {'master': 1, 'name': 1}
+
+    def test_partial_model_is_cached(self):
+        assert partial_model(User, frozenset({'id', 'name'})) is partial_model(User, frozenset({'id', 'name'}))
+
+    def test_build_partial(self):
+        fields = Fieldset(User, {'name'})
+
+        user = build(User, fields, id='1', name='Player', email=None)
+
+        assert user.model_dump() == {'id': '1', 'name': 'Player'}
+
+    def test_build_full(self):
+        user = build(User, None, id='1', name='Player', email='player@email.com')
+
+        assert isinstance(user, User)
+
+    def test_requested(self):
+        assert requested(None, 'master')
+        assert not requested(Fieldset(Campaign, {'name'}), 'master')
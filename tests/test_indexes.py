@@ -0,0 +1,83 @@
+import pytest
+
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+from unittest.mock import AsyncMock, MagicMock
+
+from app.indexes import EMAIL_COLLATION, INDEXES, ensure_indexes, ensure_indexes_async, index_report
+
+
+class TestIndexes:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.collections = {name: MagicMock() for name in INDEXES}
+        self.registry = MagicMock()
+        self.registry.get_collection.side_effect = lambda name: self.collections[name]
+        self.registry.get_async_collection.side_effect = lambda name: self.collections[name]
+
+    def test_email_index_is_unique_and_case_insensitive(self):
+        email_index = INDEXES['Users'][0].document
+
+        assert email_index['key'] == {'email': 1}
+        assert email_index['unique'] is True
+        assert email_index['collation'] == EMAIL_COLLATION.document
+
+    def test_service_filters_are_indexed(self):
+        leading_keys = {name: {list(index.document['key'])[0] for index in indexes}
+                        for name, indexes in INDEXES.items()}
+
+        assert leading_keys == {'Users': {'email'}, 'Campaigns': {'master', 'players'},
+                                'Characters': {'player', 'campaign'}}
+
+    def test_ensure_indexes(self):
+        for name, collection in self.collections.items():
+            collection.create_indexes.return_value = [index.document['name'] for index in INDEXES[name]]
+
+        result = ensure_indexes(self.registry)
+
+        assert result['Campaigns'] == ['master_id', 'players_id']
+        for name, collection in self.collections.items():
+            collection.create_indexes.assert_called_once_with(INDEXES[name])
+
+    @pytest.mark.anyio
+    async def test_ensure_indexes_async_survives_failures(self):
+        for collection in self.collections.values():
+            collection.create_indexes = AsyncMock(return_value=[])
+        self.collections['Users'].create_indexes.side_effect = OperationFailure("Index build failed")
+
+        result = await ensure_indexes_async(self.registry)
+
+        assert set(result) == {'Campaigns', 'Characters'}
+
+    @pytest.mark.anyio
+    async def test_ensure_indexes_async_stops_when_unreachable(self):
+        for collection in self.collections.values():
+            collection.create_indexes = AsyncMock(side_effect=ServerSelectionTimeoutError("no servers"))
+
+        result = await ensure_indexes_async(self.registry)
+
+        assert result == {}
+        assert sum(collection.create_indexes.await_count for collection in self.collections.values()) == 1
+
+    def test_index_report(self):
+        for name, collection in self.collections.items():
+            collection.list_indexes.return_value = [{'name': '_id_'}]
+            collection.aggregate.return_value = [{'name': '_id_', 'accesses': {'ops': 10}}]
+
+        self.collections['Campaigns'].list_indexes.return_value = [
+            {'name': '_id_'}, {'name': 'master_id'}, {'name': 'players_id'}, {'name': 'name_1'}
+        ]
+        self.collections['Campaigns'].aggregate.return_value = [
+            {'name': 'master_id', 'accesses': {'ops': 42}},
+            {'name': 'players_id', 'accesses': {'ops': 0}},
+            {'name': 'name_1', 'accesses': {'ops': 0}},
+        ]
+
+        report = index_report(self.registry)
+
+        assert report['Campaigns'] == {
+            'missing': [],
+            'undeclared': ['name_1'],
+            'unused': ['name_1', 'players_id'],
+            'accesses': {'master_id': 42, 'name_1': 0, 'players_id': 0},
+        }
+        assert report['Users']['missing'] == ['email_unique_ci']
@@ -0,0 +1,218 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.change_stream import follow_changes, sheet_changes, stream_events
+from app.live import RESYNC, LiveHub, change, coalesce, deletion
+
+pytestmark = pytest.mark.anyio
+
+
+def test_coalesce_merges_field_changes_in_order():
+    older = change('character', 'a', 1, {'attributes.PV': 10, 'fields.Condição': 'Caído'}, ['fields.Nota'])
+    newer = change('character', 'a', 2, {'attributes.PV': 8, 'fields.Nota': 'x'}, ['fields.Condição'])
+
+    merged = coalesce(older, newer)
+
+    assert merged['version'] == 2
+    assert merged['changes'] == {'attributes.PV': 8, 'fields.Nota': 'x'}
+    assert merged['removed'] == ['fields.Condição']
+
+
+def test_coalesce_parent_set_replaces_child_changes():
+    merged = coalesce(change('character', 'a', 1, {'attributes.PV': 10}),
+                      change('character', 'a', 2, {'attributes': {'PV': 3}}))
+
+    assert merged['changes'] == {'attributes': {'PV': 3}}
+
+
+def test_coalesce_falls_back_to_refetch():
+    # Removing a child of a value set earlier cannot be expressed as "removed, then changes".
+    assert coalesce(change('character', 'a', 1, {'attributes': {'PV': 3}}),
+                    change('character', 'a', 2, {}, ['attributes.PV']))['changes'] is None
+    assert coalesce(change('character', 'a', 1, {'attributes.PV': 3}),
+                    change('character', 'a', 2))['changes'] is None
+    assert coalesce(change('character', 'a', 1, {'attributes.PV': 3}),
+                    deletion('character', 'a')) == deletion('character', 'a')
+
+
+async def test_subscription_coalesces_per_document():
+    hub = LiveHub(max_pending=10, local=True)
+    with hub.subscribe('campaign') as subscription:
+        hub.publish('campaign', change('character', 'a', 1, {'attributes.PV': 10}))
+        hub.publish('campaign', change('character', 'a', 2, {'attributes.PV': 9}))
+        hub.publish('campaign', change('campaign', 'campaign', 4))
+        hub.publish('other', change('campaign', 'other', 1))
+
+        batch = await subscription.next_batch()
+
+    assert batch == [change('character', 'a', 2, {'attributes.PV': 9}), change('campaign', 'campaign', 4)]
+    assert hub.subscribers == {}
+
+
+async def test_slow_subscriber_gets_a_resync_instead_of_a_backlog():
+    hub = LiveHub(max_pending=3, local=True)
+    with hub.subscribe('campaign') as subscription:
+        for index in range(5):
+            hub.publish('campaign', change('character', str(index), 1))
+
+        batch = await subscription.next_batch()
+
+    # The fourth distinct document overflows the queue; later events are still delivered after the resync.
+    assert batch == [RESYNC, change('character', '4', 1)]
+
+
+async def test_next_batch_waits_for_events():
+    hub = LiveHub(local=True)
+    with hub.subscribe('campaign') as subscription:
+        waiting = asyncio.ensure_future(subscription.next_batch())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        hub.publish('campaign', deletion('campaign', 'campaign'))
+
+        assert await waiting == [deletion('campaign', 'campaign')]
+
+
+def test_notify_only_publishes_local_writes_with_subscribers():
+    stream_hub = LiveHub(local=False)
+    with stream_hub.subscribe('campaign') as subscription:
+        stream_hub.notify('campaign', change('campaign', 'campaign'))
+        assert subscription.pending == {}
+
+    hub = LiveHub(local=True)
+    assert not hub.listening('campaign')
+    with hub.subscribe('campaign') as subscription:
+        assert hub.listening('campaign')
+        hub.notify('campaign', change('campaign', 'campaign'))
+        assert list(subscription.pending) == [('campaign', 'campaign')]
+
+
+def test_sheet_changes_from_update_description():
+    description = {'updatedFields': {'player_character_sheet.attributes.PV': 7, 'version': 3},
+                   'removedFields': ['player_character_sheet.fields.Nota'], 'truncatedArrays': []}
+
+    assert sheet_changes(description) == ({'attributes.PV': 7}, ['fields.Nota'])
+    assert sheet_changes({'updatedFields': {'player': ObjectId()}, 'removedFields': []}) == (None, [])
+    assert sheet_changes(None) == (None, [])
+
+
+def test_stream_event_routes_by_campaign():
+    campaign_id, character_id = ObjectId(), ObjectId()
+    update = {'operationType': 'update', 'ns': {'coll': 'Characters'}, 'documentKey': {'_id': character_id},
+              'fullDocument': {'campaign': campaign_id, 'version': 5},
+              'updateDescription': {'updatedFields': {'player_character_sheet.attributes.PV': 4},
+                                    'removedFields': []}}
+    deleted = {'operationType': 'delete', 'ns': {'coll': 'Campaigns'}, 'documentKey': {'_id': campaign_id}}
+
+    assert stream_events(update) == [(str(campaign_id), change('character', character_id, 5, {'attributes.PV': 4}))]
+    assert stream_events(deleted) == [(str(campaign_id), deletion('campaign', campaign_id))]
+    assert stream_events({**update, 'operationType': 'update', 'fullDocument': None}) == []
+
+
+def test_stream_events_match_the_in_process_writes():
+    campaign_id, character_id = ObjectId(), ObjectId()
+    inserted = {'operationType': 'insert', 'ns': {'coll': 'Characters'}, 'documentKey': {'_id': character_id},
+                'fullDocument': {'campaign': campaign_id, 'version': 1}}
+    moved = {**inserted, 'operationType': 'update',
+             'updateDescription': {'updatedFields': {'campaign': campaign_id, 'version': 2}, 'removedFields': []}}
+    moved['fullDocument'] = {'campaign': campaign_id, 'version': 2}
+
+    assert stream_events(inserted) == [(str(campaign_id), change('character', character_id, 1))]
+    # The campaigns a deleted or moved character left are unknown without pre-images, so every campaign resyncs.
+    assert stream_events({**inserted, 'operationType': 'delete', 'fullDocument': None}) == [(None, RESYNC)]
+    assert stream_events(moved) == [(None, RESYNC), (str(campaign_id), change('character', character_id, 2))]
+
+
+def test_broadcast_resync_replaces_pending_events():
+    hub = LiveHub(local=True)
+    with hub.subscribe('a') as first, hub.subscribe('b') as second:
+        hub.publish('a', change('character', 'x', 1))
+        hub.broadcast(RESYNC)
+        hub.broadcast(RESYNC)
+        hub.publish('a', change('character', 'y', 1))
+
+    assert list(first.pending.values()) == [RESYNC, change('character', 'y', 1)]
+    assert list(second.pending.values()) == [RESYNC]
+
+
+async def test_follow_changes_publishes_and_resumes():
+    campaign_id = ObjectId()
+    event = {'operationType': 'replace', 'ns': {'coll': 'Campaigns'}, 'documentKey': {'_id': campaign_id},
+             'fullDocument': {'version': 2}}
+
+    class Changes:
+        resume_token = {'_data': 'token'}
+
+        def __init__(self):
+            self.sent = False
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self.sent:
+                raise PyMongoError("connection reset")
+            self.sent = True
+            return event
+
+    database = MagicMock()
+    database.watch.side_effect = [Changes(), Changes(), asyncio.CancelledError()]
+    registry = MagicMock()
+    registry.get_async_collection.return_value.database = database
+    hub = MagicMock()
+
+    with pytest.raises(asyncio.CancelledError):
+        await follow_changes(registry, hub, retry_delay=0)
+
+    hub.publish.assert_called_with(str(campaign_id), change('campaign', campaign_id, 2))
+    assert hub.publish.call_count == 2
+    assert database.watch.call_args_list[1].kwargs['resume_after'] == {'_data': 'token'}
+
+
+
+async def test_follow_changes_restarts_when_history_is_lost():
+    event = {'operationType': 'delete', 'ns': {'coll': 'Campaigns'}, 'documentKey': {'_id': ObjectId()}}
+
+    class Changes:
+        resume_token = {'_data': 'token'}
+
+        def __init__(self):
+            self.sent = False
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self.sent:
+                raise OperationFailure("resume point no longer in the oplog", code=286)
+            self.sent = True
+            return event
+
+    database = MagicMock()
+    database.watch.side_effect = [Changes(), asyncio.CancelledError()]
+    registry = MagicMock()
+    registry.get_async_collection.return_value.database = database
+    hub = MagicMock()
+
+    with pytest.raises(asyncio.CancelledError):
+        await follow_changes(registry, hub, retry_delay=0)
+
+    # The token from before the gap is dropped instead of being retried forever.
+    hub.broadcast.assert_called_once_with(RESYNC)
+    assert database.watch.call_args_list[1].kwargs['resume_after'] is None
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+
+from app.cache import TTLCache
+from app.loaders import Loader, RequestLoaders, RequestLoadersMiddleware, loader_scope, request_loader, request_loaders
+from app.services.async_campaign_service import AsyncCampaignService
+from app.services.async_character_service import AsyncCharacterService
+from app.services.async_user_service import AsyncUserService
+
+pytestmark = pytest.mark.anyio
+
+
+class Source:
+    def __init__(self):
+        self.batches = []
+
+    async def load(self, keys):
+        self.batches.append(keys)
+        return {key: {'id': key} for key in keys if key != 'missing'}
+
+
+class TestLoader:
+    async def test_batches_keys_requested_in_the_same_tick(self):
+        source = Source()
+        loader = Loader(source.load)
+
+        first, second, third = await asyncio.gather(loader.load('a'), loader.load_many(['b', 'a']), loader.load('c'))
+
+        assert [sorted(batch) for batch in source.batches] == [['a', 'b', 'c']]
+        assert first == {'id': 'a'}
+        assert second == [{'id': 'b'}, {'id': 'a'}]
+        assert third == {'id': 'c'}
+
+    async def test_identity_map_returns_shared_instances(self):
+        source = Source()
+        loader = Loader(source.load)
+
+        first = await loader.load('a')
+        second, missing = await loader.load_many(['a', 'missing'])
+
+        assert second is first
+        assert missing is None
+        assert source.batches == [['a'], ['missing']]
+
+    async def test_failed_keys_are_retried(self):
+        calls = []
+
+        async def load(keys):
+            calls.append(keys)
+            if len(calls) == 1:
+                raise ValueError("boom")
+            return {key: key for key in keys}
+
+        loader = Loader(load)
+
+        with pytest.raises(ValueError):
+            await loader.load('a')
+        assert await loader.load('a') == 'a'
+        assert calls == [['a'], ['a']]
+
+    async def test_forget_drops_the_loaded_instance(self):
+        source = Source()
+        loader = Loader(source.load)
+
+        await loader.load('a')
+        loader.forget('a')
+        await loader.load('a')
+
+        assert source.batches == [['a'], ['a']]
+
+    def test_request_loader_requires_a_request_scope(self):
+        assert request_loader('users', Source().load) is None
+
+    def test_middleware_scopes_loaders_to_each_request(self):
+        seen = []
+        app = FastAPI()
+        app.add_middleware(RequestLoadersMiddleware)
+
+        @app.get("/")
+        async def index():
+            loaders = request_loaders.get()
+            seen.append(loaders)
+            return {'same': loaders.get('users', Source().load) is loaders.get('users', Source().load)}
+
+        client = TestClient(app)
+        assert client.get("/").json() == {'same': True}
+        assert client.get("/").json() == {'same': True}
+        assert seen[0] is not seen[1]
+        assert request_loaders.get() is None
+
+
+class TestRequestScopedHydration:
+    @pytest.fixture(autouse=True)
+    def setup(self, mock_async_collection):
+        self.master_id, self.player_id = ObjectId(), ObjectId()
+        self.campaign_id = ObjectId()
+        users = [{'_id': user_id, 'name': name, 'email': f"{name}@email.com"}
+                 for user_id, name in ((self.master_id, 'master'), (self.player_id, 'player'))]
+
+        self.users_collection = MagicMock()
+        self.users_collection.find.side_effect = lambda query, *args: MagicMock(to_list=self.to_list(
+            [user for user in users if user['_id'] in query['_id']['$in']]))
+        self.campaigns_collection = MagicMock()
+        self.campaigns_collection.find.return_value.to_list = self.to_list([{
+            '_id': self.campaign_id, 'name': 'Campaign', 'description': 'Campaign',
+            'master': self.master_id, 'players': [self.player_id],
+            'character_sheet': {'fields': [], 'attributes': []}}])
+
+        registry = MagicMock()
+        registry.get_async_collection.side_effect = {
+            'Users': self.users_collection, 'Campaigns': self.campaigns_collection,
+            'Characters': mock_async_collection}.get
+
+        # Expiring caches so that only the loader can avoid the repeated fetch.
+        user_service = AsyncUserService(registry, cache=TTLCache(ttl=0), campaign_cache=TTLCache(ttl=0))
+        campaign_service = AsyncCampaignService(registry, user_service, use_lookup=False, cache=TTLCache(ttl=0))
+        self.service = AsyncCharacterService(registry, user_service, campaign_service, use_lookup=False)
+        self.characters = [{'_id': ObjectId(), 'player': self.player_id, 'campaign': self.campaign_id,
+                            'player_character_sheet': {}} for _ in range(3)]
+
+    @staticmethod
+    def to_list(documents):
+        async def to_list(length=None):
+            await asyncio.sleep(0)
+            return documents
+        return to_list
+
+    async def hydrate(self):
+        token = request_loaders.set(RequestLoaders())
+        try:
+            return await self.service.get_characters_with_players_and_campaigns(self.characters)
+        finally:
+            request_loaders.reset(token)
+
+    async def test_each_user_is_fetched_once_per_request(self):
+        characters = await self.hydrate()
+
+        queries = [call.args[0] for call in self.users_collection.find.call_args_list]
+        fetched = [user_id for query in queries for user_id in query['_id']['$in']]
+        assert sorted(fetched) == sorted([self.master_id, self.player_id])
+        self.campaigns_collection.find.assert_called_once()
+        assert characters[0].player is characters[0].campaign.players[0]
+        assert characters[0].campaign is characters[2].campaign
+
+    async def test_requests_do_not_share_loaded_instances(self):
+        first = await self.hydrate()
+        second = await self.hydrate()
+
+        assert first[0].player == second[0].player
+        assert first[0].player is not second[0].player
+        assert self.campaigns_collection.find.call_count == 2
+
+    async def test_streaming_keeps_the_identity_maps_bounded(self, mocker):
+        scopes = []
+
+        class RecordingLoaders(RequestLoaders):
+            def __init__(self):
+                super().__init__()
+                scopes.append(self)
+
+        mocker.patch('app.loaders.RequestLoaders', RecordingLoaders)
+        self.service.get_db().find.return_value.__aiter__.return_value = self.characters * 4
+
+        with loader_scope() as request_scope:
+            streamed = [character async for character in self.service.stream_characters(batch_size=3)]
+            assert request_scope.loaders == {}
+
+        # Every batch had a scope of its own, holding at most what that batch referenced.
+        assert len(streamed) == 12
+        assert len(scopes) == 1 + 4
+        for scope in scopes[1:]:
+            assert {name: len(loader.identity_map) for name, loader in scope.loaders.items()} == {
+                'users': 2, 'campaigns': 1}
@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+import main
+from app.readiness import readiness
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFERRED_MODULES = ('brotli', 'zstandard', 'prometheus_client')
+IMPORTED_SCRIPT = ("import json, sys; import main; "
+                   f"print(json.dumps([name for name in {DEFERRED_MODULES!r} if name in sys.modules]))")
+
+
+@pytest.fixture(autouse=True)
+def reset_readiness():
+    readiness.reset()
+    yield
+    readiness.reset()
+
+
+def test_lifespan_warms_up_before_reporting_ready():
+    async def warm_up(_):
+        readiness.database = True
+
+    with patch.object(main, 'warm_up', side_effect=warm_up) as warm_up_mock, \
+            patch.object(main, 'ensure_indexes_async', AsyncMock()) as ensure_indexes, \
+            patch.object(main.registry, 'close') as close:
+        with TestClient(main.app) as client:
+            response = client.get("/ready")
+
+    assert response.json() == {'status': 'ready'}
+    assert main.app.openapi_schema is not None
+    warm_up_mock.assert_called_once_with(main.registry)
+    ensure_indexes.assert_awaited_once_with(main.registry)
+    close.assert_called_once()
+
+
+def test_import_does_not_load_codecs_or_metrics():
+    # A fresh interpreter, since this one has already imported them for other tests.
+    result = subprocess.run([sys.executable, '-c', IMPORTED_SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                            check=True)
+
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
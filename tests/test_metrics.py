@@ -0,0 +1,190 @@
+import pytest
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from unittest.mock import MagicMock
+
+from app.cache import TTLCache
+from app.compression import CompressionStats
+from app.database import MongoRegistry
+from app.metrics import (UNMATCHED_ROUTE, CacheCollector, CommandMetrics, CompressionCollector, MetricsMiddleware,
+                         MongoRegistryCollector, RequestMetrics, SingleFlightCollector, metrics_endpoint)
+from app.singleflight import SingleFlight
+
+
+class TestMetricsMiddleware:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.registry = CollectorRegistry()
+        self.metrics = RequestMetrics(self.registry)
+        self.in_progress_seen = []
+
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, metrics=self.metrics)
+
+        @app.get("/campaigns/{campaign_id}")
+        async def get_campaign(campaign_id: str):
+            self.in_progress_seen.append(self.sample('http_requests_in_progress',
+                                                     method='GET', route='/campaigns/{campaign_id}'))
+            if campaign_id == 'missing':
+                raise HTTPException(status_code=404, detail="Campanha não encontrada.")
+            return {'id': campaign_id}
+
+        @app.get("/boom")
+        async def boom():
+            raise RuntimeError("boom")
+
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def sample(self, name, **labels):
+        return self.registry.get_sample_value(name, labels)
+
+    def test_labels_use_the_route_template(self):
+        self.client.get("/campaigns/1")
+        self.client.get("/campaigns/2")
+        self.client.get("/campaigns/missing")
+
+        assert self.sample('http_requests_total', method='GET', route='/campaigns/{campaign_id}', status='200') == 2
+        assert self.sample('http_requests_total', method='GET', route='/campaigns/{campaign_id}', status='404') == 1
+        assert self.sample('http_request_duration_seconds_count', method='GET', route='/campaigns/{campaign_id}') == 3
+
+    def test_in_progress_gauge_covers_the_request(self):
+        self.client.get("/campaigns/1")
+
+        assert self.in_progress_seen == [1]
+        assert self.sample('http_requests_in_progress', method='GET', route='/campaigns/{campaign_id}') == 0
+
+    def test_unmatched_paths_share_one_label(self):
+        self.client.get("/nothing/1")
+        self.client.get("/nothing/2")
+
+        assert self.sample('http_requests_total', method='GET', route=UNMATCHED_ROUTE, status='404') == 2
+
+    def test_method_mismatch_keeps_the_template(self):
+        self.client.post("/campaigns/1")
+
+        assert self.sample('http_requests_total', method='POST', route='/campaigns/{campaign_id}', status='405') == 1
+
+    def test_unhandled_errors_are_counted_as_500(self):
+        response = self.client.get("/boom")
+
+        assert response.status_code == 500
+        assert self.sample('http_requests_total', method='GET', route='/boom', status='500') == 1
+        assert self.sample('http_requests_in_progress', method='GET', route='/boom') == 0
+
+
+class TestCommandMetrics:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.registry = CollectorRegistry()
+        self.listener = CommandMetrics(self.registry)
+
+    def event(self, command_name, command=None, request_id=1, duration_micros=2500):
+        return MagicMock(command_name=command_name, command=command or {}, connection_id=('localhost', 27017),
+                         request_id=request_id, duration_micros=duration_micros)
+
+    def sample(self, name, **labels):
+        return self.registry.get_sample_value(name, labels)
+
+    def test_records_latency_per_collection_and_command(self):
+        self.listener.started(self.event('find', {'find': 'Users', 'filter': {}}))
+        self.listener.succeeded(self.event('find'))
+
+        assert self.sample('mongo_command_duration_seconds_count', collection='Users', command='find') == 1
+        assert self.sample('mongo_command_duration_seconds_sum', collection='Users', command='find') == 0.0025
+        assert self.listener.started_commands == {}
+
+    def test_get_more_uses_the_collection_field(self):
+        self.listener.started(self.event('getMore', {'getMore': 123456789, 'collection': 'Characters'}, request_id=2))
+        self.listener.succeeded(self.event('getMore', request_id=2))
+
+        assert self.sample('mongo_command_duration_seconds_count', collection='Characters', command='getMore') == 1
+
+    def test_failures_are_counted(self):
+        self.listener.started(self.event('insert', {'insert': 'Users'}, request_id=3))
+        self.listener.failed(self.event('insert', request_id=3))
+
+        assert self.sample('mongo_command_failures_total', collection='Users', command='insert') == 1
+        assert self.sample('mongo_command_duration_seconds_count', collection='Users', command='insert') == 1
+
+    def test_database_commands_have_an_empty_collection(self):
+        self.listener.started(self.event('aggregate', {'aggregate': 1}, request_id=4))
+        self.listener.succeeded(self.event('aggregate', request_id=4))
+
+        assert self.sample('mongo_command_duration_seconds_count', collection='', command='aggregate') == 1
+
+
+def test_compression_stats_are_exported_per_route_and_encoding():
+    stats = CompressionStats()
+    stats.record('/campaigns/', 'br', 10_000, 1_500, 0.002)
+    stats.record('/campaigns/', 'br', 6_000, 500, 0.001)
+    registry = CollectorRegistry()
+    registry.register(CompressionCollector(stats))
+
+    def sample(name):
+        return registry.get_sample_value(name, {'route': '/campaigns/', 'encoding': 'br'})
+
+    assert sample('http_compression_responses_total') == 2
+    assert sample('http_compression_saved_bytes_total') == 14_000
+    assert sample('http_compression_cpu_seconds_total') == pytest.approx(0.003)
+
+
+def test_cache_stats_are_exported_per_cache():
+    users, campaigns = TTLCache(1, 60), TTLCache(10, 60)
+    users.set('a', 1)
+    users.set('b', 2)
+    users.get('b')
+    users.get('a')
+    campaigns.get('x')
+    registry = CollectorRegistry()
+    registry.register(CacheCollector({'user': users, 'campaign': campaigns}))
+
+    def sample(name, cache):
+        return registry.get_sample_value(name, {'cache': cache})
+
+    assert sample('cache_entries', 'user') == 1
+    assert sample('cache_hits_total', 'user') == 1
+    assert sample('cache_misses_total', 'user') == 1
+    assert sample('cache_evictions_total', 'user') == 1
+    assert sample('cache_misses_total', 'campaign') == 1
+    assert sample('cache_entries', 'campaign') == 0
+
+
+def test_single_flight_counts_are_exported_per_method():
+    flights = SingleFlight()
+    flights.executions['get_campaign_by_id'] += 2
+    flights.coalesced['get_campaign_by_id'] += 5
+    registry = CollectorRegistry()
+    registry.register(SingleFlightCollector(flights))
+
+    assert registry.get_sample_value('single_flight_executions_total', {'method': 'get_campaign_by_id'}) == 2
+    assert registry.get_sample_value('single_flight_coalesced_total', {'method': 'get_campaign_by_id'}) == 5
+    assert registry.get_sample_value('single_flight_in_flight') == 0
+
+
+def test_client_and_pool_counts_are_exported():
+    mongo = MongoRegistry()
+    mongo.pool_counter.pool_created(MagicMock())
+    mongo.pool_counter.connection_created(MagicMock())
+    mongo.pool_counter.connection_created(MagicMock())
+    mongo.pool_counter.connection_closed(MagicMock())
+    registry = CollectorRegistry()
+    registry.register(MongoRegistryCollector(mongo))
+
+    assert registry.get_sample_value('mongo_clients') == 0
+    assert registry.get_sample_value('mongo_pools') == 1
+    assert registry.get_sample_value('mongo_connections') == 1
+
+
+def test_metrics_endpoint_exposes_text_format():
+    app = FastAPI()
+    app.add_route("/metrics", metrics_endpoint)
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert '# TYPE http_request_duration_seconds histogram' in response.text
+    assert '# TYPE mongo_command_duration_seconds histogram' in response.text
+    assert 'cache_hits_total{cache="campaign"}' in response.text
@@ -0,0 +1,49 @@
+import pytest
+
+from bson import ObjectId
+from unittest.mock import MagicMock
+
+from app.pagination import decode_cursor, encode_cursor, page_cursor, page_query
+
+
+class TestPagination:
+    def test_cursor_round_trip(self):
+        _id = str(ObjectId())
+
+        cursor = encode_cursor(_id)
+
+        assert _id not in cursor
+        assert decode_cursor(cursor) == _id
+
+    @pytest.mark.parametrize('cursor', ['not-a-cursor', 'abc', ''])
+    def test_decode_cursor_invalid(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+    def test_page_query_without_cursor(self):
+        query = {'master': ObjectId()}
+
+        assert page_query(query, None) is query
+
+    def test_page_query_with_cursor(self):
+        _id = ObjectId()
+        master = ObjectId()
+
+        result = page_query({'master': master}, str(_id))
+
+        assert result == {'master': master, '_id': {'$gt': _id}}
+
+    def test_page_cursor_without_paging_returns_cursor(self):
+        cursor = MagicMock()
+
+        assert page_cursor(cursor, None, None) is cursor
+        cursor.sort.assert_not_called()
+
+    def test_page_cursor_sorts_and_limits(self):
+        cursor = MagicMock()
+
+        result = page_cursor(cursor, 10, None)
+
+        cursor.sort.assert_called_once_with('_id', 1)
+        cursor.sort.return_value.limit.assert_called_once_with(10)
+        assert result == cursor.sort.return_value.limit.return_value
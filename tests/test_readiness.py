@@ -0,0 +1,60 @@
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+from unittest.mock import AsyncMock, MagicMock
+
+from app.readiness import prewarm, readiness, ready, warm_schemas, warm_up
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def reset_readiness():
+    readiness.reset()
+    yield
+    readiness.reset()
+
+
+@pytest.fixture
+def mock_registry():
+    registry = MagicMock()
+    registry.get_async_client.return_value.admin.command = AsyncMock(return_value={'ok': 1})
+    return registry
+
+
+async def test_prewarm_opens_the_requested_connections(mock_registry):
+    await prewarm(mock_registry, connections=3)
+
+    command = mock_registry.get_async_client.return_value.admin.command
+    assert command.await_count == 3
+    command.assert_awaited_with('ping')
+
+
+async def test_warm_up_retries_until_the_database_answers(mock_registry):
+    command = mock_registry.get_async_client.return_value.admin.command
+    command.side_effect = [ServerSelectionTimeoutError("unreachable"), {'ok': 1}]
+
+    await warm_up(mock_registry, connections=1, retry_delay=0)
+
+    assert command.await_count == 2
+    assert readiness.database is True
+    assert readiness.error is None
+
+
+def test_ready_turns_green_once_warm():
+    app = FastAPI()
+    app.add_api_route("/ready", ready)
+    client = TestClient(app)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {'status': 'starting', 'detail': "Banco de dados indisponível."}
+
+    readiness.database = True
+    assert client.get("/ready").status_code == 503
+
+    warm_schemas(app)
+    assert client.get("/ready").json() == {'status': 'ready'}
+    assert app.openapi_schema is not None
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import orjson
+import pytest
+
+from fastapi import Response
+
+from app.fieldsets import Fieldset
+from app.models.user_model import User
+from app.responses import ModelResponse, respond
+from config import Config
+
+
+class TestResponses:
+    @pytest.fixture
+    def users(self):
+        return [User(id='1', name='User 1', email='user1@email.com'),
+                User(id='2', name='User 2', email='user2@email.com')]
+
+    def test_model_response_serializes_models(self, users):
+        response = ModelResponse(users)
+
+        assert orjson.loads(response.body) == [user.model_dump() for user in users]
+        assert response.headers['content-type'] == 'application/json'
+
+    def test_model_response_serializes_partial_models_and_plain_values(self, users):
+        fields = Fieldset(User, {'name'})
+        partial = fields.partial_model(id='1', name='User 1')
+
+        response = ModelResponse({'user': partial, 'at': datetime(2024, 5, 1)})
+
+        assert orjson.loads(response.body) == {'user': {'id': '1', 'name': 'User 1'}, 'at': '2024-05-01T00:00:00'}
+
+    def test_model_response_rejects_unknown_types(self):
+        with pytest.raises(TypeError):
+            ModelResponse(object())
+
+    def test_respond_returns_content_when_disabled(self, mocker, users):
+        mocker.patch.object(Config, 'FAST_RESPONSES', False)
+
+        assert respond(users, Response()) is users
+
+    def test_respond_keeps_headers(self, mocker, users):
+        mocker.patch.object(Config, 'FAST_RESPONSES', True)
+        response = Response()
+        response.headers['X-Next-Cursor'] = 'abc'
+
+        result = respond(users, response)
+
+        assert isinstance(result, ModelResponse)
+        assert result.headers['X-Next-Cursor'] == 'abc'
+
+    def test_respond_always_serializes_fieldsets(self, mocker):
+        mocker.patch.object(Config, 'FAST_RESPONSES', False)
+        fields = Fieldset(User, {'name'})
+
+        result = respond(fields.partial_model(id='1', name='User 1'), Response(), fields)
+
+        assert orjson.loads(result.body) == {'id': '1', 'name': 'User 1'}
@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+from app.server import serve, server_options
+from config import Config
+
+
+def test_server_options_default_to_config():
+    options = server_options()
+
+    assert options == {
+        'host': Config.HOST, 'port': Config.PORT, 'workers': Config.WORKERS, 'loop': Config.EVENT_LOOP,
+        'http': Config.HTTP_PARSER, 'timeout_keep_alive': Config.KEEP_ALIVE_SECONDS, 'backlog': Config.BACKLOG,
+    }
+
+
+def test_missing_accelerators_fall_back():
+    with patch('app.server.importlib.util.find_spec', return_value=None):
+        options = server_options(loop='uvloop', http='httptools')
+
+    assert options['loop'] == 'asyncio'
+    assert options['http'] == 'h11'
+
+
+def test_serve_passes_an_import_string_so_workers_build_their_own_clients():
+    with patch('app.server.uvicorn.run') as run:
+        serve(workers=4, host='0.0.0.0', port=10000, keep_alive=75, backlog=4096, loop='asyncio', http='h11')
+
+    run.assert_called_once_with('main:app', host='0.0.0.0', port=10000, workers=4, loop='asyncio', http='h11',
+                                timeout_keep_alive=75, backlog=4096)
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+
+from app.fieldsets import build
+from app.models.user_model import User
+from app.server_timing import (RequestTimings, ServerTimingListener, ServerTimingMiddleware, TimedRoute,
+                               request_timings)
+
+
+def parse(header):
+    return {name: float(duration.removeprefix('dur=')) for name, duration in
+            (entry.split(';') for entry in header.split(', '))}
+
+
+def command_event(command_name, command=None):
+    return MagicMock(command_name=command_name, command=command or {}, connection_id=('localhost', 27017),
+                     request_id=1, database_name='RoleForge', duration_micros=4000)
+
+
+class TestServerTimingMiddleware:
+    def build_client(self, sample_rate=0):
+        listener = ServerTimingListener()
+        router = APIRouter(route_class=TimedRoute)
+
+        @router.get("/users/{user_id}", response_model=User)
+        async def get_user(user_id: str):
+            listener.started(command_event('find', {'find': 'Users'}))
+            listener.succeeded(command_event('find'))
+            return build(User, None, id=user_id, name="User 1", email="user1@email.com")
+
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware, sample_rate=sample_rate)
+        app.include_router(router)
+        return TestClient(app)
+
+    def test_header_is_opt_in_per_request(self):
+        client = self.build_client()
+
+        assert 'server-timing' not in client.get("/users/1").headers
+        assert 'server-timing' not in client.get("/users/1", headers={'X-Server-Timing': '0'}).headers
+
+    def test_breakdown_when_requested(self):
+        response = self.build_client().get("/users/1", headers={'X-Server-Timing': '1'})
+
+        timings = parse(response.headers['server-timing'])
+        assert response.json()['id'] == '1'
+        assert set(timings) == {'mongo-Users', 'hydrate', 'handler', 'serialize', 'total'}
+        assert timings['mongo-Users'] == 4.0
+        assert timings['handler'] >= timings['hydrate']
+        assert timings['total'] >= timings['handler'] + timings['serialize'] - 0.01
+
+    def test_sampled_requests_get_the_header(self):
+        response = self.build_client(sample_rate=1).get("/users/1")
+
+        assert 'total' in parse(response.headers['server-timing'])
+        assert request_timings.get() is None
+
+
+class TestServerTimingListener:
+    def test_ignores_commands_outside_timed_requests(self):
+        listener = ServerTimingListener()
+
+        listener.started(command_event('find', {'find': 'Users'}))
+        listener.succeeded(command_event('find'))
+
+        assert listener.started_commands == {}
+
+    def test_sums_durations_per_collection(self):
+        listener = ServerTimingListener()
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        try:
+            for command_name, command in (('find', {'find': 'Users'}),
+                                          ('getMore', {'getMore': 1, 'collection': 'Users'}),
+                                          ('aggregate', {'aggregate': 'Campaigns'})):
+                listener.started(command_event(command_name, command))
+                listener.failed(command_event(command_name))
+        finally:
+            request_timings.reset(token)
+
+        assert timings.header() == 'mongo-Users;dur=8.00, mongo-Campaigns;dur=4.00'
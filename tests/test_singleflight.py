@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.fieldsets import Fieldset
+from app.models.user_model import User
+from app.singleflight import SingleFlight, flights, freeze, single_flight
+from config import Config
+
+pytestmark = pytest.mark.anyio
+
+
+class Service:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    @single_flight
+    async def get(self, item_id, fields=None):
+        self.calls += 1
+        await self.release.wait()
+        return {'id': item_id, 'call': self.calls}
+
+    @single_flight
+    async def fail(self):
+        self.calls += 1
+        await self.release.wait()
+        raise ValueError("boom")
+
+
+class TestSingleFlight:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        flights.clear()
+        yield
+        flights.clear()
+
+    def test_freeze_makes_arguments_hashable(self):
+        assert freeze(['a', {'b': [1, 2]}]) == ('a', (('b', (1, 2)),))
+        assert hash(freeze({'ids': ['1', '2']}))
+
+    def test_fieldsets_with_same_fields_are_equal(self):
+        assert Fieldset(User, {'name'}) == Fieldset(User, {'name'})
+        assert hash(Fieldset(User, {'name'})) == hash(Fieldset(User, {'name'}))
+        assert Fieldset(User, {'name'}) != Fieldset(User, {'email'})
+
+    async def test_concurrent_identical_calls_share_one_execution(self):
+        service = Service()
+
+        calls = [asyncio.ensure_future(service.get('1', fields=Fieldset(User, {'name'}))) for _ in range(5)]
+        await asyncio.sleep(0)
+        service.release.set()
+        results = await asyncio.gather(*calls)
+
+        assert service.calls == 1
+        assert all(result is results[0] for result in results)
+        stats = flights.stats()
+        assert stats['executions'] == 1
+        assert stats['coalesced'] == 4
+        assert stats['in_flight'] == 0
+        assert stats['methods']['Service.get'] == {'executions': 1, 'coalesced': 4}
+
+    async def test_different_arguments_are_not_shared(self):
+        service = Service()
+
+        calls = [asyncio.ensure_future(service.get(item_id)) for item_id in ('1', '2')]
+        await asyncio.sleep(0)
+        service.release.set()
+        await asyncio.gather(*calls)
+
+        assert service.calls == 2
+        assert flights.stats()['coalesced'] == 0
+
+    async def test_sequential_calls_run_again(self):
+        service = Service()
+        service.release.set()
+
+        await service.get('1')
+        await service.get('1')
+
+        assert service.calls == 2
+
+    async def test_errors_reach_every_caller(self):
+        service = Service()
+
+        calls = [asyncio.ensure_future(service.fail()) for _ in range(3)]
+        await asyncio.sleep(0)
+        service.release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        assert service.calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        service = Service()
+
+        first = asyncio.ensure_future(service.get('1'))
+        second = asyncio.ensure_future(service.get('1'))
+        await asyncio.sleep(0)
+        first.cancel()
+        service.release.set()
+
+        assert (await second)['id'] == '1'
+        assert service.calls == 1
+
+    async def test_disabled(self, mocker):
+        mocker.patch.object(Config, 'SINGLE_FLIGHT', False)
+        service = Service()
+
+        calls = [asyncio.ensure_future(service.get('1')) for _ in range(2)]
+        await asyncio.sleep(0)
+        service.release.set()
+        await asyncio.gather(*calls)
+
+        assert service.calls == 2
+        assert flights.stats()['executions'] == 0
+
+    async def test_separate_instances(self):
+        flight = SingleFlight()
+
+        async def value():
+            return 1
+
+        assert await flight.do('key', 'value', value) == 1
+        assert flight.stats()['methods'] == {'value': {'executions': 1, 'coalesced': 0}}
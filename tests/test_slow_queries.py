@@ -0,0 +1,139 @@
+import logging
+
+import pytest
+
+from bson import ObjectId
+from unittest.mock import MagicMock
+
+from app.database import MongoRegistry
+from app.slow_queries import SlowQueryListener, command_shape, documents_returned, plan_summary, query_shape
+from app.tracing import calling_method, traced
+
+pytestmark = pytest.mark.anyio
+
+
+class InlineExecutor:
+    def submit(self, function, *args):
+        function(*args)
+
+
+@traced
+class Service:
+    def __init__(self, listener):
+        self.listener = listener
+
+    async def get_campaigns_by_player(self, event):
+        self.listener.started(event)
+        return calling_method.get()
+
+
+def test_query_shape_strips_values():
+    query = {'players': ObjectId(), '_id': {'$gt': ObjectId()}, '$or': [{'name': 'a'}, {'master': {'$in': [1, 2]}}]}
+
+    assert query_shape(query) == {'players': '?', '_id': {'$gt': '?'},
+                                  '$or': [{'name': '?'}, {'master': {'$in': ['?']}}]}
+
+
+def test_command_shape_per_command():
+    assert command_shape('find', {'find': 'Users', 'filter': {'email': 'a@b.com'}}) == {'email': '?'}
+    assert command_shape('aggregate', {'aggregate': 'Campaigns', 'pipeline': [
+        {'$match': {'_id': ObjectId()}}, {'$lookup': {'from': 'Users'}}, {'$limit': 10}]}) == [
+        {'$match': {'_id': '?'}}, '$lookup', '$limit']
+    assert command_shape('update', {'update': 'Users', 'updates': [
+        {'q': {'_id': ObjectId()}}, {'q': {'_id': ObjectId()}}]}) == [{'_id': '?'}]
+    assert command_shape('insert', {'insert': 'Users'}) is None
+
+
+def test_documents_returned():
+    assert documents_returned('find', {'cursor': {'firstBatch': [{}, {}]}}) == 2
+    assert documents_returned('getMore', {'cursor': {'nextBatch': [{}]}}) == 1
+    assert documents_returned('findAndModify', {'value': None}) == 0
+    assert documents_returned('delete', {'n': 3}) == 3
+    assert documents_returned('ping', {'ok': 1}) is None
+
+
+def test_plan_summary_reports_index_use():
+    ixscan = {'queryPlanner': {'winningPlan': {'stage': 'FETCH', 'inputStage': {
+        'stage': 'IXSCAN', 'indexName': 'players_id'}}, 'rejectedPlans': [{'stage': 'COLLSCAN'}]}}
+    collscan = {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}
+
+    assert plan_summary(ixscan) == {'index_used': True, 'stages': ['FETCH', 'IXSCAN'], 'indexes': ['players_id']}
+    assert plan_summary(collscan) == {'index_used': False, 'stages': ['COLLSCAN'], 'indexes': []}
+
+
+async def test_traced_sets_the_calling_method_for_the_call_only():
+    listener = SlowQueryListener(threshold_ms=0, explain_rate=0)
+
+    assert await Service(listener).get_campaigns_by_player(MagicMock()) == 'Service.get_campaigns_by_player'
+    assert calling_method.get() == ''
+
+
+class TestSlowQueryListener:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.registry = MagicMock()
+        self.listener = SlowQueryListener(threshold_ms=50, explain_rate=0, registry=self.registry,
+                                          executor=InlineExecutor())
+        self.command = {'find': 'Campaigns', 'filter': {'players': ObjectId()}, '$db': 'RoleForge', 'lsid': {}}
+
+    def event(self, duration_ms, **attributes):
+        return MagicMock(command_name='find', command=self.command, connection_id=('localhost', 27017),
+                         request_id=1, database_name='RoleForge', duration_micros=duration_ms * 1000,
+                         reply={'cursor': {'firstBatch': [{}, {}, {}]}}, **attributes)
+
+    async def test_logs_slow_commands_with_shape_and_caller(self, caplog):
+        await Service(self.listener).get_campaigns_by_player(self.event(120))
+
+        with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+            self.listener.succeeded(self.event(120))
+
+        assert caplog.messages == ["Slow find on Campaigns took 120.0 ms, returned 3 documents, called from "
+                                   "Service.get_campaigns_by_player: {'players': '?'}"]
+        assert self.listener.started_commands == {}
+        self.registry.get_async_client.assert_not_called()
+
+    async def test_fast_commands_are_not_logged(self, caplog):
+        self.listener.started(self.event(10))
+
+        with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+            self.listener.succeeded(self.event(10))
+
+        assert caplog.messages == []
+        assert self.listener.started_commands == {}
+
+    async def test_disabled_listener_keeps_no_commands(self, caplog):
+        self.listener.threshold_ms = -1
+        self.listener.started(self.event(120))
+
+        assert self.listener.started_commands == {}
+        with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+            self.listener.succeeded(self.event(120))
+        assert caplog.messages == []
+
+    async def test_sampled_explain_records_index_use(self, caplog):
+        self.listener.explain_rate = 1
+        database = self.registry.get_async_client.return_value.delegate.__getitem__.return_value
+        database.command.return_value = {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}}
+        self.listener.started(self.event(120))
+
+        with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+            self.listener.succeeded(self.event(120))
+
+        database.command.assert_called_once_with({
+            'explain': {'find': 'Campaigns', 'filter': self.command['filter']}, 'verbosity': 'queryPlanner'})
+        assert caplog.messages[-1] == ("Plan for slow find on Campaigns from unknown: index used False, "
+                                       "stages ['COLLSCAN'], indexes []")
+        self.registry.get_client.assert_not_called()
+
+
+def test_explain_reuses_the_async_client(mocker):
+    mocker.patch('app.database.MongoClient')
+    async_client = mocker.patch('app.database.AsyncIOMotorClient').return_value
+    async_client.delegate.__getitem__.return_value.command.return_value = {'queryPlanner': {}}
+    registry = MongoRegistry('mongodb://localhost')
+    registry.get_async_client()
+
+    SlowQueryListener(registry=registry).explain('RoleForge', 'find', {'find': 'Users', 'filter': {}}, '')
+
+    async_client.delegate.__getitem__.assert_called_once_with('RoleForge')
+    assert registry.stats()['clients_created'] == 1